@@ -0,0 +1,76 @@
+"""
+Benchmark of cache engines: operations per second of single-key commands and lists
+
+``get again`` reads keys a second time, e.g. from the local values of a near cache
+
+usage: PYTHONPATH=. python benchmarks/bench_cache_engines.py [--keys 10000]
+    [--resp 127.0.0.1:6379]
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Callable
+import os
+import tempfile
+import time
+
+from my_utilities.cache import (
+    CacheEngine,
+    MemoryCacheEngine,
+    NearCacheEngine,
+    RESPCacheEngine,
+    SQLiteCacheEngine,
+)
+
+ENGINES = {
+    "memory": MemoryCacheEngine,
+    "near": lambda: NearCacheEngine(MemoryCacheEngine()),
+    "sqlite": lambda: SQLiteCacheEngine(os.path.join(tempfile.mkdtemp(), "cache.db")),
+}  # type: dict[str, Callable[[], CacheEngine]]
+
+
+def measure(operation: Callable[[int], object], count: int) -> float:
+    started = time.perf_counter()
+    for index in range(count):
+        operation(index)
+    return count / (time.perf_counter() - started)
+
+
+def run(engine: CacheEngine, count: int) -> list[float]:
+    return [
+        measure(lambda index: engine.set(f"key-{index}", index, ttl=300), count),
+        measure(lambda index: engine.get(f"key-{index}"), count),
+        measure(lambda index: engine.get(f"key-{index}"), count),
+        measure(lambda index: engine.lpush("list", f"item-{index}"), count),
+        measure(lambda index: engine.lpos("list", f"item-{index}"), count),
+        measure(lambda index: engine.lrem("list", f"item-{index}"), count),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument(
+        "--resp", help="host:port of a Redis server to benchmark RESPCacheEngine"
+    )
+    args = parser.parse_args()
+    count = args.keys
+    if args.resp:
+        host, port = args.resp.rsplit(":", 1)
+        ENGINES["resp"] = lambda: RESPCacheEngine(host=host, port=int(port))
+
+    print(
+        f"{'engine':>10}{'set':>12}{'get':>12}{'get again':>12}"
+        f"{'lpush':>12}{'lpos':>12}{'lrem':>12}"
+    )
+    for name, factory in ENGINES.items():
+        engine = factory()
+        results = run(engine, count)
+        engine.reset_cache()
+        engine._disconnect()
+        print(f"{name:>10}" + "".join(f"{result:>10.0f}/s" for result in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Multi-threaded throughput of TTLDict against ShardedTTLDict
+
+Every thread runs a mix of reads and writes over its own range of keys.
+On a free-threaded (no-GIL) build shards let the threads scale, with the GIL
+the numbers show the cost of the locking only.
+
+usage: PYTHONPATH=. python benchmarks/bench_sharded_ttl_dict.py [--threads 1 2 4 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from threading import Barrier, Thread
+import time
+from typing import Any
+
+from my_utilities.types import ShardedTTLDict, TTLDict
+
+
+def _worker(
+    container: Any, offset: int, ops: int, reads: int, barrier: Barrier
+) -> None:
+    keys = range(offset, offset + 1000)
+    barrier.wait()
+    for step in range(ops):
+        key = keys[step % 1000]
+        if step % 10 < reads:
+            container.get(key)
+        else:
+            container[key] = step
+
+
+def _run(container: Any, threads: int, ops: int, reads: int) -> float:
+    """
+    Run the workload and return operations per second
+    """
+    barrier = Barrier(threads + 1)
+    workers = [
+        Thread(target=_worker, args=(container, n * 1000, ops, reads, barrier))
+        for n in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    container.close()
+    return threads * ops / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--ops", type=int, default=200_000, help="ops per thread")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--reads", type=int, default=9, help="reads out of 10 ops")
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+    print(f"{'threads':>8}{'TTLDict':>14}{'Sharded':>14}{'speedup':>10}")
+    for threads in args.threads:
+        single = _run(TTLDict(), threads, args.ops, args.reads)
+        sharded = _run(
+            ShardedTTLDict(shards=args.shards), threads, args.ops, args.reads
+        )
+        print(
+            f"{threads:>8}{single:>12,.0f}/s{sharded:>12,.0f}/s"
+            f"{sharded / single:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Multi-process throughput of SQLiteCacheEngine on one database file
+
+Every process opens its own engine and runs a mix of reads and writes
+over its own range of keys, writes of all processes share the WAL lock.
+
+usage: PYTHONPATH=. python benchmarks/bench_sqlite_engine.py [--processes 1 2 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+from multiprocessing.synchronize import Barrier
+import os
+import tempfile
+import time
+
+from my_utilities.cache import SQLiteCacheEngine
+
+
+def _worker(path: str, offset: int, ops: int, reads: int, barrier: Barrier) -> None:
+    cache = SQLiteCacheEngine(path, timeout=60)
+    keys = [f"key-{offset + index}" for index in range(1000)]
+    barrier.wait()
+    for step in range(ops):
+        key = keys[step % 1000]
+        if step % 10 < reads:
+            cache.get(key)
+        else:
+            cache.set(key, step, ttl=300)
+    cache._disconnect()
+
+
+def _run(path: str, processes: int, ops: int, reads: int) -> float:
+    """
+    Run the workload and return operations per second of all processes
+    """
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(processes + 1)
+    workers = [
+        context.Process(target=_worker, args=(path, n * 1000, ops, reads, barrier))
+        for n in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return processes * ops / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--ops", type=int, default=20_000, help="ops per process")
+    parser.add_argument("--reads", type=int, default=9, help="reads out of 10 ops")
+    args = parser.parse_args()
+
+    print(f"{'processes':>10}{'ops':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.db")
+        SQLiteCacheEngine(path)._disconnect()
+        for processes in args.processes:
+            result = _run(path, processes, args.ops, args.reads)
+            print(f"{processes:>10}{result:>12,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
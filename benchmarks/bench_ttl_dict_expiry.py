@@ -0,0 +1,114 @@
+"""
+Benchmark of TTLDict expiry engines against one threading.Timer per key
+
+Measures schedule, reschedule and cancel of N keys for every engine.
+The Timer baseline starts an OS thread per key, so by default it runs only
+for sizes up to ``--timer-limit`` keys.
+
+usage: PYTHONPATH=. python benchmarks/bench_ttl_dict_expiry.py [--sizes 10000 100000 1000000]
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Callable
+import gc
+from threading import Timer
+import time
+from typing import Any
+
+from my_utilities.types import (
+    ExpiryEngine,
+    HeapExpiryEngine,
+    TimingWheelExpiryEngine,
+)
+
+TTL = 300.0
+
+
+class TimerScheduler:
+    """
+    Scheduling of the original TTLDict: one threading.Timer per key
+    """
+
+    def __init__(self) -> None:
+        self._timers = {}  # type: dict[Any, Timer]
+
+    def schedule(self, key: Any, deadline: float) -> None:
+        if key in self._timers:
+            self._timers[key].cancel()
+        self._timers[key] = Timer(deadline - time.monotonic(), lambda: None)
+        self._timers[key].start()
+
+    def cancel(self, key: Any) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    def close(self) -> None:
+        for timer in self._timers.values():
+            timer.cancel()
+
+
+def _measure(scheduler: Any, size: int) -> dict[str, float]:
+    """
+    Time every operation for ``size`` keys
+
+    :return: seconds spent per phase
+    """
+    now = time.monotonic()
+    result = {}
+    started = time.perf_counter()
+    for key in range(size):
+        scheduler.schedule(key, now + TTL)
+    result["schedule"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for key in range(size):
+        scheduler.schedule(key, now + TTL + 1)
+    result["reschedule"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for key in range(size):
+        scheduler.cancel(key)
+    result["cancel"] = time.perf_counter() - started
+    scheduler.close()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--timer-limit",
+        type=int,
+        default=10_000,
+        help="largest size to run the one-thread-per-key baseline for",
+    )
+    parser.add_argument("--tick", type=float, default=0.01)
+    args = parser.parse_args()
+
+    engines = {
+        "timer": TimerScheduler,
+        "heap": HeapExpiryEngine,
+        "wheel": lambda: TimingWheelExpiryEngine(tick=args.tick),
+    }  # type: dict[str, Callable[[], ExpiryEngine | TimerScheduler]]
+
+    print(f"{'engine':<8}{'keys':>10}{'schedule':>12}{'reschedule':>12}{'cancel':>12}")
+    for size in args.sizes:
+        for name, factory in engines.items():
+            if name == "timer" and size > args.timer_limit:
+                print(f"{name:<8}{size:>10}{'skipped: one OS thread per key':>36}")
+                continue
+            gc.collect()
+            result = _measure(factory(), size)
+            print(
+                f"{name:<8}{size:>10}"
+                + "".join(f"{result[phase]:>11.3f}s" for phase in result)
+            )
+
+
+if __name__ == "__main__":
+    main()
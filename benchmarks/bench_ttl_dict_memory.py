@@ -0,0 +1,98 @@
+"""
+Memory benchmark of TTLDict storage modes measured with tracemalloc
+
+Reports traced bytes per key spent by the container itself: keys and values
+are created before the measurement starts. The ``timer`` row reproduces the
+original storage, an OrderedDict plus one started threading.Timer per key;
+the stacks of its OS threads are not traced by tracemalloc, so the real cost
+is higher. It runs only for sizes up to ``--timer-limit`` keys.
+
+usage: PYTHONPATH=. python benchmarks/bench_ttl_dict_memory.py [--sizes 10000 100000 1000000]
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import OrderedDict
+from collections.abc import Callable
+import gc
+from threading import Timer
+import tracemalloc
+from typing import Any
+
+from my_utilities.types import TimingWheelExpiryEngine, TTLDict
+
+TTL = 300
+
+
+class TimerTTLDict:
+    """
+    Storage of the original TTLDict: OrderedDict and one threading.Timer per key
+    """
+
+    def __init__(self) -> None:
+        self._dict = OrderedDict()  # type: OrderedDict[Any, Any]
+        self._timers = {}  # type: dict[Any, Timer]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._dict[key] = value
+        self._timers[key] = Timer(TTL, lambda: None)
+        self._timers[key].start()
+
+    def close(self) -> None:
+        for timer in self._timers.values():
+            timer.cancel()
+
+
+def _measure(factory: Callable[[], Any], size: int) -> float:
+    """
+    Traced bytes per key after filling a new container with ``size`` keys
+    """
+    keys = [f"key-{index}" for index in range(size)]
+    values = list(range(size))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    container = factory()
+    for key, value in zip(keys, values, strict=True):
+        container[key] = value
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    container.close()
+    return used / size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--timer-limit",
+        type=int,
+        default=10_000,
+        help="largest size to run the one-thread-per-key baseline for",
+    )
+    args = parser.parse_args()
+
+    containers = {
+        "timer": TimerTTLDict,
+        "heap": lambda: TTLDict(default_ttl=TTL),
+        "lazy": lambda: TTLDict(default_ttl=TTL, lazy=True),
+        "wheel": lambda: TTLDict(
+            default_ttl=TTL, engine=TimingWheelExpiryEngine(tick=0.01)
+        ),
+        "compact": lambda: TTLDict(default_ttl=TTL, compact=True),
+    }  # type: dict[str, Callable[[], Any]]
+
+    print(f"{'storage':<10}{'keys':>10}{'bytes/key':>12}")
+    for size in args.sizes:
+        for name, factory in containers.items():
+            if name == "timer" and size > args.timer_limit:
+                print(f"{name:<10}{size:>10}{'skipped: one OS thread per key':>33}")
+                continue
+            print(f"{name:<10}{size:>10}{_measure(factory, size):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
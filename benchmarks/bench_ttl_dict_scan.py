@@ -0,0 +1,71 @@
+"""
+Benchmark of full scans of TTLDict while another thread keeps writing
+
+Compares scans over a copy taken under the lock, the old workaround,
+with ``items()`` over a copy-on-write generation, and reports how many
+writes the writer thread managed meanwhile. With generations the scan
+copies nothing, a write copies the dictionary once if a scan still
+holds the current generation.
+
+usage: PYTHONPATH=. python benchmarks/bench_ttl_dict_scan.py [--sizes 100000 1000000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+
+from my_utilities.types import TTLDict
+
+SCANS = 20
+
+
+def run(size: int, scan: str, write_every: float) -> tuple[float, int]:
+    t = TTLDict(default_ttl=300)
+    t.set_many((index, index) for index in range(size))
+    stop = threading.Event()
+    writes = 0
+
+    def writer() -> None:
+        nonlocal writes
+        while not stop.is_set():
+            t.set(size + writes, writes, ttl=0.01)
+            writes += 1
+            time.sleep(write_every)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    started = time.perf_counter()
+    for _ in range(SCANS):
+        if scan == "lock":
+            with t._lock:
+                items = dict(t._dict).items()
+        else:
+            items = t.items()
+        for _ in items:
+            pass
+    elapsed = (time.perf_counter() - started) / SCANS
+    stop.set()
+    thread.join()
+    t.close()
+    return elapsed, writes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument(
+        "--write-every", type=float, default=0.05, help="pause between writes"
+    )
+    args = parser.parse_args()
+
+    print(f"{'keys':>10}{'scan':>12}{'per scan':>12}{'writes':>10}")
+    for size in args.sizes:
+        for scan in ("lock", "generation"):
+            elapsed, writes = run(size, scan, args.write_every)
+            print(f"{size:>10}{scan:>12}{elapsed * 1000:>10.1f}ms{writes:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of TTLDict snapshots: dump, read of the mapped file and full load
+
+Half of the keys get a short TTL and expire before loading, so the read
+shows how expired entries are skipped without being deserialized.
+
+usage: PYTHONPATH=. python benchmarks/bench_ttl_dict_snapshot.py [--sizes 100000 1000000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+from my_utilities.types import TTLDict
+from my_utilities.types.ttl_snapshot import read_snapshot
+
+TTL = 300
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--expired", action="store_true", help="expire half of keys")
+    args = parser.parse_args()
+
+    print(
+        f"{'keys':>10}{'file MB':>10}{'dump':>10}{'read':>10}"
+        f"{'load':>10}{'compact':>10}{'loaded':>10}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "snapshot.ttl")
+        for size in args.sizes:
+            source = TTLDict(default_ttl=TTL, lazy=True)
+            source.set_many((f"key-{index}", index) for index in range(size))
+            if args.expired:
+                source.set_many(
+                    ((f"key-{index}", index) for index in range(0, size, 2)),
+                    ttl=2,
+                )
+            started = time.perf_counter()
+            source.dump(path)
+            dump = time.perf_counter() - started
+            if args.expired:
+                time.sleep(2)
+
+            started = time.perf_counter()
+            read_snapshot(path, time.time())
+            read = time.perf_counter() - started
+
+            started = time.perf_counter()
+            loaded = TTLDict(default_ttl=TTL, lazy=True).load(path)
+            load = time.perf_counter() - started
+
+            started = time.perf_counter()
+            TTLDict(default_ttl=TTL, lazy=True, compact=True).load(path)
+            compact = time.perf_counter() - started
+            print(
+                f"{size:>10}{os.path.getsize(path) / 2**20:>10.1f}"
+                f"{dump:>9.3f}s{read:>9.3f}s{load:>9.3f}s{compact:>9.3f}s{loaded:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
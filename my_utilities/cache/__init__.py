@@ -1,10 +1,14 @@
+import asyncio
 import warnings
 from abc import ABC, abstractmethod
 from logging import Logger
-from typing import Any, List, Optional
+from types import TracebackType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Type
 
+from .ttl_cache import make_key, ttl_cache
 
-class CacheEngine(ABC):  # pragma: no cover
+
+class CacheEngine(ABC):
     """
     Module with abstract class for cache engines
     """
@@ -14,49 +18,481 @@ class CacheEngine(ABC):  # pragma: no cover
     @abstractmethod
     def set(
         self, key: Any, value: Any, ttl: Optional[int] = None, **kwargs: dict[str, Any]
+    ) -> bool:  # pragma: no cover
+        """
+        Set data to cache
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_ttl(
+        self, key: Any, ttl: int, **kwargs: dict[str, Any]
+    ) -> bool:  # pragma: no cover
+        """
+        Update ttl for concrete key
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(
+        self, key: Any, **kwargs: dict[str, Any]
+    ) -> Optional[Any]:  # pragma: no cover
+        """
+        Get data from cache
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: Any, **kwargs: dict[str, Any]) -> bool:  # pragma: no cover
+        """
+        Delete data from cache
+        """
+        raise NotImplementedError
+
+    def ttl(self, key: Any, **kwargs: dict[str, Any]) -> Optional[float]:
+        """
+        Remaining ttl of the key in seconds
+
+        Optional, engines that can't tell it keep this implementation.
+
+        :param key: key to look up
+        :type key: Any
+        :return: ``math.inf`` if the key never expires, None if it is absent
+        :rtype: Optional[float]
+        :raise NotImplementedError: if the engine can't tell the remaining ttl
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset_cache(self, **kwargs: dict[str, Any]) -> bool:  # pragma: no cover
+        """
+        Reset all keys
+        """
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> Dict[Any, Any]:
+        """
+        Get data of many keys, absent keys are skipped
+
+        The default implementation calls :meth:`get` for every key,
+         engines override it with a native bulk command.
+
+        :param keys: keys to get
+        :type keys: Iterable[Any]
+        :return: found keys with their values
+        :rtype: Dict[Any, Any]
+        """
+        found = {}
+        for key in keys:
+            value = self.get(key, **kwargs)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: Optional[int] = None,
+        ttls: Optional[Mapping[Any, Optional[int]]] = None,
+        **kwargs: dict[str, Any],
     ) -> bool:
+        """
+        Set data of many keys
+
+        The default implementation calls :meth:`set` for every key,
+         engines override it with a native bulk command.
+
+        :param data: keys with their values
+        :type data: Mapping[Any, Any]
+        :param ttl: ttl of keys absent in ttls
+        :type ttl: Optional[int]
+        :param ttls: own ttl of some keys
+        :type ttls: Optional[Mapping[Any, Optional[int]]]
+        :return: True if all keys were set
+        :rtype: bool
+        """
+        ttls = ttls or {}
+        return all(
+            [
+                self.set(key, value, ttl=ttls.get(key, ttl), **kwargs)
+                for key, value in data.items()
+            ]
+        )
+
+    def delete_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> int:
+        """
+        Delete many keys
+
+        The default implementation calls :meth:`delete` for every key,
+         engines override it with a native bulk command.
+
+        :param keys: keys to delete
+        :type keys: Iterable[Any]
+        :return: number of deleted keys
+        :rtype: int
+        """
+        return sum(1 for key in keys if self.delete(key, **kwargs))
+
+    def update_ttl_many(self, ttls: Mapping[Any, int], **kwargs: dict[str, Any]) -> int:
+        """
+        Update ttl of many keys
+
+        The default implementation calls :meth:`update_ttl` for every key,
+         engines override it with a native bulk command.
+
+        :param ttls: keys with their new ttl
+        :type ttls: Mapping[Any, int]
+        :return: number of updated keys
+        :rtype: int
+        """
+        return sum(
+            1 for key, ttl in ttls.items() if self.update_ttl(key, ttl, **kwargs)
+        )
+
+    @abstractmethod
+    def _connect(self) -> None:  # pragma: no cover
+        """
+        Connect to storage
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _disconnect(self) -> None:  # pragma: no cover
+        """
+        disconnect from storage
+        """
+        raise NotImplementedError
+
+    def _set_logger(self, logger: Logger) -> None:  # pragma: no cover
+        """
+        save logger
+        """
+        if not isinstance(logger, Logger):  # pragma: no cover
+            warnings.warn(
+                "Logger is not installed because the wrong type."
+                " Uses the default logger",
+                ResourceWarning,
+            )
+            return
+        self._logger = logger
+
+    @abstractmethod
+    def keys(self) -> List[str]:  # pragma: no cover
+        raise NotImplementedError
+
+    @abstractmethod
+    def lpush(self, key: str, value: Any) -> int:  # pragma: no cover
+        raise NotImplementedError
+
+    @abstractmethod
+    def lpos(self, key: str, value: Any) -> int:  # pragma: no cover
+        raise NotImplementedError
+
+    @abstractmethod
+    def lrange(
+        self, key: str, start: int = 0, end: int = -1
+    ) -> List[Any]:  # pragma: no cover
+        raise NotImplementedError
+
+    @abstractmethod
+    def lrem(self, key: str, val: Any, count: int = 0) -> int:  # pragma: no cover
+        raise NotImplementedError
+
+    def pipeline(self) -> "CachePipeline":
+        """
+        Queue commands and send them in one batch::
+
+            with cache.pipeline() as pipe:
+                pipe.get("a")
+                pipe.set("b", 1, ttl=10)
+            value, _ = pipe.results
+
+        :rtype: CachePipeline
+        """
+        return CachePipeline(self)
+
+    def _execute_pipeline(
+        self, commands: List[Tuple[str, Tuple[Any, ...], Dict[str, Any]]]
+    ) -> List[Any]:
+        """
+        Run queued commands and return their results in order
+
+        The default implementation runs commands one by one,
+         engines that can pipeline send them in one batch.
+
+        :param commands: name, positional and keyword arguments of every command
+        :type commands: List[Tuple[str, Tuple[Any, ...], Dict[str, Any]]]
+        :rtype: List[Any]
+        """
+        return [getattr(self, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class CachePipeline:
+    """
+    Commands of :class:`CacheEngine` queued by :meth:`CacheEngine.pipeline`
+
+    Every method queues its command and returns the pipeline.
+     Queued commands run on :meth:`execute` or when the ``with`` block exits
+     without an exception, their results are kept in ``results``.
+
+    :param results: results of the last execution in the order of commands
+    :type results: List[Any]
+    """
+
+    def __init__(self, engine: CacheEngine) -> None:  # pragma: no cover
+        """
+        init cache pipeline
+
+        :param engine: the engine that runs commands
+        :type engine: CacheEngine
+        """
+        self._engine = engine
+        self._commands = []  # type: List[Tuple[str, Tuple[Any, ...], Dict[str, Any]]]
+        self.results = []  # type: List[Any]
+
+    def __enter__(self) -> "CachePipeline":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.execute()
+        else:
+            self._commands.clear()
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def _queue(self, name: str, *args: Any, **kwargs: Any) -> "CachePipeline":
+        self._commands.append((name, args, kwargs))
+        return self
+
+    def execute(self) -> List[Any]:
+        """
+        Run queued commands
+
+        :return: results in the order of commands
+        :rtype: List[Any]
+        """
+        commands, self._commands = self._commands, []
+        self.results = self._engine._execute_pipeline(commands) if commands else []
+        return self.results
+
+    def set(
+        self, key: Any, value: Any, ttl: Optional[int] = None, **kwargs: Any
+    ) -> "CachePipeline":
+        return self._queue("set", key, value, ttl=ttl, **kwargs)
+
+    def update_ttl(self, key: Any, ttl: int, **kwargs: Any) -> "CachePipeline":
+        return self._queue("update_ttl", key, ttl, **kwargs)
+
+    def get(self, key: Any, **kwargs: Any) -> "CachePipeline":
+        return self._queue("get", key, **kwargs)
+
+    def ttl(self, key: Any, **kwargs: Any) -> "CachePipeline":
+        return self._queue("ttl", key, **kwargs)
+
+    def delete(self, key: Any, **kwargs: Any) -> "CachePipeline":
+        return self._queue("delete", key, **kwargs)
+
+    def get_many(self, keys: Iterable[Any], **kwargs: Any) -> "CachePipeline":
+        return self._queue("get_many", list(keys), **kwargs)
+
+    def set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: Optional[int] = None,
+        ttls: Optional[Mapping[Any, Optional[int]]] = None,
+        **kwargs: Any,
+    ) -> "CachePipeline":
+        return self._queue("set_many", dict(data), ttl=ttl, ttls=ttls, **kwargs)
+
+    def delete_many(self, keys: Iterable[Any], **kwargs: Any) -> "CachePipeline":
+        return self._queue("delete_many", list(keys), **kwargs)
+
+    def update_ttl_many(
+        self, ttls: Mapping[Any, int], **kwargs: Any
+    ) -> "CachePipeline":
+        return self._queue("update_ttl_many", dict(ttls), **kwargs)
+
+    def lpush(self, key: str, value: Any) -> "CachePipeline":
+        return self._queue("lpush", key, value)
+
+    def lpos(self, key: str, value: Any) -> "CachePipeline":
+        return self._queue("lpos", key, value)
+
+    def lrange(self, key: str, start: int = 0, end: int = -1) -> "CachePipeline":
+        return self._queue("lrange", key, start, end)
+
+    def lrem(self, key: str, val: Any, count: int = 0) -> "CachePipeline":
+        return self._queue("lrem", key, val, count)
+
+
+class AsyncCacheEngine(ABC):
+    """
+    Module with abstract class for asyncio cache engines,
+     mirrors :class:`CacheEngine` with coroutine methods
+    """
+
+    _logger = Logger(__name__)
+
+    @abstractmethod
+    async def set(
+        self, key: Any, value: Any, ttl: Optional[int] = None, **kwargs: dict[str, Any]
+    ) -> bool:  # pragma: no cover
         """
         Set data to cache
         """
         raise NotImplementedError
 
     @abstractmethod
-    def update_ttl(self, key: Any, ttl: int, **kwargs: dict[str, Any]) -> bool:
+    async def update_ttl(
+        self, key: Any, ttl: int, **kwargs: dict[str, Any]
+    ) -> bool:  # pragma: no cover
         """
         Update ttl for concrete key
         """
         raise NotImplementedError
 
     @abstractmethod
-    def get(self, key: Any, **kwargs: dict[str, Any]) -> Optional[Any]:
+    async def get(
+        self, key: Any, **kwargs: dict[str, Any]
+    ) -> Optional[Any]:  # pragma: no cover
         """
         Get data from cache
         """
         raise NotImplementedError
 
     @abstractmethod
-    def delete(self, key: Any, **kwargs: dict[str, Any]) -> bool:
+    async def delete(
+        self, key: Any, **kwargs: dict[str, Any]
+    ) -> bool:  # pragma: no cover
         """
         Delete data from cache
         """
         raise NotImplementedError
 
+    async def ttl(self, key: Any, **kwargs: dict[str, Any]) -> Optional[float]:
+        """
+        Remaining ttl of the key in seconds
+
+        Optional, engines that can't tell it keep this implementation.
+
+        :param key: key to look up
+        :type key: Any
+        :return: ``math.inf`` if the key never expires, None if it is absent
+        :rtype: Optional[float]
+        :raise NotImplementedError: if the engine can't tell the remaining ttl
+        """
+        raise NotImplementedError
+
     @abstractmethod
-    def reset_cache(self, **kwargs: dict[str, Any]) -> bool:
+    async def reset_cache(self, **kwargs: dict[str, Any]) -> bool:  # pragma: no cover
         """
         Reset all keys
         """
         raise NotImplementedError
 
+    async def get_many(
+        self, keys: Iterable[Any], **kwargs: dict[str, Any]
+    ) -> Dict[Any, Any]:
+        """
+        Get data of many keys, absent keys are skipped
+
+        The default implementation runs :meth:`get` of all keys concurrently,
+         engines override it with a native bulk command.
+
+        :param keys: keys to get
+        :type keys: Iterable[Any]
+        :return: found keys with their values
+        :rtype: Dict[Any, Any]
+        """
+        keys = list(keys)
+        values = await asyncio.gather(*(self.get(key, **kwargs) for key in keys))
+        return {
+            key: value
+            for key, value in zip(keys, values, strict=True)
+            if value is not None
+        }
+
+    async def set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: Optional[int] = None,
+        ttls: Optional[Mapping[Any, Optional[int]]] = None,
+        **kwargs: dict[str, Any],
+    ) -> bool:
+        """
+        Set data of many keys
+
+        The default implementation runs :meth:`set` of all keys concurrently,
+         engines override it with a native bulk command.
+
+        :param data: keys with their values
+        :type data: Mapping[Any, Any]
+        :param ttl: ttl of keys absent in ttls
+        :type ttl: Optional[int]
+        :param ttls: own ttl of some keys
+        :type ttls: Optional[Mapping[Any, Optional[int]]]
+        :return: True if all keys were set
+        :rtype: bool
+        """
+        ttls = ttls or {}
+        results = await asyncio.gather(
+            *(
+                self.set(key, value, ttl=ttls.get(key, ttl), **kwargs)
+                for key, value in data.items()
+            )
+        )
+        return all(results)
+
+    async def delete_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> int:
+        """
+        Delete many keys
+
+        The default implementation runs :meth:`delete` of all keys concurrently,
+         engines override it with a native bulk command.
+
+        :param keys: keys to delete
+        :type keys: Iterable[Any]
+        :return: number of deleted keys
+        :rtype: int
+        """
+        results = await asyncio.gather(*(self.delete(key, **kwargs) for key in keys))
+        return sum(results)
+
+    async def update_ttl_many(
+        self, ttls: Mapping[Any, int], **kwargs: dict[str, Any]
+    ) -> int:
+        """
+        Update ttl of many keys
+
+        The default implementation runs :meth:`update_ttl` of all keys
+         concurrently, engines override it with a native bulk command.
+
+        :param ttls: keys with their new ttl
+        :type ttls: Mapping[Any, int]
+        :return: number of updated keys
+        :rtype: int
+        """
+        results = await asyncio.gather(
+            *(self.update_ttl(key, ttl, **kwargs) for key, ttl in ttls.items())
+        )
+        return sum(results)
+
     @abstractmethod
-    def _connect(self) -> None:
+    async def _connect(self) -> None:  # pragma: no cover
         """
         Connect to storage
         """
         raise NotImplementedError
 
     @abstractmethod
-    def _disconnect(self) -> None:
+    async def _disconnect(self) -> None:  # pragma: no cover
         """
         disconnect from storage
         """
@@ -76,21 +512,29 @@ class CacheEngine(ABC):  # pragma: no cover
         self._logger = logger
 
     @abstractmethod
-    def keys(self) -> List[str]:
+    async def keys(self) -> List[str]:  # pragma: no cover
         raise NotImplementedError
 
     @abstractmethod
-    def lpush(self, key: str, value: Any) -> int:
+    async def lpush(self, key: str, value: Any) -> int:  # pragma: no cover
         raise NotImplementedError
 
     @abstractmethod
-    def lpos(self, key: str, value: Any) -> int:
+    async def lpos(self, key: str, value: Any) -> int:  # pragma: no cover
         raise NotImplementedError
 
     @abstractmethod
-    def lrange(self, key: str, start: int = 0, end: int = -1) -> List[Any]:
+    async def lrange(
+        self, key: str, start: int = 0, end: int = -1
+    ) -> List[Any]:  # pragma: no cover
         raise NotImplementedError
 
     @abstractmethod
-    def lrem(self, key: str, val: Any, count: int = 0) -> int:
+    async def lrem(self, key: str, val: Any, count: int = 0) -> int:  # pragma: no cover
         raise NotImplementedError
+
+
+from .memory_engine import AsyncMemoryCacheEngine, MemoryCacheEngine  # noqa: E402
+from .near_engine import NearCacheEngine  # noqa: E402
+from .resp_engine import RESPCacheEngine, RESPError  # noqa: E402
+from .sqlite_engine import SQLiteCacheEngine  # noqa: E402
@@ -0,0 +1,502 @@
+"""
+Module with in-process cache engine on top of TTLDict
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Hashable, Iterable, Iterator, Mapping
+from itertools import islice
+import math
+from threading import RLock
+from typing import Any
+
+from . import AsyncCacheEngine, CacheEngine
+from ..types.ttl_dict import TTLDict
+
+_MISSING = object()
+
+
+class _CacheList:
+    """
+    List of a cache key indexed by value
+
+    Items are numbered by their position, ``lpush`` takes the position
+     before the head. ``_items`` keeps positions in push order,
+     so reversed it is the list from the head. ``_index`` keeps positions
+     of every value from the head, so ``lrem`` and ``lpos`` of a value touch
+     only its own items. Removed positions leave holes, positions are
+     renumbered on the next ``lpos`` that needs the rank of an item.
+    """
+
+    __slots__ = ("_head", "_holes", "_items", "_index")
+
+    def __init__(self) -> None:  # pragma: no cover
+        """
+        init cache list
+        """
+        self._head = 0
+        self._holes = 0
+        self._items = {}  # type: dict[int, Hashable]
+        self._index = {}  # type: dict[Hashable, deque[int]]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return reversed(self._items.values())
+
+    def push(self, value: Hashable) -> int:
+        """
+        Insert the value at the head
+
+        :param value: value to insert
+        :type value: Hashable
+        :return: length of the list
+        :rtype: int
+        :raise TypeError: if the value is not hashable
+        """
+        positions = self._index.get(value)
+        if positions is None:
+            positions = self._index[value] = deque()
+        self._head -= 1
+        self._items[self._head] = value
+        positions.appendleft(self._head)
+        return len(self._items)
+
+    def position(self, value: Hashable) -> int:
+        """
+        Index of the first occurrence of the value from the head
+
+        :param value: value to find
+        :type value: Hashable
+        :return: index or -1 if the value is absent
+        :rtype: int
+        """
+        if value not in self._index:
+            return -1
+        if self._holes:
+            self._renumber()
+        return self._index[value][0] - self._head
+
+    def remove(self, value: Hashable, count: int = 0) -> int:
+        """
+        Remove occurrences of the value like Redis ``LREM``
+
+        :param value: value to remove
+        :type value: Hashable
+        :param count: number of occurrences to remove from the head if positive,
+         from the tail if negative, all if 0
+        :type count: int
+        :return: number of removed items
+        :rtype: int
+        """
+        positions = self._index.get(value)
+        if positions is None:
+            return 0
+        if count == 0 or abs(count) >= len(positions):
+            removed = list(positions)
+            del self._index[value]
+        elif count > 0:
+            removed = [positions.popleft() for _ in range(count)]
+        else:
+            removed = [positions.pop() for _ in range(-count)]
+        for position in removed:
+            del self._items[position]
+        self._holes += len(removed)
+        return len(removed)
+
+    def _renumber(self) -> None:
+        """
+        Number items from the head again without holes
+        """
+        values = list(self)
+        self._head = 0
+        self._holes = 0
+        self._items = {}
+        self._index = {}
+        for value in reversed(values):
+            self.push(value)
+
+
+class MemoryCacheEngine(CacheEngine):
+    """
+    MemoryCacheEngine(sweep_size=20)
+
+    Thread-safe in-process cache engine with per-key TTL, keys expire on access
+     and are swept on writes like in a lazy :class:`TTLDict`.
+
+    Lists follow Redis semantics: ``lpush`` inserts at the head,
+     ``lrange`` includes its end. List values must be hashable,
+     ``lpos`` and ``lrem`` of a value cost the number of its occurrences.
+
+    :param _data: keys with their values or lists
+    :type _data: TTLDict
+    """
+
+    def __init__(self, sweep_size: int = 20) -> None:  # pragma: no cover
+        """
+        init memory cache engine
+
+        :param sweep_size: how many expired keys a write may remove
+        :type sweep_size: int
+        """
+        self._sweep_size = sweep_size
+        self._lock = RLock()
+        self._connect()
+
+    def _connect(self) -> None:
+        """
+        Create the storage
+        """
+        self._data = TTLDict(
+            default_ttl=math.inf, lazy=True, sweep_size=self._sweep_size
+        )
+
+    def _disconnect(self) -> None:
+        """
+        Drop all keys and stop the storage
+        """
+        self._data.close()
+
+    def set(
+        self, key: Any, value: Any, ttl: int | None = None, **kwargs: dict[str, Any]
+    ) -> bool:
+        """
+        Set data to cache
+
+        :param key: key to set
+        :type key: Any
+        :param value: value of the key
+        :type value: Any
+        :param ttl: time-to-live in seconds, the key never expires if None
+        :type ttl: int | None
+        :rtype: bool
+        """
+        self._data.set(key, value, ttl=ttl)
+        return True
+
+    def update_ttl(self, key: Any, ttl: int, **kwargs: dict[str, Any]) -> bool:
+        """
+        Update ttl for concrete key
+
+        :param key: key to update
+        :type key: Any
+        :param ttl: new time-to-live in seconds
+        :type ttl: int
+        :return: False if the key is absent
+        :rtype: bool
+        """
+        try:
+            self._data.extend_ttl(key, ttl)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: Any, **kwargs: dict[str, Any]) -> Any | None:
+        """
+        Get data from cache, a list is returned as a list of its items
+
+        :param key: key to get
+        :type key: Any
+        :return: value or None if the key is absent
+        :rtype: Any | None
+        """
+        value = self._data.get(key)
+        if isinstance(value, _CacheList):
+            with self._lock:
+                return list(value)
+        return value
+
+    def ttl(self, key: Any, **kwargs: dict[str, Any]) -> float | None:
+        """
+        Remaining ttl of the key in seconds
+
+        :param key: key to look up
+        :type key: Any
+        :return: ``math.inf`` if the key never expires, None if it is absent
+        :rtype: float | None
+        """
+        return self._data.ttl(key)
+
+    def delete(self, key: Any, **kwargs: dict[str, Any]) -> bool:
+        """
+        Delete data from cache
+
+        :param key: key to delete
+        :type key: Any
+        :return: False if the key is absent
+        :rtype: bool
+        """
+        return self._data.pop(key, _MISSING) is not _MISSING
+
+    def get_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> dict[Any, Any]:
+        """
+        Get data of many keys under one lock, absent keys are skipped
+
+        :param keys: keys to get
+        :type keys: Iterable[Any]
+        :return: found keys with their values
+        :rtype: dict[Any, Any]
+        """
+        found = self._data.get_many(keys)
+        for key, value in found.items():
+            if isinstance(value, _CacheList):
+                with self._lock:
+                    found[key] = list(value)
+        return found
+
+    def set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: int | None = None,
+        ttls: Mapping[Any, int | None] | None = None,
+        **kwargs: dict[str, Any],
+    ) -> bool:
+        """
+        Set data of many keys, keys with the same ttl are set under one lock
+
+        :param data: keys with their values
+        :type data: Mapping[Any, Any]
+        :param ttl: ttl of keys absent in ttls, the keys never expire if None
+        :type ttl: int | None
+        :param ttls: own ttl of some keys
+        :type ttls: Mapping[Any, int | None] | None
+        :rtype: bool
+        """
+        if not ttls:
+            self._data.set_many(data, ttl=ttl)
+            return True
+        groups = {}  # type: dict[int | None, list[tuple[Any, Any]]]
+        for key, value in data.items():
+            groups.setdefault(ttls.get(key, ttl), []).append((key, value))
+        for group_ttl, items in groups.items():
+            self._data.set_many(items, ttl=group_ttl)
+        return True
+
+    def delete_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> int:
+        """
+        Delete many keys under one lock
+
+        :param keys: keys to delete
+        :type keys: Iterable[Any]
+        :return: number of deleted keys, expired keys are not counted
+        :rtype: int
+        """
+        return self._data.delete_many(self._data.get_many(keys))
+
+    def _execute_pipeline(
+        self, commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+    ) -> list[Any]:
+        """
+        Run queued commands one by one under the engine lock,
+         so list commands of other threads do not interleave with them
+
+        :param commands: name, positional and keyword arguments of every command
+        :type commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+        :rtype: list[Any]
+        """
+        with self._lock:
+            return super()._execute_pipeline(commands)
+
+    def reset_cache(self, **kwargs: dict[str, Any]) -> bool:
+        """
+        Reset all keys
+
+        :rtype: bool
+        """
+        self._data.clear()
+        return True
+
+    def keys(self) -> list[str]:
+        """
+        Keys that have not expired
+
+        :rtype: list[str]
+        """
+        return list(self._data.keys())
+
+    def _list(self, key: str) -> _CacheList | None:
+        """
+        List of the key, must be called with ``self._lock`` held
+
+        :param key: key of the list
+        :type key: str
+        :return: list or None if the key is absent
+        :rtype: _CacheList | None
+        :raise ValueError: if the key holds not a list
+        """
+        data = self._data.get(key)
+        if data is None or isinstance(data, _CacheList):
+            return data
+        raise ValueError(f"Key '{key}' is not a list")
+
+    def lpush(self, key: str, value: Any) -> int:
+        """
+        Insert the value at the head of the list, the list is created if absent
+
+        :param key: key of the list
+        :type key: str
+        :param value: hashable value to insert
+        :type value: Any
+        :return: length of the list
+        :rtype: int
+        :raise ValueError: if the key holds not a list
+        """
+        with self._lock:
+            data = self._list(key)
+            if data is None:
+                data = _CacheList()
+                length = data.push(value)
+                self._data.set(key, data)
+                return length
+            return data.push(value)
+
+    def lpos(self, key: str, value: Any) -> int:
+        """
+        Index of the first occurrence of the value in the list
+
+        :param key: key of the list
+        :type key: str
+        :param value: value to find
+        :type value: Any
+        :return: index or -1 if the value or the list is absent
+        :rtype: int
+        :raise ValueError: if the key holds not a list
+        """
+        with self._lock:
+            data = self._list(key)
+            return -1 if data is None else data.position(value)
+
+    def lrange(self, key: str, start: int = 0, end: int = -1) -> list[Any]:
+        """
+        Items of the list from start to end inclusive, negative indexes
+         count from the tail like in Redis ``LRANGE``
+
+        :param key: key of the list
+        :type key: str
+        :param start: index of the first item
+        :type start: int
+        :param end: index of the last item
+        :type end: int
+        :rtype: list[Any]
+        :raise ValueError: if the key holds not a list
+        """
+        with self._lock:
+            data = self._list(key)
+            if data is None:
+                return []
+            length = len(data)
+            start = max(start + length if start < 0 else start, 0)
+            end = end + length if end < 0 else min(end, length - 1)
+            if start > end:
+                return []
+            return list(islice(data, start, end + 1))
+
+    def lrem(self, key: str, val: Any, count: int = 0) -> int:
+        """
+        Remove occurrences of the value like Redis ``LREM``,
+         an emptied list is deleted
+
+        :param key: key of the list
+        :type key: str
+        :param val: value to remove
+        :type val: Any
+        :param count: number of occurrences to remove from the head if positive,
+         from the tail if negative, all if 0
+        :type count: int
+        :return: number of removed items
+        :rtype: int
+        :raise ValueError: if the key holds not a list
+        """
+        with self._lock:
+            data = self._list(key)
+            if data is None:
+                return 0
+            removed = data.remove(val, count)
+            if not data:
+                self._data.delete_many((key,))
+            return removed
+
+
+class AsyncMemoryCacheEngine(AsyncCacheEngine):
+    """
+    AsyncMemoryCacheEngine(sweep_size=20)
+
+    :class:`MemoryCacheEngine` for asyncio, commands complete without waiting
+
+    :param _engine: the engine that runs commands
+    :type _engine: MemoryCacheEngine
+    """
+
+    def __init__(self, sweep_size: int = 20) -> None:  # pragma: no cover
+        """
+        init async memory cache engine
+
+        :param sweep_size: how many expired keys a write may remove
+        :type sweep_size: int
+        """
+        self._engine = MemoryCacheEngine(sweep_size=sweep_size)
+
+    async def _connect(self) -> None:
+        self._engine._connect()
+
+    async def _disconnect(self) -> None:
+        self._engine._disconnect()
+
+    async def set(
+        self, key: Any, value: Any, ttl: int | None = None, **kwargs: dict[str, Any]
+    ) -> bool:
+        return self._engine.set(key, value, ttl=ttl)
+
+    async def update_ttl(self, key: Any, ttl: int, **kwargs: dict[str, Any]) -> bool:
+        return self._engine.update_ttl(key, ttl)
+
+    async def get(self, key: Any, **kwargs: dict[str, Any]) -> Any | None:
+        return self._engine.get(key)
+
+    async def ttl(self, key: Any, **kwargs: dict[str, Any]) -> float | None:
+        return self._engine.ttl(key)
+
+    async def delete(self, key: Any, **kwargs: dict[str, Any]) -> bool:
+        return self._engine.delete(key)
+
+    async def get_many(
+        self, keys: Iterable[Any], **kwargs: dict[str, Any]
+    ) -> dict[Any, Any]:
+        return self._engine.get_many(keys)
+
+    async def set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: int | None = None,
+        ttls: Mapping[Any, int | None] | None = None,
+        **kwargs: dict[str, Any],
+    ) -> bool:
+        return self._engine.set_many(data, ttl=ttl, ttls=ttls)
+
+    async def delete_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> int:
+        return self._engine.delete_many(keys)
+
+    async def update_ttl_many(
+        self, ttls: Mapping[Any, int], **kwargs: dict[str, Any]
+    ) -> int:
+        return self._engine.update_ttl_many(ttls)
+
+    async def reset_cache(self, **kwargs: dict[str, Any]) -> bool:
+        return self._engine.reset_cache()
+
+    async def keys(self) -> list[str]:
+        return self._engine.keys()
+
+    async def lpush(self, key: str, value: Any) -> int:
+        return self._engine.lpush(key, value)
+
+    async def lpos(self, key: str, value: Any) -> int:
+        return self._engine.lpos(key, value)
+
+    async def lrange(self, key: str, start: int = 0, end: int = -1) -> list[Any]:
+        return self._engine.lrange(key, start, end)
+
+    async def lrem(self, key: str, val: Any, count: int = 0) -> int:
+        return self._engine.lrem(key, val, count)
@@ -0,0 +1,350 @@
+"""
+Module with a two-tier cache engine: in-process keys in front of any cache engine
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Mapping
+from threading import Lock
+from typing import Any
+
+from . import CacheEngine
+from ..types.ttl_dict import TTLDict
+
+_MISSING = object()
+# number of invalidation counters, keys are spread over them by hash
+_STRIPES = 1024
+
+# commands writing keys and how to find their keys in positional arguments
+_WRITES = {
+    "set": lambda args: [args[0]],
+    "update_ttl": lambda args: [args[0]],
+    "delete": lambda args: [args[0]],
+    "lpush": lambda args: [args[0]],
+    "lrem": lambda args: [args[0]],
+    "set_many": lambda args: list(args[0]),
+    "delete_many": lambda args: list(args[0]),
+    "update_ttl_many": lambda args: list(args[0]),
+}  # type: dict[str, Callable[[tuple[Any, ...]], list[Any]]]
+
+
+class NearCacheEngine(CacheEngine):
+    """
+    NearCacheEngine(remote, local_ttl=5, local_maxsize=10000)
+
+    Cache engine keeping recently read keys of a remote engine in process
+
+    A local hit costs no round trip. A local miss reads the value
+     and its remaining ttl from the remote engine in one pipeline
+     and keeps the value for ``local_ttl`` seconds at most,
+     never longer than the key lives in the remote engine.
+     Remote engines that can't tell the remaining ttl are read through
+     without keeping values locally.
+
+    Writes and deletes through this engine drop their keys locally.
+     Keys written by other processes stay stale for up to ``local_ttl``
+     unless their keys are passed to :meth:`invalidate`, e.g. by a subscriber
+     of invalidation messages published from ``function_on_write``.
+
+    :param _remote: the engine keeping keys
+    :type _remote: CacheEngine
+    :param _local: values read from the remote engine
+    :type _local: TTLDict
+    """
+
+    def __init__(
+        self,
+        remote: CacheEngine,
+        local_ttl: float = 5,
+        local_maxsize: int = 10000,
+        function_on_write: Callable[[list[Any]], None] | None = None,
+    ) -> None:  # pragma: no cover
+        """
+        init near cache engine
+
+        :param remote: the engine keeping keys
+        :type remote: CacheEngine
+        :param local_ttl: maximum time in seconds a value is kept locally
+        :type local_ttl: float
+        :param local_maxsize: maximum number of values kept locally,
+         the least recently used value is dropped
+        :type local_maxsize: int
+        :param function_on_write: the function that will be used with keys
+         written or deleted through this engine, e.g. to publish them
+         to other processes
+        :type function_on_write: Callable[[list[Any]], None] | None
+        :raise TypeError: if remote is not a cache engine
+        :raise ValueError: if local_ttl is not positive
+        """
+        if not isinstance(remote, CacheEngine):
+            raise TypeError("remote must be a CacheEngine")
+        if local_ttl <= 0:
+            raise ValueError("local_ttl must be greater than 0")
+        self._remote = remote
+        self._local_ttl = local_ttl
+        self._local_maxsize = local_maxsize
+        self._function_on_write = function_on_write
+        self._knows_ttl = type(remote).ttl is not CacheEngine.ttl
+        # a read stores a value only if neither its stripe nor the epoch
+        # was bumped by an invalidation while it waited for the remote engine
+        self._epoch = 0
+        self._versions = [0] * _STRIPES
+        self._lock = Lock()
+        self._connect()
+
+    def _connect(self) -> None:
+        """
+        Create the local storage
+        """
+        self._local = TTLDict(
+            default_ttl=self._local_ttl, lazy=True, maxsize=self._local_maxsize
+        )
+
+    def _disconnect(self) -> None:
+        """
+        Drop local values, the remote engine stays connected
+        """
+        self._local.close()
+
+    def invalidate(self, keys: Iterable[Any] | None = None) -> None:
+        """
+        Drop local values of keys changed elsewhere
+
+        :param keys: keys to drop, all values if None
+        :type keys: Iterable[Any] | None
+        """
+        with self._lock:
+            if keys is None:
+                self._epoch += 1
+                self._local.clear()
+                return
+            keys = list(keys)
+            versions = self._versions
+            for key in keys:
+                versions[hash(key) % _STRIPES] += 1
+            self._local.delete_many(keys)
+
+    def _seen(self, keys: Iterable[Any]) -> tuple[int, list[int]]:
+        """
+        Invalidation counters of keys before they are read from the remote engine
+
+        :param keys: keys to read
+        :type keys: Iterable[Any]
+        :return: the epoch and the version of the stripe of every key
+        :rtype: tuple[int, list[int]]
+        """
+        versions = self._versions
+        return self._epoch, [versions[hash(key) % _STRIPES] for key in keys]
+
+    def _written(self, keys: list[Any]) -> None:
+        """
+        Drop local values of keys written through this engine
+
+        :param keys: written keys
+        :type keys: list[Any]
+        """
+        self.invalidate(keys)
+        if self._function_on_write is not None:
+            self._function_on_write(keys)
+
+    def _store(self, epoch: int, found: Iterable[tuple[Any, int, Any, Any]]) -> None:
+        """
+        Keep values read from the remote engine
+
+        A value is dropped if its key could have been invalidated
+         while it was read, writes of other keys do not affect it.
+
+        :param epoch: the epoch before the values were read
+        :type epoch: int
+        :param found: keys with the version of their stripe before the read,
+         their values and remaining ttl
+        :type found: Iterable[tuple[Any, int, Any, Any]]
+        """
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            versions = self._versions
+            for key, version, value, remaining in found:
+                if versions[hash(key) % _STRIPES] != version:
+                    continue
+                if value is not None and remaining is not None and remaining > 0:
+                    self._local.set(key, value, ttl=min(self._local_ttl, remaining))
+
+    def set(
+        self, key: Any, value: Any, ttl: int | None = None, **kwargs: dict[str, Any]
+    ) -> bool:
+        result = self._remote.set(key, value, ttl=ttl, **kwargs)
+        self._written([key])
+        return result
+
+    def update_ttl(self, key: Any, ttl: int, **kwargs: dict[str, Any]) -> bool:
+        result = self._remote.update_ttl(key, ttl, **kwargs)
+        self._written([key])
+        return result
+
+    def ttl(self, key: Any, **kwargs: dict[str, Any]) -> float | None:
+        return self._remote.ttl(key, **kwargs)
+
+    def get(self, key: Any, **kwargs: dict[str, Any]) -> Any | None:
+        """
+        Get data from the local values or from the remote engine
+
+        :param key: key to get
+        :type key: Any
+        :return: value or None if the key is absent
+        :rtype: Any | None
+        """
+        value = self._local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if not self._knows_ttl:
+            return self._remote.get(key, **kwargs)
+        epoch, (version,) = self._seen([key])
+        with self._remote.pipeline() as pipe:
+            pipe.get(key, **kwargs)
+            pipe.ttl(key)
+        value, remaining = pipe.results
+        self._store(epoch, [(key, version, value, remaining)])
+        return value
+
+    def delete(self, key: Any, **kwargs: dict[str, Any]) -> bool:
+        result = self._remote.delete(key, **kwargs)
+        self._written([key])
+        return result
+
+    def get_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> dict[Any, Any]:
+        """
+        Get data of many keys, local misses are read in one pipeline
+
+        :param keys: keys to get
+        :type keys: Iterable[Any]
+        :return: found keys with their values
+        :rtype: dict[Any, Any]
+        """
+        found = {}  # type: dict[Any, Any]
+        missed = []
+        for key in keys:
+            value = self._local.get(key, _MISSING)
+            if value is _MISSING:
+                missed.append(key)
+            else:
+                found[key] = value
+        if not missed:
+            return found
+        if not self._knows_ttl:
+            found.update(self._remote.get_many(missed, **kwargs))
+            return found
+        epoch, versions = self._seen(missed)
+        with self._remote.pipeline() as pipe:
+            pipe.get_many(missed, **kwargs)
+            for key in missed:
+                pipe.ttl(key)
+        remote_found, *remaining = pipe.results
+        self._store(
+            epoch,
+            [
+                (key, version, remote_found.get(key), key_ttl)
+                for key, version, key_ttl in zip(
+                    missed, versions, remaining, strict=True
+                )
+            ],
+        )
+        found.update(remote_found)
+        return found
+
+    def set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: int | None = None,
+        ttls: Mapping[Any, int | None] | None = None,
+        **kwargs: dict[str, Any],
+    ) -> bool:
+        result = self._remote.set_many(data, ttl=ttl, ttls=ttls, **kwargs)
+        self._written(list(data))
+        return result
+
+    def delete_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> int:
+        keys = list(keys)
+        result = self._remote.delete_many(keys, **kwargs)
+        self._written(keys)
+        return result
+
+    def update_ttl_many(self, ttls: Mapping[Any, int], **kwargs: dict[str, Any]) -> int:
+        result = self._remote.update_ttl_many(ttls, **kwargs)
+        self._written(list(ttls))
+        return result
+
+    def _execute_pipeline(
+        self, commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+    ) -> list[Any]:
+        """
+        Answer ``get`` commands with local values and send the rest
+         to the remote engine in one pipeline
+
+        A ``get`` of a key written earlier in the same pipeline
+         is sent to the remote engine too.
+
+        :param commands: name, positional and keyword arguments of every command
+        :type commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+        :rtype: list[Any]
+        """
+        results = [None] * len(commands)  # type: list[Any]
+        sent = []  # type: list[int]
+        remote = []  # type: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+        read = []  # type: list[tuple[int, Any]]
+        written = {}  # type: dict[Any, None]
+        for index, (name, args, kwargs) in enumerate(commands):
+            if name == "get" and args[0] not in written:
+                value = self._local.get(args[0], _MISSING)
+                if value is not _MISSING:
+                    results[index] = value
+                    continue
+                if self._knows_ttl:
+                    read.append((len(remote), args[0]))
+            elif name in _WRITES:
+                written.update(dict.fromkeys(_WRITES[name](args)))
+            sent.append(index)
+            remote.append((name, args, kwargs))
+        remote.extend(("ttl", (key,), {}) for _, key in read)
+        epoch, versions = self._seen(key for _, key in read)
+        remote_results = self._remote._execute_pipeline(remote) if remote else []
+        for index, result in zip(sent, remote_results[: len(sent)], strict=True):
+            results[index] = result
+        if written:
+            self._written(list(written))
+        self._store(
+            epoch,
+            [
+                (key, version, remote_results[position], key_ttl)
+                for (position, key), version, key_ttl in zip(
+                    read, versions, remote_results[len(sent) :], strict=True
+                )
+                # a value read before a write of its key is stale
+                if key not in written
+            ],
+        )
+        return results
+
+    def reset_cache(self, **kwargs: dict[str, Any]) -> bool:
+        result = self._remote.reset_cache(**kwargs)
+        self.invalidate()
+        return result
+
+    def keys(self) -> list[str]:
+        return self._remote.keys()
+
+    def lpush(self, key: str, value: Any) -> int:
+        result = self._remote.lpush(key, value)
+        self._written([key])
+        return result
+
+    def lpos(self, key: str, value: Any) -> int:
+        return self._remote.lpos(key, value)
+
+    def lrange(self, key: str, start: int = 0, end: int = -1) -> list[Any]:
+        return self._remote.lrange(key, start, end)
+
+    def lrem(self, key: str, val: Any, count: int = 0) -> int:
+        result = self._remote.lrem(key, val, count)
+        self._written([key])
+        return result
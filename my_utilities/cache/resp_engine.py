@@ -0,0 +1,630 @@
+"""
+Module with a cache engine speaking the Redis protocol (RESP) over sockets
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+import json
+import math
+import socket
+from threading import BoundedSemaphore, Lock
+from typing import Any
+
+from . import CacheEngine
+
+# requests of a command and the function turning their replies into its result
+_Command = tuple[list[tuple[Any, ...]], Callable[[list[Any]], Any]]
+
+
+class RESPError(ValueError):
+    """
+    Error reply of the server, e.g. ``WRONGTYPE`` for a list command
+     on a key holding a string
+    """
+
+
+def _encode(request: tuple[Any, ...]) -> bytes:
+    """
+    Request as a RESP array of bulk strings
+
+    :param request: command name and its arguments,
+     arguments other than bytes are sent as their ``str``
+    :type request: tuple[Any, ...]
+    :rtype: bytes
+    """
+    parts = [b"*%d\r\n" % len(request)]
+    for argument in request:
+        if not isinstance(argument, bytes):
+            argument = str(argument).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(argument), argument))
+    return b"".join(parts)
+
+
+def _milliseconds(ttl: float) -> int:
+    """
+    TTL in whole milliseconds, at least one
+
+    :param ttl: time-to-live in seconds
+    :type ttl: float
+    :rtype: int
+    """
+    return max(math.ceil(ttl * 1000), 1)
+
+
+class _Connection:
+    """
+    Socket to the server with a buffered reader of replies
+    """
+
+    __slots__ = ("_socket", "_reader", "generation")
+
+    def __init__(
+        self, sock: socket.socket, generation: int
+    ) -> None:  # pragma: no cover
+        """
+        init connection
+
+        :param sock: connected socket
+        :type sock: socket.socket
+        :param generation: generation of the pool that opened the connection
+        :type generation: int
+        """
+        self._socket = sock
+        self._reader = sock.makefile("rb")
+        self.generation = generation
+
+    def send(self, requests: list[tuple[Any, ...]]) -> None:
+        """
+        Send requests in one write
+
+        :param requests: command names with their arguments
+        :type requests: list[tuple[Any, ...]]
+        """
+        self._socket.sendall(b"".join(_encode(request) for request in requests))
+
+    def read(self) -> Any:
+        """
+        Read one reply, an error reply is returned, not raised,
+         so replies of the following requests can still be read
+
+        :return: str, int, bytes, None, list of replies or :class:`RESPError`
+        :rtype: Any
+        :raise ConnectionError: if the server closed the connection
+         or sent an unknown reply
+        """
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            return RESPError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self.read() for _ in range(length)]
+        raise ConnectionError(f"Unknown reply type {kind!r}")
+
+    def call(self, *request: Any) -> Any:
+        """
+        Send one request and read its reply
+
+        :param request: command name and its arguments
+        :type request: Any
+        :rtype: Any
+        :raise RESPError: if the server replied with an error
+        """
+        self.send([request])
+        reply = self.read()
+        if isinstance(reply, RESPError):
+            raise reply
+        return reply
+
+    def close(self) -> None:
+        self._reader.close()
+        self._socket.close()
+
+
+class RESPCacheEngine(CacheEngine):
+    """
+    RESPCacheEngine(host="127.0.0.1", port=6379, db=0, password=None,
+    pool_size=10, timeout=5.0)
+
+    Cache engine for Redis and servers speaking its protocol
+
+    Commands borrow a connection from a thread-safe pool, up to ``pool_size``
+     connections are open at once. A pipeline is sent in one write
+     and its replies are read in order on one connection.
+
+    Keys are sent as their ``str``, values are serialized with ``dumps``,
+     so list values are compared by their serialized form.
+     Unlike :class:`MemoryCacheEngine`, :meth:`get` of a list key
+     raises :class:`RESPError` like Redis ``GET``.
+
+    :param _idle: connections waiting for a command
+    :type _idle: deque[_Connection]
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        password: str | None = None,
+        pool_size: int = 10,
+        timeout: float = 5.0,
+        dumps: Callable[[Any], str | bytes] = json.dumps,
+        loads: Callable[[bytes], Any] = json.loads,
+    ) -> None:  # pragma: no cover
+        """
+        init resp cache engine
+
+        :param host: host of the server
+        :type host: str
+        :param port: port of the server
+        :type port: int
+        :param db: number of the database selected on every connection
+        :type db: int
+        :param password: password sent with ``AUTH`` on every connection
+        :type password: str | None
+        :param pool_size: maximum number of open connections
+        :type pool_size: int
+        :param timeout: time in seconds to wait for the server
+         and for a free connection of the pool
+        :type timeout: float
+        :param dumps: function serializing values
+        :type dumps: Callable[[Any], str | bytes]
+        :param loads: function deserializing values
+        :type loads: Callable[[bytes], Any]
+        :raise ValueError: if pool_size is less than 1
+        """
+        if pool_size < 1:
+            raise ValueError("pool_size must be greater than 0")
+        self._address = (host, port)
+        self._db = db
+        self._password = password
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._dumps = dumps
+        self._loads = loads
+        self._lock = Lock()
+        self._generation = 0
+        self._idle = deque()  # type: deque[_Connection]
+        self._slots = BoundedSemaphore(pool_size)
+        self._connect()
+
+    def _connect(self) -> None:
+        """
+        Drop open connections of the pool and check the server with ``PING``
+        """
+        self._disconnect()
+        with self._connection() as connection:
+            connection.call("PING")
+
+    def _disconnect(self) -> None:
+        """
+        Close idle connections, connections running a command
+         are closed when they are returned to the pool
+        """
+        with self._lock:
+            self._generation += 1
+            idle, self._idle = self._idle, deque()
+        for connection in idle:
+            connection.close()
+
+    def _open(self) -> _Connection:
+        """
+        Open a connection, authenticate and select the database
+
+        :rtype: _Connection
+        """
+        sock = socket.create_connection(self._address, timeout=self._timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = _Connection(sock, self._generation)
+        try:
+            if self._password is not None:
+                connection.call("AUTH", self._password)
+            if self._db:
+                connection.call("SELECT", self._db)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    @contextmanager
+    def _connection(self) -> Iterator[_Connection]:
+        """
+        Borrow a connection of the pool, a connection that failed
+         in the middle of a command is closed instead of being returned
+
+        :rtype: Iterator[_Connection]
+        :raise TimeoutError: if no connection is free within the timeout
+        """
+        if not self._slots.acquire(timeout=self._timeout):
+            raise TimeoutError("No free connection in the pool")
+        try:
+            try:
+                connection = self._idle.pop()
+            except IndexError:
+                connection = self._open()
+            try:
+                yield connection
+            except BaseException:
+                connection.close()
+                raise
+            with self._lock:
+                if connection.generation == self._generation:
+                    self._idle.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()
+        finally:
+            self._slots.release()
+
+    def _execute_pipeline(
+        self, commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+    ) -> list[Any]:
+        """
+        Send requests of all commands in one write and read their replies
+
+        :param commands: name, positional and keyword arguments of every command
+        :type commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+        :rtype: list[Any]
+        :raise RESPError: the first error reply, after all replies are read
+        """
+        built = [
+            getattr(self, f"_build_{name}")(*args, **kwargs)
+            for name, args, kwargs in commands
+        ]  # type: list[_Command]
+        requests = [
+            request for command_requests, _ in built for request in command_requests
+        ]
+        replies = []  # type: list[Any]
+        if requests:
+            with self._connection() as connection:
+                connection.send(requests)
+                replies = [connection.read() for _ in requests]
+        results = []
+        error = None
+        position = 0
+        for command_requests, parse in built:
+            command_replies = replies[position : position + len(command_requests)]
+            position += len(command_requests)
+            failed = [
+                reply for reply in command_replies if isinstance(reply, RESPError)
+            ]
+            if failed:
+                error = error or failed[0]
+                results.append(failed[0])
+            else:
+                results.append(parse(command_replies))
+        if error is not None:
+            raise error
+        return results
+
+    def _run(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run one command
+
+        :param name: name of the command
+        :type name: str
+        :rtype: Any
+        """
+        return self._execute_pipeline([(name, args, kwargs)])[0]
+
+    def _dump(self, value: Any) -> bytes:
+        data = self._dumps(value)
+        return data.encode() if isinstance(data, str) else data
+
+    def _load(self, data: bytes | None) -> Any:
+        return None if data is None else self._loads(data)
+
+    @staticmethod
+    def _set_request(key: Any, data: bytes, ttl: float | None) -> tuple[Any, ...]:
+        if ttl is None or ttl == math.inf:
+            return ("SET", key, data)
+        return ("SET", key, data, "PX", _milliseconds(ttl))
+
+    def _build_set(
+        self, key: Any, value: Any, ttl: float | None = None, **kwargs: Any
+    ) -> _Command:
+        return [self._set_request(key, self._dump(value), ttl)], lambda replies: (
+            replies[0] == "OK"
+        )
+
+    def _build_update_ttl(self, key: Any, ttl: float, **kwargs: Any) -> _Command:
+        return [("PEXPIRE", key, _milliseconds(ttl))], lambda replies: replies[0] == 1
+
+    def _build_ttl(self, key: Any, **kwargs: Any) -> _Command:
+        def parse(replies: list[Any]) -> float | None:
+            if replies[0] == -2:
+                return None
+            if replies[0] == -1:
+                return math.inf
+            return float(replies[0] / 1000)
+
+        return [("PTTL", key)], parse
+
+    def _build_get(self, key: Any, **kwargs: Any) -> _Command:
+        return [("GET", key)], lambda replies: self._load(replies[0])
+
+    def _build_delete(self, key: Any, **kwargs: Any) -> _Command:
+        return [("DEL", key)], lambda replies: replies[0] > 0
+
+    def _build_get_many(self, keys: Iterable[Any], **kwargs: Any) -> _Command:
+        keys = list(keys)
+
+        def parse(replies: list[Any]) -> dict[Any, Any]:
+            if not keys:
+                return {}
+            return {
+                key: self._load(data)
+                for key, data in zip(keys, replies[0], strict=True)
+                if data is not None
+            }
+
+        return ([("MGET", *keys)] if keys else []), parse
+
+    def _build_set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: float | None = None,
+        ttls: Mapping[Any, float | None] | None = None,
+        **kwargs: Any,
+    ) -> _Command:
+        ttls = ttls or {}
+        requests = [
+            self._set_request(key, self._dump(value), ttls.get(key, ttl))
+            for key, value in data.items()
+        ]
+        return requests, lambda replies: all(reply == "OK" for reply in replies)
+
+    def _build_delete_many(self, keys: Iterable[Any], **kwargs: Any) -> _Command:
+        keys = list(keys)
+        return ([("DEL", *keys)] if keys else []), lambda replies: sum(replies)
+
+    def _build_update_ttl_many(
+        self, ttls: Mapping[Any, float], **kwargs: Any
+    ) -> _Command:
+        requests = [
+            ("PEXPIRE", key, _milliseconds(ttl)) for key, ttl in ttls.items()
+        ]  # type: list[tuple[Any, ...]]
+        return requests, lambda replies: sum(replies)
+
+    def _build_reset_cache(self, **kwargs: Any) -> _Command:
+        return [("FLUSHDB",)], lambda replies: replies[0] == "OK"
+
+    def _build_lpush(self, key: str, value: Any) -> _Command:
+        return [("LPUSH", key, self._dump(value))], lambda replies: replies[0]
+
+    def _build_lpos(self, key: str, value: Any) -> _Command:
+        return [("LPOS", key, self._dump(value))], lambda replies: (
+            -1 if replies[0] is None else replies[0]
+        )
+
+    def _build_lrange(self, key: str, start: int = 0, end: int = -1) -> _Command:
+        return [("LRANGE", key, start, end)], lambda replies: [
+            self._loads(data) for data in replies[0]
+        ]
+
+    def _build_lrem(self, key: str, val: Any, count: int = 0) -> _Command:
+        return [("LREM", key, count, self._dump(val))], lambda replies: replies[0]
+
+    def set(
+        self, key: Any, value: Any, ttl: int | None = None, **kwargs: dict[str, Any]
+    ) -> bool:
+        """
+        Set data to cache
+
+        :param key: key to set
+        :type key: Any
+        :param value: value of the key
+        :type value: Any
+        :param ttl: time-to-live in seconds, the key never expires if None
+        :type ttl: int | None
+        :rtype: bool
+        """
+        return bool(self._run("set", key, value, ttl=ttl))
+
+    def update_ttl(self, key: Any, ttl: int, **kwargs: dict[str, Any]) -> bool:
+        """
+        Update ttl for concrete key
+
+        :param key: key to update
+        :type key: Any
+        :param ttl: new time-to-live in seconds
+        :type ttl: int
+        :return: False if the key is absent
+        :rtype: bool
+        """
+        return bool(self._run("update_ttl", key, ttl))
+
+    def ttl(self, key: Any, **kwargs: dict[str, Any]) -> float | None:
+        """
+        Remaining ttl of the key in seconds
+
+        :param key: key to look up
+        :type key: Any
+        :return: ``math.inf`` if the key never expires, None if it is absent
+        :rtype: float | None
+        """
+        result = self._run("ttl", key)  # type: float | None
+        return result
+
+    def get(self, key: Any, **kwargs: dict[str, Any]) -> Any | None:
+        """
+        Get data from cache
+
+        :param key: key to get
+        :type key: Any
+        :return: value or None if the key is absent
+        :rtype: Any | None
+        :raise RESPError: if the key holds a list
+        """
+        return self._run("get", key)
+
+    def delete(self, key: Any, **kwargs: dict[str, Any]) -> bool:
+        """
+        Delete data from cache
+
+        :param key: key to delete
+        :type key: Any
+        :return: False if the key is absent
+        :rtype: bool
+        """
+        return bool(self._run("delete", key))
+
+    def get_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> dict[Any, Any]:
+        """
+        Get data of many keys with one ``MGET``, absent keys
+         and keys holding lists are skipped
+
+        :param keys: keys to get
+        :type keys: Iterable[Any]
+        :return: found keys with their values
+        :rtype: dict[Any, Any]
+        """
+        found = self._run("get_many", keys)  # type: dict[Any, Any]
+        return found
+
+    def set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: int | None = None,
+        ttls: Mapping[Any, int | None] | None = None,
+        **kwargs: dict[str, Any],
+    ) -> bool:
+        """
+        Set data of many keys with one pipeline of ``SET``
+
+        :param data: keys with their values
+        :type data: Mapping[Any, Any]
+        :param ttl: ttl of keys absent in ttls, the keys never expire if None
+        :type ttl: int | None
+        :param ttls: own ttl of some keys
+        :type ttls: Mapping[Any, int | None] | None
+        :rtype: bool
+        """
+        return bool(self._run("set_many", data, ttl=ttl, ttls=ttls))
+
+    def delete_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> int:
+        """
+        Delete many keys with one ``DEL``
+
+        :param keys: keys to delete
+        :type keys: Iterable[Any]
+        :return: number of deleted keys
+        :rtype: int
+        """
+        return int(self._run("delete_many", keys))
+
+    def update_ttl_many(self, ttls: Mapping[Any, int], **kwargs: dict[str, Any]) -> int:
+        """
+        Update ttl of many keys with one pipeline of ``PEXPIRE``
+
+        :param ttls: keys with their new ttl
+        :type ttls: Mapping[Any, int]
+        :return: number of updated keys
+        :rtype: int
+        """
+        return int(self._run("update_ttl_many", ttls))
+
+    def reset_cache(self, **kwargs: dict[str, Any]) -> bool:
+        """
+        Reset all keys of the database with ``FLUSHDB``
+
+        :rtype: bool
+        """
+        return bool(self._run("reset_cache"))
+
+    def keys(self) -> list[str]:
+        """
+        Keys of the database, read with ``SCAN`` so the server is not blocked
+
+        :rtype: list[str]
+        """
+        found = {}  # type: dict[str, None]
+        cursor = b"0"
+        with self._connection() as connection:
+            while True:
+                cursor, batch = connection.call("SCAN", cursor, "COUNT", 1000)
+                found.update(dict.fromkeys(key.decode() for key in batch))
+                if cursor == b"0":
+                    return list(found)
+
+    def lpush(self, key: str, value: Any) -> int:
+        """
+        Insert the value at the head of the list, the list is created if absent
+
+        :param key: key of the list
+        :type key: str
+        :param value: value to insert
+        :type value: Any
+        :return: length of the list
+        :rtype: int
+        :raise RESPError: if the key holds not a list
+        """
+        return int(self._run("lpush", key, value))
+
+    def lpos(self, key: str, value: Any) -> int:
+        """
+        Index of the first occurrence of the value in the list,
+         requires Redis 6.0.6 or later
+
+        :param key: key of the list
+        :type key: str
+        :param value: value to find
+        :type value: Any
+        :return: index or -1 if the value or the list is absent
+        :rtype: int
+        :raise RESPError: if the key holds not a list
+        """
+        return int(self._run("lpos", key, value))
+
+    def lrange(self, key: str, start: int = 0, end: int = -1) -> list[Any]:
+        """
+        Items of the list from start to end inclusive
+
+        :param key: key of the list
+        :type key: str
+        :param start: index of the first item
+        :type start: int
+        :param end: index of the last item
+        :type end: int
+        :rtype: list[Any]
+        :raise RESPError: if the key holds not a list
+        """
+        items = self._run("lrange", key, start, end)  # type: list[Any]
+        return items
+
+    def lrem(self, key: str, val: Any, count: int = 0) -> int:
+        """
+        Remove occurrences of the value with ``LREM``
+
+        :param key: key of the list
+        :type key: str
+        :param val: value to remove
+        :type val: Any
+        :param count: number of occurrences to remove from the head if positive,
+         from the tail if negative, all if 0
+        :type count: int
+        :return: number of removed items
+        :rtype: int
+        :raise RESPError: if the key holds not a list
+        """
+        return int(self._run("lrem", key, val, count))
@@ -0,0 +1,520 @@
+"""
+Module with a persistent cache engine on a SQLite file in WAL mode
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+import json
+import math
+import os
+import sqlite3
+from threading import RLock
+from time import time
+from typing import Any
+
+from . import CacheEngine
+
+# a key holding a list has a NULL value and the length of the list,
+# its items are rows of cache_list ordered by position,
+# lpush takes the position before the head
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    "key TEXT PRIMARY KEY, value BLOB, expires REAL, length INTEGER) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires) "
+    "WHERE expires IS NOT NULL",
+    "CREATE TABLE IF NOT EXISTS cache_list ("
+    "key TEXT, position INTEGER, value BLOB NOT NULL, "
+    "PRIMARY KEY (key, position)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cache_list_value "
+    "ON cache_list (key, value, position)",
+)
+_ALIVE = "(expires IS NULL OR expires > ?)"
+_SQL_SET = "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)"
+_SQL_GET = f"SELECT value FROM cache WHERE key = ? AND {_ALIVE}"
+_SQL_EXPIRES = f"SELECT expires FROM cache WHERE key = ? AND {_ALIVE}"
+_SQL_UPDATE_TTL = f"UPDATE cache SET expires = ? WHERE key = ? AND {_ALIVE}"
+_SQL_DELETE = f"DELETE FROM cache WHERE key = ? AND {_ALIVE}"
+_SQL_DELETE_KEY = "DELETE FROM cache WHERE key = ?"
+_SQL_KEYS = f"SELECT key FROM cache WHERE {_ALIVE}"
+_SQL_EXPIRED = "SELECT key FROM cache WHERE expires <= ? ORDER BY expires LIMIT ?"
+_SQL_LIST = f"SELECT value IS NULL, length FROM cache WHERE key = ? AND {_ALIVE}"
+_SQL_NEW_LIST = "INSERT OR REPLACE INTO cache (key, length) VALUES (?, 0)"
+_SQL_RESIZE = "UPDATE cache SET length = length + ? WHERE key = ?"
+_SQL_ITEMS = "SELECT value FROM cache_list WHERE key = ? ORDER BY position"
+_SQL_ITEMS_RANGE = _SQL_ITEMS + " LIMIT ? OFFSET ?"
+_SQL_PUSH = (
+    "INSERT INTO cache_list (key, position, value) "
+    "SELECT ?, COALESCE(MIN(position), 0) - 1, ? FROM cache_list WHERE key = ?"
+)
+_SQL_FIRST = "SELECT MIN(position) FROM cache_list WHERE key = ? AND value = ?"
+_SQL_BEFORE = "SELECT COUNT(*) FROM cache_list WHERE key = ? AND position < ?"
+_SQL_REMOVE_ALL = "DELETE FROM cache_list WHERE key = ? AND value = ?"
+_SQL_REMOVE = (
+    "DELETE FROM cache_list WHERE key = ? AND position IN ("
+    "SELECT position FROM cache_list WHERE key = ? AND value = ? "
+    "ORDER BY position {order} LIMIT ?)"
+)
+_SQL_DELETE_ITEMS = "DELETE FROM cache_list WHERE key = ?"
+# keys of one ``IN (...)``, below the default limit of SQLite variables
+_CHUNK = 500
+
+
+class SQLiteCacheEngine(CacheEngine):
+    """
+    SQLiteCacheEngine(path, purge_size=100, timeout=5.0)
+
+    Durable cache engine on a SQLite file shared by processes of one host
+
+    The database runs in WAL mode with ``synchronous=NORMAL``,
+     so readers do not wait for writers and a commit does not sync the disk.
+     Every write is one ``BEGIN IMMEDIATE`` transaction, bulk commands
+     and pipelines run in a single transaction. Statements are constant
+     and reused from the prepared statement cache of the connection.
+
+    Expiry times are stored in an indexed column. Expired keys are invisible
+     to reads, every write transaction deletes up to ``purge_size`` of them.
+     Lists are rows ordered by position, ``get`` of a list key returns
+     its items like :class:`MemoryCacheEngine`.
+
+    Keys are stored as their ``str``, values are serialized with ``dumps``,
+     so list values are compared by their serialized form.
+
+    :param _db: connection shared by threads of the process under ``_lock``
+    :type _db: sqlite3.Connection
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        purge_size: int = 100,
+        timeout: float = 5.0,
+        dumps: Callable[[Any], str | bytes] = json.dumps,
+        loads: Callable[[bytes], Any] = json.loads,
+    ) -> None:  # pragma: no cover
+        """
+        init sqlite cache engine
+
+        :param path: path of the database file, created if absent
+        :type path: str | os.PathLike[str]
+        :param purge_size: how many expired keys a write may delete
+        :type purge_size: int
+        :param timeout: time in seconds to wait for a lock held
+         by another process
+        :type timeout: float
+        :param dumps: function serializing values
+        :type dumps: Callable[[Any], str | bytes]
+        :param loads: function deserializing values
+        :type loads: Callable[[bytes], Any]
+        :raise ValueError: if purge_size is negative
+        """
+        if purge_size < 0:
+            raise ValueError("purge_size must not be negative")
+        self._path = path
+        self._purge_size = purge_size
+        self._timeout = timeout
+        self._dumps = dumps
+        self._loads = loads
+        self._lock = RLock()
+        self._depth = 0
+        self._connect()
+
+    def _connect(self) -> None:
+        """
+        Open the database, switch it to WAL mode and create tables
+        """
+        self._db = sqlite3.connect(
+            self._path,
+            timeout=self._timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction() as db:
+            for statement in _SCHEMA:
+                db.execute(statement)
+
+    def _disconnect(self) -> None:
+        """
+        Close the database, keys stay in the file
+        """
+        with self._lock:
+            self._db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Write transaction, nested transactions join the outer one.
+         The outer transaction purges expired keys before its commit.
+
+        :rtype: Iterator[sqlite3.Connection]
+        """
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self._db
+                finally:
+                    self._depth -= 1
+                return
+            self._db.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield self._db
+                self._purge()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            finally:
+                self._depth = 0
+
+    def _purge(self) -> None:
+        """
+        Delete up to ``purge_size`` expired keys with their list items,
+         must be called in a transaction
+        """
+        if not self._purge_size:
+            return
+        expired = self._db.execute(_SQL_EXPIRED, (time(), self._purge_size)).fetchall()
+        if expired:
+            self._db.executemany(_SQL_DELETE_KEY, expired)
+            self._db.executemany(_SQL_DELETE_ITEMS, expired)
+
+    def _execute_pipeline(
+        self, commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+    ) -> list[Any]:
+        """
+        Run queued commands in one transaction
+
+        :param commands: name, positional and keyword arguments of every command
+        :type commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]]
+        :rtype: list[Any]
+        """
+        with self._transaction():
+            return super()._execute_pipeline(commands)
+
+    def _dump(self, value: Any) -> bytes:
+        data = self._dumps(value)
+        return data.encode() if isinstance(data, str) else data
+
+    @staticmethod
+    def _expires(ttl: float | None) -> float | None:
+        return None if ttl is None or ttl == math.inf else time() + ttl
+
+    def _items(self, key: str) -> list[Any]:
+        return [self._loads(data) for data, in self._db.execute(_SQL_ITEMS, (key,))]
+
+    def _length(self, key: str) -> int | None:
+        """
+        Length of the list of the key, must be called with ``self._lock`` held
+
+        :param key: key of the list
+        :type key: str
+        :return: None if the key is absent
+        :rtype: int | None
+        :raise ValueError: if the key holds not a list
+        """
+        row = self._db.execute(_SQL_LIST, (key, time())).fetchone()
+        if row is None:
+            return None
+        if not row[0]:
+            raise ValueError(f"Key '{key}' is not a list")
+        return int(row[1])
+
+    def set(
+        self, key: Any, value: Any, ttl: int | None = None, **kwargs: dict[str, Any]
+    ) -> bool:
+        """
+        Set data to cache
+
+        :param key: key to set
+        :type key: Any
+        :param value: value of the key
+        :type value: Any
+        :param ttl: time-to-live in seconds, the key never expires if None
+        :type ttl: int | None
+        :rtype: bool
+        """
+        return self.set_many({key: value}, ttl=ttl)
+
+    def update_ttl(self, key: Any, ttl: int, **kwargs: dict[str, Any]) -> bool:
+        """
+        Update ttl for concrete key
+
+        :param key: key to update
+        :type key: Any
+        :param ttl: new time-to-live in seconds
+        :type ttl: int
+        :return: False if the key is absent
+        :rtype: bool
+        """
+        return self.update_ttl_many({key: ttl}) > 0
+
+    def ttl(self, key: Any, **kwargs: dict[str, Any]) -> float | None:
+        """
+        Remaining ttl of the key in seconds
+
+        :param key: key to look up
+        :type key: Any
+        :return: ``math.inf`` if the key never expires, None if it is absent
+        :rtype: float | None
+        """
+        now = time()
+        with self._lock:
+            row = self._db.execute(_SQL_EXPIRES, (str(key), now)).fetchone()
+        if row is None:
+            return None
+        return math.inf if row[0] is None else float(row[0] - now)
+
+    def get(self, key: Any, **kwargs: dict[str, Any]) -> Any | None:
+        """
+        Get data from cache, a list is returned as a list of its items
+
+        :param key: key to get
+        :type key: Any
+        :return: value or None if the key is absent
+        :rtype: Any | None
+        """
+        key = str(key)
+        with self._lock:
+            row = self._db.execute(_SQL_GET, (key, time())).fetchone()
+            if row is None:
+                return None
+            if row[0] is None:
+                return self._items(key)
+        return self._loads(row[0])
+
+    def delete(self, key: Any, **kwargs: dict[str, Any]) -> bool:
+        """
+        Delete data from cache
+
+        :param key: key to delete
+        :type key: Any
+        :return: False if the key is absent
+        :rtype: bool
+        """
+        return self.delete_many([key]) > 0
+
+    def get_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> dict[Any, Any]:
+        """
+        Get data of many keys with one query per 500 keys,
+         absent keys are skipped
+
+        :param keys: keys to get
+        :type keys: Iterable[Any]
+        :return: found keys with their values
+        :rtype: dict[Any, Any]
+        """
+        names = {str(key): key for key in keys}
+        found = {}  # type: dict[Any, Any]
+        chunks = list(names)
+        now = time()
+        with self._lock:
+            for index in range(0, len(chunks), _CHUNK):
+                chunk = chunks[index : index + _CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM cache WHERE key IN "
+                    f"({', '.join('?' * len(chunk))}) AND {_ALIVE}",
+                    (*chunk, now),
+                ).fetchall()
+                for name, data in rows:
+                    found[names[name]] = (
+                        self._items(name) if data is None else self._loads(data)
+                    )
+        return found
+
+    def set_many(
+        self,
+        data: Mapping[Any, Any],
+        ttl: int | None = None,
+        ttls: Mapping[Any, int | None] | None = None,
+        **kwargs: dict[str, Any],
+    ) -> bool:
+        """
+        Set data of many keys in one transaction
+
+        :param data: keys with their values
+        :type data: Mapping[Any, Any]
+        :param ttl: ttl of keys absent in ttls, the keys never expire if None
+        :type ttl: int | None
+        :param ttls: own ttl of some keys
+        :type ttls: Mapping[Any, int | None] | None
+        :rtype: bool
+        """
+        ttls = ttls or {}
+        rows = [
+            (str(key), self._dump(value), self._expires(ttls.get(key, ttl)))
+            for key, value in data.items()
+        ]
+        with self._transaction() as db:
+            db.executemany(_SQL_SET, rows)
+            db.executemany(_SQL_DELETE_ITEMS, [row[:1] for row in rows])
+        return True
+
+    def delete_many(self, keys: Iterable[Any], **kwargs: dict[str, Any]) -> int:
+        """
+        Delete many keys in one transaction
+
+        :param keys: keys to delete
+        :type keys: Iterable[Any]
+        :return: number of deleted keys, expired keys are not counted
+        :rtype: int
+        """
+        names = [(str(key),) for key in keys]
+        now = time()
+        with self._transaction() as db:
+            deleted = db.executemany(
+                _SQL_DELETE, [(name, now) for name, in names]
+            ).rowcount
+            db.executemany(_SQL_DELETE_ITEMS, names)
+        return deleted
+
+    def update_ttl_many(self, ttls: Mapping[Any, int], **kwargs: dict[str, Any]) -> int:
+        """
+        Update ttl of many keys in one transaction
+
+        :param ttls: keys with their new ttl
+        :type ttls: Mapping[Any, int]
+        :return: number of updated keys
+        :rtype: int
+        """
+        now = time()
+        rows = [(self._expires(ttl), str(key), now) for key, ttl in ttls.items()]
+        with self._transaction() as db:
+            return db.executemany(_SQL_UPDATE_TTL, rows).rowcount
+
+    def reset_cache(self, **kwargs: dict[str, Any]) -> bool:
+        """
+        Reset all keys
+
+        :rtype: bool
+        """
+        with self._transaction() as db:
+            db.execute("DELETE FROM cache")
+            db.execute("DELETE FROM cache_list")
+        return True
+
+    def keys(self) -> list[str]:
+        """
+        Keys that have not expired
+
+        :rtype: list[str]
+        """
+        with self._lock:
+            return [key for key, in self._db.execute(_SQL_KEYS, (time(),))]
+
+    def lpush(self, key: str, value: Any) -> int:
+        """
+        Insert the value at the head of the list, the list is created if absent
+
+        :param key: key of the list
+        :type key: str
+        :param value: value to insert
+        :type value: Any
+        :return: length of the list
+        :rtype: int
+        :raise ValueError: if the key holds not a list
+        """
+        key = str(key)
+        with self._transaction() as db:
+            length = self._length(key)
+            if length is None:
+                # replaces an expired key and drops items of an expired list
+                db.execute(_SQL_NEW_LIST, (key,))
+                db.execute(_SQL_DELETE_ITEMS, (key,))
+                length = 0
+            db.execute(_SQL_PUSH, (key, self._dump(value), key))
+            db.execute(_SQL_RESIZE, (1, key))
+        return length + 1
+
+    def lpos(self, key: str, value: Any) -> int:
+        """
+        Index of the first occurrence of the value in the list
+
+        :param key: key of the list
+        :type key: str
+        :param value: value to find
+        :type value: Any
+        :return: index or -1 if the value or the list is absent
+        :rtype: int
+        :raise ValueError: if the key holds not a list
+        """
+        key = str(key)
+        with self._lock:
+            if not self._length(key):
+                return -1
+            position = self._db.execute(
+                _SQL_FIRST, (key, self._dump(value))
+            ).fetchone()[0]
+            if position is None:
+                return -1
+            return int(self._db.execute(_SQL_BEFORE, (key, position)).fetchone()[0])
+
+    def lrange(self, key: str, start: int = 0, end: int = -1) -> list[Any]:
+        """
+        Items of the list from start to end inclusive, negative indexes
+         count from the tail like in Redis ``LRANGE``
+
+        :param key: key of the list
+        :type key: str
+        :param start: index of the first item
+        :type start: int
+        :param end: index of the last item
+        :type end: int
+        :rtype: list[Any]
+        :raise ValueError: if the key holds not a list
+        """
+        key = str(key)
+        with self._lock:
+            length = self._length(key)
+            if not length:
+                return []
+            start = max(start + length if start < 0 else start, 0)
+            end = end + length if end < 0 else end
+            if start > end:
+                return []
+            return [
+                self._loads(data)
+                for data, in self._db.execute(
+                    _SQL_ITEMS_RANGE, (key, end - start + 1, start)
+                )
+            ]
+
+    def lrem(self, key: str, val: Any, count: int = 0) -> int:
+        """
+        Remove occurrences of the value like Redis ``LREM``,
+         an emptied list is deleted
+
+        :param key: key of the list
+        :type key: str
+        :param val: value to remove
+        :type val: Any
+        :param count: number of occurrences to remove from the head if positive,
+         from the tail if negative, all if 0
+        :type count: int
+        :return: number of removed items
+        :rtype: int
+        :raise ValueError: if the key holds not a list
+        """
+        key = str(key)
+        data = self._dump(val)
+        with self._transaction() as db:
+            length = self._length(key)
+            if not length:
+                return 0
+            if count == 0:
+                removed = db.execute(_SQL_REMOVE_ALL, (key, data)).rowcount
+            else:
+                removed = db.execute(
+                    _SQL_REMOVE.format(order="ASC" if count > 0 else "DESC"),
+                    (key, key, data, abs(count)),
+                ).rowcount
+            if removed == length:
+                db.execute(_SQL_DELETE_KEY, (key,))
+            elif removed:
+                db.execute(_SQL_RESIZE, (-removed, key))
+        return int(removed)
@@ -0,0 +1,364 @@
+"""
+Module with a memoization decorator on top of TTLDict
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+import functools
+import inspect
+from threading import Event, Lock
+from typing import Any, TypeVar, cast
+
+from ..types.ttl_dict import TTLDict
+
+_MISSING = object()
+_KWARGS_MARK = object()
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def make_key(*args: Any, **kwargs: Any) -> Hashable:
+    """
+    Default cache key of a call, positional and keyword arguments must be hashable
+
+    :param args: positional arguments of the call
+    :type args: Any
+    :param kwargs: keyword arguments of the call
+    :type kwargs: Any
+    :rtype: Hashable
+    """
+    if not kwargs:
+        return args
+    return args + (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+
+
+def _is_none(result: Any) -> bool:
+    return result is None
+
+
+class _Raised:
+    """
+    Cached exception, raised again on every hit
+    """
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException) -> None:  # pragma: no cover
+        """
+        init cached exception
+
+        :param error: exception raised by the function
+        :type error: BaseException
+        """
+        self.error = error
+
+
+class _Flight:
+    """
+    Computation of one key shared by all threads that missed the cache
+    """
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:  # pragma: no cover
+        """
+        init flight
+        """
+        self.event = Event()
+        self.result = None  # type: Any
+        self.error = None  # type: BaseException | None
+
+    def wait(self) -> Any:
+        """
+        Wait for the computing call and return its result
+
+        :rtype: Any
+        :raise BaseException: the exception of the computing call
+        """
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class _Memo:
+    """
+    Cache of one decorated function and the rules of storing its results
+    """
+
+    __slots__ = (
+        "cache",
+        "key",
+        "ttl",
+        "negative_ttl",
+        "is_negative",
+        "cache_exceptions",
+    )
+
+    def __init__(
+        self,
+        ttl: float,
+        maxsize: int | None,
+        key: Callable[..., Hashable],
+        negative_ttl: float | None,
+        is_negative: Callable[[Any], bool],
+        cache_exceptions: tuple[type[BaseException], ...],
+    ) -> None:  # pragma: no cover
+        """
+        init memo
+
+        :param ttl: time in seconds a result is kept
+        :type ttl: float
+        :param maxsize: maximum number of cached keys, unbounded if None
+        :type maxsize: int | None
+        :param key: function building the cache key from the arguments of a call
+        :type key: Callable[..., Hashable]
+        :param negative_ttl: time in seconds a negative result is kept,
+         negative results are not cached if None
+        :type negative_ttl: float | None
+        :param is_negative: whether a result is negative
+        :type is_negative: Callable[[Any], bool]
+        :param cache_exceptions: exceptions cached as negative results
+        :type cache_exceptions: tuple[type[BaseException], ...]
+        """
+        self.cache = TTLDict(lazy=True, maxsize=maxsize)
+        self.key = key
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative
+        self.cache_exceptions = cache_exceptions
+
+    def cached(self, cache_key: Hashable) -> Any:
+        """
+        Cached result of the key
+
+        :param cache_key: key of the call
+        :type cache_key: Hashable
+        :return: the result or ``_MISSING``
+        :rtype: Any
+        :raise BaseException: the cached exception of the key
+        """
+        value = self.cache.get(cache_key, _MISSING)
+        if isinstance(value, _Raised):
+            raise value.error
+        return value
+
+    def store(self, cache_key: Hashable, result: Any) -> None:
+        """
+        Cache the result, a negative one only with negative_ttl
+
+        :param cache_key: key of the call
+        :type cache_key: Hashable
+        :param result: result of the function
+        :type result: Any
+        """
+        if not self.is_negative(result):
+            self.cache.set(cache_key, result, ttl=self.ttl)
+        elif self.negative_ttl is not None:
+            self.cache.set(cache_key, result, ttl=self.negative_ttl)
+
+    def store_error(self, cache_key: Hashable, error: BaseException) -> None:
+        """
+        Cache the exception if it is one of cache_exceptions
+
+        :param cache_key: key of the call
+        :type cache_key: Hashable
+        :param error: exception raised by the function
+        :type error: BaseException
+        """
+        if self.negative_ttl is not None and isinstance(error, self.cache_exceptions):
+            self.cache.set(cache_key, _Raised(error), ttl=self.negative_ttl)
+
+    def invalidate(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Drop the cached result of a call
+
+        :param args: positional arguments of the call
+        :type args: Any
+        :param kwargs: keyword arguments of the call
+        :type kwargs: Any
+        """
+        self.cache.pop(self.key(*args, **kwargs))
+
+
+def _sync_wrapper(function: Callable[..., Any], memo: _Memo) -> Callable[..., Any]:
+    """
+    Wrapper of a function sharing the computation of a key between threads
+
+    :param function: the decorated function
+    :type function: Callable[..., Any]
+    :param memo: cache of the function
+    :type memo: _Memo
+    :rtype: Callable[..., Any]
+    """
+    lock = Lock()
+    flights = {}  # type: dict[Hashable, _Flight]
+
+    def join(cache_key: Hashable) -> tuple[Any, _Flight | None, bool]:
+        with lock:
+            # the computing call stores its result before leaving
+            value = memo.cached(cache_key)
+            if value is not _MISSING:
+                return value, None, False
+            flight = flights.get(cache_key)
+            if flight is not None:
+                return _MISSING, flight, False
+            flight = flights[cache_key] = _Flight()
+            return _MISSING, flight, True
+
+    def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+        cache_key = memo.key(*args, **kwargs)
+        value = memo.cached(cache_key)
+        if value is not _MISSING:
+            return value
+        value, flight, leader = join(cache_key)
+        if value is not _MISSING:
+            return value
+        if not leader:
+            return flight.wait()
+        try:
+            flight.result = function(*args, **kwargs)
+        except BaseException as error:
+            flight.error = error
+            memo.store_error(cache_key, error)
+            raise
+        else:
+            memo.store(cache_key, flight.result)
+            return flight.result
+        finally:
+            with lock:
+                del flights[cache_key]
+            flight.event.set()
+
+    return sync_wrapper
+
+
+async def _await_other(
+    futures: dict[Hashable, asyncio.Future[Any]], memo: _Memo, cache_key: Hashable
+) -> Any:
+    """
+    Result of the key from the cache or from the call computing it
+
+    :param futures: results of the keys being computed
+    :type futures: dict[Hashable, asyncio.Future[Any]]
+    :param memo: cache of the function
+    :type memo: _Memo
+    :param cache_key: key of the call
+    :type cache_key: Hashable
+    :return: the result or ``_MISSING`` if the caller has to compute it
+    :rtype: Any
+    """
+    while True:
+        value = memo.cached(cache_key)
+        if value is not _MISSING:
+            return value
+        future = futures.get(cache_key)
+        if future is None:
+            return _MISSING
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            # the computing call was cancelled, compute again
+
+
+def _async_wrapper(
+    function: Callable[..., Awaitable[Any]], memo: _Memo
+) -> Callable[..., Any]:
+    """
+    Wrapper of a coroutine function sharing the computation of a key between tasks
+
+    :param function: the decorated coroutine function
+    :type function: Callable[..., Awaitable[Any]]
+    :param memo: cache of the function
+    :type memo: _Memo
+    :rtype: Callable[..., Any]
+    """
+    futures = {}  # type: dict[Hashable, asyncio.Future[Any]]
+
+    async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+        cache_key = memo.key(*args, **kwargs)
+        value = await _await_other(futures, memo, cache_key)
+        if value is not _MISSING:
+            return value
+        future = asyncio.get_running_loop().create_future()
+        futures[cache_key] = future
+        try:
+            result = await function(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as error:
+            memo.store_error(cache_key, error)
+            future.set_exception(error)
+            future.exception()
+            raise
+        else:
+            memo.store(cache_key, result)
+            future.set_result(result)
+            return result
+        finally:
+            del futures[cache_key]
+
+    return async_wrapper
+
+
+def ttl_cache(
+    ttl: float = 300,
+    maxsize: int | None = None,
+    key: Callable[..., Hashable] = make_key,
+    negative_ttl: float | None = None,
+    is_negative: Callable[[Any], bool] = _is_none,
+    cache_exceptions: tuple[type[BaseException], ...] = (),
+) -> Callable[[F], F]:
+    """
+    Memoize a function or a coroutine function for ``ttl`` seconds
+
+    Concurrent calls that miss the same key are single-flight: the first one
+    calls the function, the others wait for its result or its exception,
+    so a cold key under load costs one backend call.
+
+    The wrapper exposes ``cache`` (the :class:`TTLDict`), ``cache_clear()``
+    and ``cache_invalidate(*args, **kwargs)``.
+
+    :param ttl: time in seconds a result is kept
+    :type ttl: float
+    :param maxsize: maximum number of cached keys,
+     the least recently used key is evicted, unbounded if None
+    :type maxsize: int | None
+    :param key: function building the cache key from the arguments of a call
+    :type key: Callable[..., Hashable]
+    :param negative_ttl: time in seconds a negative result is kept,
+     negative results are not cached if None
+    :type negative_ttl: float | None
+    :param is_negative: whether a result is negative, e.g. "not found"
+    :type is_negative: Callable[[Any], bool]
+    :param cache_exceptions: exceptions cached as negative results
+     and raised again on hits, requires negative_ttl
+    :type cache_exceptions: tuple[type[BaseException], ...]
+    :rtype: Callable[[F], F]
+    :raise ValueError: if ttl or negative_ttl is not positive
+     or cache_exceptions are given without negative_ttl
+    """
+    if ttl <= 0:
+        raise ValueError("ttl must be greater than 0")
+    if negative_ttl is not None and negative_ttl <= 0:
+        raise ValueError("negative_ttl must be greater than 0")
+    if cache_exceptions and negative_ttl is None:
+        raise ValueError("cache_exceptions requires negative_ttl")
+
+    def decorator(function: F) -> F:
+        memo = _Memo(ttl, maxsize, key, negative_ttl, is_negative, cache_exceptions)
+        if inspect.iscoroutinefunction(function):
+            wrapper = _async_wrapper(function, memo)
+        else:
+            wrapper = _sync_wrapper(function, memo)
+        wrapper.cache = memo.cache  # type: ignore[attr-defined]
+        wrapper.cache_clear = memo.cache.clear  # type: ignore[attr-defined]
+        wrapper.cache_invalidate = memo.invalidate  # type: ignore[attr-defined]
+        return cast(F, functools.wraps(function)(wrapper))
+
+    return decorator
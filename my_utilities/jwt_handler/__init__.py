@@ -1,3 +1,3 @@
 from .jwt_handler import JWTAuthHandler, JWTHandlerConfig
-from .auth_cache_handler import AuthCacheHandler
+from .auth_cache_handler import AsyncAuthCacheHandler, AuthCacheHandler
 from .exc import *
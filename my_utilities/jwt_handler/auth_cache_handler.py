@@ -1,25 +1,61 @@
+import asyncio
 from typing import Any
 
-from my_utilities.cache import CacheEngine
+from my_utilities.cache import AsyncCacheEngine, CacheEngine, CachePipeline
 from my_utilities.jwt_handler.exc import UtilsJWTException, NotValidSession
 from my_utilities.jwt_handler.jwt_handler import JWTHandlerConfig, JWTAuthHandler
 
 
-class AuthCacheHandler:
+class _BaseAuthCacheHandler:
     _key_template_access = "user_{id}_access_tokens"
     _key_template_refresh = "user_{id}_refresh_tokens"
 
     def __init__(
         self,
         config: JWTHandlerConfig,
-        cache: CacheEngine | None = None,
         is_multy_session: bool = True,
     ):
         self._handler = JWTAuthHandler(config=config)
-        self._cache = cache
         self._config = config
         self._is_multy_session = is_multy_session
 
+    @staticmethod
+    def _other_tokens(
+        keys: tuple[str, str], lists: list[Any], token: str, pair_token: Any
+    ) -> list[tuple[str, Any]]:
+        """
+        Tokens of other sessions with the keys of lists they are in.
+         Both lists are walked, the refresh token of a session stays
+         in its list after the access token expired.
+
+        :param keys: keys of the access and refresh token lists
+        :type keys: tuple[str, str]
+        :param lists: content of the lists
+        :type lists: list[Any]
+        :param token: token of the current session
+        :type token: str
+        :param pair_token: pair token of the current session
+        :type pair_token: Any
+        :rtype: list[tuple[str, Any]]
+        """
+        return [
+            (key, item)
+            for key, tokens in zip(keys, lists, strict=True)
+            for item in tokens
+            if item != token and item != pair_token
+        ]
+
+
+class AuthCacheHandler(_BaseAuthCacheHandler):
+    def __init__(
+        self,
+        config: JWTHandlerConfig,
+        cache: CacheEngine | None = None,
+        is_multy_session: bool = True,
+    ):
+        super().__init__(config=config, is_multy_session=is_multy_session)
+        self._cache = cache
+
     def get_pair_tokens(
         self,
         user_id: str,
@@ -34,48 +70,49 @@ class AuthCacheHandler:
             is_add_expired=is_add_expired,
         )
         if self._cache:
-            if self._is_multy_session:
-                self._cache.lpush(
-                    key=self._key_template_access.format(id=user_id),
-                    value=access_token,
-                    # ttl=max(self._config.ttl_access_token -1, 0)
-                )
-                self._cache.lpush(
-                    key=self._key_template_refresh.format(id=user_id),
+            key_at = self._key_template_access.format(id=user_id)
+            key_rt = self._key_template_refresh.format(id=user_id)
+            if not self._is_multy_session:
+                with self._cache.pipeline() as pipe:
+                    pipe.get(key_at)
+                    pipe.get(key_rt)
+                old_tokens = pipe.results
+            with self._cache.pipeline() as pipe:
+                if self._is_multy_session:
+                    pipe.lpush(
+                        key=key_at,
+                        value=access_token,
+                        # ttl=max(self._config.ttl_access_token -1, 0)
+                    )
+                    pipe.lpush(
+                        key=key_rt,
+                        value=refresh_token,
+                        # ttl=max(self._config.ttl_refresh_token - 1, 0)
+                    )
+                else:
+                    for old_token in old_tokens:
+                        if old_token:
+                            pipe.delete(old_token)
+                    pipe.set(
+                        key=key_at,
+                        value=access_token,
+                        ttl=max(self._config.ttl_access_token, 0),
+                    )
+                    pipe.set(
+                        key=key_rt,
+                        value=refresh_token,
+                        ttl=max(self._config.ttl_refresh_token, 0),
+                    )
+                pipe.set(
+                    key=access_token,
                     value=refresh_token,
-                    # ttl=max(self._config.ttl_refresh_token - 1, 0)
-                )
-            else:
-                old_at_token = self._cache.get(
-                    self._key_template_access.format(id=user_id)
-                )
-                old_rt_token = self._cache.get(
-                    self._key_template_refresh.format(id=user_id)
-                )
-                if old_at_token:
-                    self._cache.delete(old_at_token)
-                if old_rt_token:
-                    self._cache.delete(old_rt_token)
-                self._cache.set(
-                    key=self._key_template_access.format(id=user_id),
-                    value=access_token,
                     ttl=max(self._config.ttl_access_token, 0),
                 )
-                self._cache.set(
-                    key=self._key_template_refresh.format(id=user_id),
-                    value=refresh_token,
+                pipe.set(
+                    key=refresh_token,
+                    value=access_token,
                     ttl=max(self._config.ttl_refresh_token, 0),
                 )
-            self._cache.set(
-                key=access_token,
-                value=refresh_token,
-                ttl=max(self._config.ttl_access_token, 0),
-            )
-            self._cache.set(
-                key=refresh_token,
-                value=access_token,
-                ttl=max(self._config.ttl_refresh_token, 0),
-            )
         return access_token, refresh_token
 
     def update_user_data(
@@ -86,113 +123,321 @@ class AuthCacheHandler:
         new_header: dict[str, Any] | None = None,
     ) -> tuple[str, str]:
         try:
-            (
-                user_id,
-                header_to_upload,
-                payload_to_upload,
-            ) = self.verify_token(token=token, is_access_token=is_access_token)
+            (user_id, header_to_upload, payload_to_upload), pair_token = self._verify(
+                token=token, is_access_token=is_access_token
+            )
             if new_header is not None:
                 header_to_upload = new_header
             if new_payload is not None:
                 payload_to_upload = new_payload
             if self._cache:
-                if is_access_token:
-                    at = token
-                    rt = self._cache.get(token)
-                else:
-                    at = self._cache.get(token)
-                    rt = token
-                if self._cache:
-                    self._cache.delete(at)
-                    self._cache.delete(rt)
-                    if self._is_multy_session:
-                        self._cache.lrem(
-                            key=self._key_template_refresh.format(id=user_id), val=rt
-                        )
-                        self._cache.lrem(
-                            key=self._key_template_access.format(id=user_id), val=at
-                        )
-                    else:
-                        self._cache.delete(
-                            key=self._key_template_refresh.format(id=user_id),
-                        )
-                        self._cache.delete(
-                            key=self._key_template_access.format(id=user_id),
-                        )
+                at, rt = (token, pair_token) if is_access_token else (pair_token, token)
+                with self._cache.pipeline() as pipe:
+                    pipe.delete(at)
+                    pipe.delete(rt)
+                    self._forget_session(pipe, user_id, at, rt)
             return self.get_pair_tokens(
                 user_id=user_id, payload=payload_to_upload, headers=header_to_upload
             )
         except UtilsJWTException as exc:
             raise exc
 
-    def verify_token(
+    def _forget_session(
+        self, pipe: CachePipeline, user_id: str, at: Any, rt: Any
+    ) -> None:
+        """
+        Queue commands removing the session of the user from its lists or keys
+
+        :param pipe: pipeline to queue commands to
+        :type pipe: CachePipeline
+        :param user_id: id of the user
+        :type user_id: str
+        :param at: access token of the session
+        :type at: Any
+        :param rt: refresh token of the session
+        :type rt: Any
+        """
+        key_at = self._key_template_access.format(id=user_id)
+        key_rt = self._key_template_refresh.format(id=user_id)
+        if self._is_multy_session:
+            pipe.lrem(key=key_rt, val=rt)
+            pipe.lrem(key=key_at, val=at)
+        else:
+            pipe.delete(key=key_rt)
+            pipe.delete(key=key_at)
+
+    def _verify(
         self,
         token: str,
         is_access_token: bool = True,
         verify: bool = True,
         validate_exp: bool = True,
-    ) -> tuple[str, dict[str, Any] | None, dict[str, Any] | None]:
+    ) -> tuple[tuple[str, dict[str, Any] | None, dict[str, Any] | None], Any]:
+        """
+        :meth:`verify_token` returning the pair token read from the cache too,
+         so callers do not read it again
+
+        :rtype: tuple[tuple[str, dict[str, Any] | None, dict[str, Any] | None], Any]
+        :raise NotValidSession: if the token is not in the cache
+        """
         res = self._handler.verify_token(
             token=token,
             is_access_token=is_access_token,
             verify=verify,
             validate_exp=validate_exp,
         )
+        pair_token = None
         if self._cache:
             pair_token = self._cache.get(token)
             if pair_token is None:
                 raise NotValidSession()
+        return res, pair_token
+
+    def verify_token(
+        self,
+        token: str,
+        is_access_token: bool = True,
+        verify: bool = True,
+        validate_exp: bool = True,
+    ) -> tuple[str, dict[str, Any] | None, dict[str, Any] | None]:
+        res, _ = self._verify(
+            token=token,
+            is_access_token=is_access_token,
+            verify=verify,
+            validate_exp=validate_exp,
+        )
         return res
 
     def delete_pair_tokens(self, token: str, is_access_token: bool = True) -> None:
+        (user_id, _, _), pair_token = self._verify(token, is_access_token)
+        if not self._cache:
+            return
+        at, rt = (token, pair_token) if is_access_token else (pair_token, token)
+        with self._cache.pipeline() as pipe:
+            self._forget_session(pipe, user_id, at, rt)
+            pipe.delete(at)
+            pipe.delete(rt)
 
-        user_id, _, _ = self.verify_token(token, is_access_token)
+    def clear_other_sessions(self, token: str, is_access_token: bool = True) -> None:
+        if not self._is_multy_session:
+            return
+        (user_id, _, _), pair_token = self._verify(token, is_access_token)
         if not self._cache:
             return
-        pair_token = self._cache.get(token)
-        if is_access_token:
-            at = token
-            rt = pair_token
-        else:
-            at = pair_token
-            rt = token
-        if self._is_multy_session:
-            self._cache.lrem(key=self._key_template_refresh.format(id=user_id), val=rt)
-            self._cache.lrem(key=self._key_template_access.format(id=user_id), val=at)
-            # self._cache.delete(rt)
-            # self._cache.delete(at)
-        else:
-            self._cache.delete(
-                key=self._key_template_refresh.format(id=user_id),
+        keys = (
+            self._key_template_access.format(id=user_id),
+            self._key_template_refresh.format(id=user_id),
+        )
+        with self._cache.pipeline() as pipe:
+            for key in keys:
+                pipe.lrange(key)
+        others = self._other_tokens(keys, pipe.results, token, pair_token)
+        if not others:
+            return
+        with self._cache.pipeline() as removal:
+            for key, item in others:
+                removal.lrem(key=key, val=item)
+                removal.delete(item)
+
+    def refresh_pair_tokens(self, refresh_token: str) -> tuple[str, str]:
+        return self.update_user_data(refresh_token, is_access_token=False)
+
+
+class AsyncAuthCacheHandler(_BaseAuthCacheHandler):
+    """
+    :class:`AuthCacheHandler` for asyncio services with :class:`AsyncCacheEngine`,
+     independent cache commands of one call run concurrently
+    """
+
+    def __init__(
+        self,
+        config: JWTHandlerConfig,
+        cache: AsyncCacheEngine | None = None,
+        is_multy_session: bool = True,
+    ):
+        super().__init__(config=config, is_multy_session=is_multy_session)
+        self._cache = cache
+
+    async def get_pair_tokens(
+        self,
+        user_id: str,
+        payload: dict[str, Any] | None = None,
+        headers: dict[str, Any] | None = None,
+        is_add_expired: bool = True,
+    ) -> tuple[str, str]:
+        access_token, refresh_token = self._handler.get_tokens(
+            user_id=user_id,
+            payload=payload,
+            header=headers,
+            is_add_expired=is_add_expired,
+        )
+        if self._cache:
+            key_at = self._key_template_access.format(id=user_id)
+            key_rt = self._key_template_refresh.format(id=user_id)
+            if self._is_multy_session:
+                commands = [
+                    self._cache.lpush(key=key_at, value=access_token),
+                    self._cache.lpush(key=key_rt, value=refresh_token),
+                ]
+            else:
+                old_tokens = await asyncio.gather(
+                    self._cache.get(key_at), self._cache.get(key_rt)
+                )
+                commands = [
+                    self._cache.delete(old_token)
+                    for old_token in old_tokens
+                    if old_token
+                ]
+                commands.append(
+                    self._cache.set(
+                        key=key_at,
+                        value=access_token,
+                        ttl=max(self._config.ttl_access_token, 0),
+                    )
+                )
+                commands.append(
+                    self._cache.set(
+                        key=key_rt,
+                        value=refresh_token,
+                        ttl=max(self._config.ttl_refresh_token, 0),
+                    )
+                )
+            commands.append(
+                self._cache.set(
+                    key=access_token,
+                    value=refresh_token,
+                    ttl=max(self._config.ttl_access_token, 0),
+                )
+            )
+            commands.append(
+                self._cache.set(
+                    key=refresh_token,
+                    value=access_token,
+                    ttl=max(self._config.ttl_refresh_token, 0),
+                )
             )
-            self._cache.delete(
-                key=self._key_template_access.format(id=user_id),
+            await asyncio.gather(*commands)
+        return access_token, refresh_token
+
+    async def update_user_data(
+        self,
+        token: str,
+        is_access_token: bool = True,
+        new_payload: dict[str, Any] | None = None,
+        new_header: dict[str, Any] | None = None,
+    ) -> tuple[str, str]:
+        (user_id, header_to_upload, payload_to_upload), pair_token = await self._verify(
+            token=token, is_access_token=is_access_token
+        )
+        if new_header is not None:
+            header_to_upload = new_header
+        if new_payload is not None:
+            payload_to_upload = new_payload
+        if self._cache:
+            at, rt = (token, pair_token) if is_access_token else (pair_token, token)
+            await asyncio.gather(
+                self._cache.delete(at),
+                self._cache.delete(rt),
+                *self._forget_session(user_id, at, rt),
             )
-        self._cache.delete(at)
-        self._cache.delete(rt)
+        return await self.get_pair_tokens(
+            user_id=user_id, payload=payload_to_upload, headers=header_to_upload
+        )
 
-        pass
+    def _forget_session(self, user_id: str, at: Any, rt: Any) -> list[Any]:
+        """
+        Commands removing the session of the user from its lists or keys
 
-    def clear_other_sessions(self, token: str, is_access_token: bool = True) -> None:
+        :param user_id: id of the user
+        :type user_id: str
+        :param at: access token of the session
+        :type at: Any
+        :param rt: refresh token of the session
+        :type rt: Any
+        :rtype: list[Any]
+        """
+        key_at = self._key_template_access.format(id=user_id)
+        key_rt = self._key_template_refresh.format(id=user_id)
+        if self._is_multy_session:
+            return [
+                self._cache.lrem(key=key_rt, val=rt),
+                self._cache.lrem(key=key_at, val=at),
+            ]
+        return [self._cache.delete(key=key_rt), self._cache.delete(key=key_at)]
+
+    async def _verify(
+        self,
+        token: str,
+        is_access_token: bool = True,
+        verify: bool = True,
+        validate_exp: bool = True,
+    ) -> tuple[tuple[str, dict[str, Any] | None, dict[str, Any] | None], Any]:
+        """
+        :meth:`verify_token` returning the pair token read from the cache too,
+         so callers do not read it again
+
+        :rtype: tuple[tuple[str, dict[str, Any] | None, dict[str, Any] | None], Any]
+        :raise NotValidSession: if the token is not in the cache
+        """
+        res = self._handler.verify_token(
+            token=token,
+            is_access_token=is_access_token,
+            verify=verify,
+            validate_exp=validate_exp,
+        )
+        pair_token = None
+        if self._cache:
+            pair_token = await self._cache.get(token)
+            if pair_token is None:
+                raise NotValidSession()
+        return res, pair_token
+
+    async def verify_token(
+        self,
+        token: str,
+        is_access_token: bool = True,
+        verify: bool = True,
+        validate_exp: bool = True,
+    ) -> tuple[str, dict[str, Any] | None, dict[str, Any] | None]:
+        res, _ = await self._verify(
+            token=token,
+            is_access_token=is_access_token,
+            verify=verify,
+            validate_exp=validate_exp,
+        )
+        return res
+
+    async def delete_pair_tokens(
+        self, token: str, is_access_token: bool = True
+    ) -> None:
+        (user_id, _, _), pair_token = await self._verify(token, is_access_token)
+        if not self._cache:
+            return
+        at, rt = (token, pair_token) if is_access_token else (pair_token, token)
+        await asyncio.gather(
+            *self._forget_session(user_id, at, rt),
+            self._cache.delete(at),
+            self._cache.delete(rt),
+        )
+
+    async def clear_other_sessions(
+        self, token: str, is_access_token: bool = True
+    ) -> None:
         if not self._is_multy_session:
             return
-        user_id, _, _ = self.verify_token(token, is_access_token)
+        (user_id, _, _), pair_token = await self._verify(token, is_access_token)
         if not self._cache:
             return
-        pair_token = self._cache.get(token)
-        key_rt = self._key_template_refresh.format(id=user_id)
-        key_at = self._key_template_access.format(id=user_id)
-        for item in self._cache.lrange(key_at):
-            if item == pair_token or item == token:
-                continue
-            else:
-                self._cache.lrem(key_at, item)
-                tmp_pair_token = self._cache.get(item)
-                self._cache.lrem(key_rt, tmp_pair_token)
-                self._cache.delete(item)
-                self._cache.delete(pair_token)
-
-        pass
+        keys = (
+            self._key_template_access.format(id=user_id),
+            self._key_template_refresh.format(id=user_id),
+        )
+        lists = await asyncio.gather(*(self._cache.lrange(key) for key in keys))
+        commands = []
+        for key, item in self._other_tokens(keys, lists, token, pair_token):
+            commands.append(self._cache.lrem(key=key, val=item))
+            commands.append(self._cache.delete(item))
+        await asyncio.gather(*commands)
 
-    def refresh_pair_tokens(self, refresh_token: str) -> tuple[str, str]:
-        return self.update_user_data(refresh_token, is_access_token=False)
+    async def refresh_pair_tokens(self, refresh_token: str) -> tuple[str, str]:
+        return await self.update_user_data(refresh_token, is_access_token=False)
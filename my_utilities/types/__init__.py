@@ -1 +1,12 @@
+from .expiry import (
+    BucketExpiryEngine,
+    ExpiryEngine,
+    HeapExpiryEngine,
+    Reaper,
+    TimingWheelExpiryEngine,
+)
 from .ttl_dict import *
+from .async_ttl_dict import AsyncioExpiryEngine, AsyncTTLDict
+from .sharded_ttl_dict import ShardedTTLDict
+from .shared_ttl_dict import SharedTTLDict
+from .ttl_stats import LatencyHistogram, TTLDictStats
@@ -0,0 +1,206 @@
+"""
+Module with TTL dictionary for asyncio applications
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from time import monotonic
+from typing import Any
+
+from .expiry import HeapExpiryEngine
+from .ttl_dict import EvictionPolicy, TTLDict, shallow_size
+
+
+class AsyncioExpiryEngine(HeapExpiryEngine):
+    """
+    Heap expiry engine serviced by the asyncio event loop
+
+    Instead of a reaper thread the engine keeps one timer handle on the loop,
+     armed for the earliest deadline, so keys expire on the loop thread.
+     Once the loop is closed the engine moves to the next running loop.
+
+    :param loop: the event loop to use, the running loop if None
+    :type loop: asyncio.AbstractEventLoop | None
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        """
+        init asyncio expiry engine
+
+        :param loop: the event loop to use, the running loop if None
+        :type loop: asyncio.AbstractEventLoop | None
+        """
+        # serviced in the background by the loop, not by a reaper thread
+        super().__init__(background=False)
+        self.background = True
+        self._loop = loop
+        self._handle = None  # type: asyncio.TimerHandle | None
+
+    def close(self) -> None:
+        super().close()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop | None:
+        """
+        Event loop to arm the timer on
+
+        A closed loop is replaced by the running one, its timer never fires.
+
+        :return: the loop or None if the engine is used outside a running loop
+        :rtype: asyncio.AbstractEventLoop | None
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return None
+            self._loop = loop
+            self._handle = None
+        return loop
+
+    def _notify(self, deadline: float) -> None:
+        """
+        Re-arm the loop timer if the new deadline is earlier than the armed one
+
+        Keys scheduled outside a running loop are armed with the next
+         schedule inside it and are expired on access meanwhile.
+         Must be called with ``self._lock`` held.
+
+        :param deadline: scheduled deadline
+        :type deadline: float
+        """
+        if self._closed:
+            return
+        loop = self._get_loop()
+        if loop is None:
+            return
+        if self._handle is not None:
+            if deadline >= self._wake_at:
+                return
+            self._handle.cancel()
+        else:
+            # keys scheduled while no timer was armed may be due sooner
+            deadline = min(deadline, self._next_deadline() or deadline)
+        self._wake_at = deadline
+        self._handle = loop.call_later(max(deadline - monotonic(), 0.0), self._on_timer)
+
+    def _on_timer(self) -> None:
+        """
+        Expire due keys and arm the timer for the next deadline
+        """
+        self._handle = None
+        delay = self._run_pending()
+        if delay is not None and not self._closed and self._loop is not None:
+            self._handle = self._loop.call_later(delay, self._on_timer)
+
+
+class AsyncTTLDict(TTLDict):
+    """
+    AsyncTTLDict(default_ttl=300)
+
+    TTLDict for asyncio applications. Keys are expired by a timer
+     on the event loop instead of a thread, and callbacks run on the loop.
+     ``function_on_expired`` and ``function_on_evicted`` may be coroutine
+     functions, they are scheduled as tasks.
+
+    :param default_ttl: The default time-to-live for keys in seconds.
+    :type default_ttl: float
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = 300,
+        function_on_expired: Callable[[Any], Awaitable[None] | None] | None = None,
+        loop: asyncio.AbstractEventLoop | None = None,
+        maxsize: int | None = None,
+        function_on_evicted: Callable[[Any], Awaitable[None] | None] | None = None,
+        function_on_expired_batch: (
+            Callable[[list[Any]], Awaitable[None] | None] | None
+        ) = None,
+        batch_size: int = 100,
+        batch_delay: float = 1.0,
+        stats: bool = False,
+        max_bytes: int | None = None,
+        sizer: Callable[[Any, Any], int] = shallow_size,
+        eviction_policy: EvictionPolicy | str = EvictionPolicy.LRU,
+        sliding: bool = False,
+    ) -> None:  # pragma: no cover
+        """
+        init async ttl dict
+
+        :param default_ttl: The default time-to-live for keys in seconds.
+        :type default_ttl: float
+        :param function_on_expired: the function or coroutine function
+         that will be used when the key expires
+        :type function_on_expired: Callable[[Any], Awaitable[None] | None] | None
+        :param loop: the event loop to use, the running loop if None
+        :type loop: asyncio.AbstractEventLoop | None
+        :param maxsize: maximum number of keys, unbounded if None
+        :type maxsize: int | None
+        :param function_on_evicted: the function or coroutine function
+         that will be used when the key is evicted to stay within maxsize
+        :type function_on_evicted: Callable[[Any], Awaitable[None] | None] | None
+        :param function_on_expired_batch: the function or coroutine function
+         that will be used with a list of expired keys
+        :type function_on_expired_batch:
+         Callable[[list[Any]], Awaitable[None] | None] | None
+        :param batch_size: maximum number of keys in one batch
+        :type batch_size: int
+        :param batch_delay: maximum time in seconds a key waits for its batch
+        :type batch_delay: float
+        :param stats: collect statistics, see :meth:`TTLDict.stats`
+        :type stats: bool
+        :param max_bytes: approximate memory budget in bytes, see :class:`TTLDict`
+        :type max_bytes: int | None
+        :param sizer: function returning the size of a key and its value in bytes
+        :type sizer: Callable[[Any, Any], int]
+        :param eviction_policy: which key is evicted to stay within the limits
+        :type eviction_policy: EvictionPolicy | str
+        :param sliding: reading a key with get or ``[]`` moves its deadline
+        :type sliding: bool
+        """
+        self._loop_engine = AsyncioExpiryEngine(loop=loop)
+        super().__init__(
+            default_ttl=default_ttl,
+            function_on_expired=function_on_expired,  # type: ignore
+            engine=self._loop_engine,
+            maxsize=maxsize,
+            function_on_evicted=function_on_evicted,  # type: ignore
+            function_on_expired_batch=function_on_expired_batch,  # type: ignore
+            batch_size=batch_size,
+            batch_delay=batch_delay,
+            stats=stats,
+            max_bytes=max_bytes,
+            sizer=sizer,
+            eviction_policy=eviction_policy,
+            sliding=sliding,
+        )
+        self._tasks = set()  # type: set[asyncio.Future[Any]]
+
+    def _call(self, function: Callable[[Any], Any], argument: Any) -> None:
+        """
+        Run a user callback, awaitable results become tasks
+
+        :param function: function_on_expired, function_on_evicted
+         or function_on_expired_batch
+        :type function: Callable[[Any], Any]
+        :param argument: The key or the list of keys passed to the callback.
+        :type argument: Any
+        """
+        result = self._run_callback(function, argument)
+        if result is not None:
+            task = asyncio.ensure_future(result, loop=self._loop_engine._get_loop())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def wait_callbacks(self) -> None:
+        """
+        Wait until all callbacks scheduled as tasks are finished
+        """
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,913 @@
+"""
+Module with expiry engines for containers with time-to-live (TTL) keys
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator
+import heapq
+from itertools import count, islice
+import logging
+import math
+from operator import itemgetter
+import os
+from threading import TIMEOUT_MAX, Event, Lock, Thread
+from time import monotonic
+from typing import Any
+import weakref
+
+logger = logging.getLogger(__name__)
+
+_ENGINES = weakref.WeakSet()  # type: weakref.WeakSet[ExpiryEngine]
+_REAPERS = weakref.WeakSet()  # type: weakref.WeakSet[Reaper]
+
+
+def _reset_after_fork() -> None:  # pragma: no cover
+    """
+    Background threads do not survive ``fork``,
+     engines restart their reaper on the next schedule in the child process
+    """
+    for reaper in list(_REAPERS):
+        reaper._after_fork()
+    for engine in list(_ENGINES):
+        engine._after_fork()
+
+
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _reaper(reaper: Reaper) -> None:
+    """
+    Body of the background thread of a reaper
+
+    The thread keeps only weak references to the engines between iterations,
+     so abandoned containers are garbage collected. It stops when no open
+     engine is left.
+
+    :param reaper: the reaper to run
+    :type reaper: Reaper
+    """
+    while True:
+        with reaper._lock:
+            engines = [engine for engine in reaper._engines if not engine._closed]
+            if not engines:
+                reaper._thread = None
+                return
+        try:
+            timeout = _run_engines(engines)
+            del engines
+            reaper._wakeup.wait(timeout)
+            reaper._wakeup.clear()
+        except Exception:  # pragma: no cover
+            logger.exception("Reaper failed to wait for the next deadline")
+
+
+def _run_engines(engines: list[ExpiryEngine]) -> float | None:
+    """
+    Expire due keys of the engines
+
+    :param engines: engines to service
+    :type engines: list[ExpiryEngine]
+    :return: seconds until the earliest deadline, at most ``TIMEOUT_MAX``,
+     or None if nothing is scheduled
+    :rtype: float | None
+    """
+    timeout = None  # type: float | None
+    for engine in engines:
+        try:
+            pending = engine._run_pending()
+        except Exception:  # pragma: no cover
+            logger.exception("Expiry engine failed to expire keys")
+            continue
+        if pending is not None and (timeout is None or pending < timeout):
+            timeout = pending
+    return None if timeout is None else min(timeout, TIMEOUT_MAX)
+
+
+def _walk(heap: list[Any]) -> Iterator[Any]:
+    """
+    Items of a :mod:`heapq` heap in ascending order, the heap is not modified
+
+    Children of visited items are pushed into a second heap, so the first
+     ``k`` items cost O(k log k) however large the heap is.
+
+    :param heap: the heap to walk
+    :type heap: list[Any]
+    :rtype: Iterator[Any]
+    """
+    if not heap:
+        return
+    size = len(heap)
+    candidates = [(heap[0], 0)]
+    while candidates:
+        item, index = heapq.heappop(candidates)
+        yield item
+        for child in (2 * index + 1, 2 * index + 2):
+            if child < size:
+                heapq.heappush(candidates, (heap[child], child))
+
+
+class Reaper:
+    """
+    Background thread servicing the deadlines of one or more expiry engines
+
+    Every background engine creates its own reaper unless one is given,
+     engines sharing a reaper are serviced by a single thread.
+     The thread is started by the first schedule and stops
+     when all its engines are closed or garbage collected.
+    """
+
+    def __init__(self) -> None:
+        """
+        init reaper
+        """
+        self._engines = weakref.WeakSet()  # type: weakref.WeakSet[ExpiryEngine]
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._thread = None  # type: Thread | None
+        _REAPERS.add(self)
+
+    def add(self, engine: ExpiryEngine) -> None:
+        """
+        Service the engine from this reaper
+
+        :param engine: engine to service
+        :type engine: ExpiryEngine
+        """
+        self._engines.add(engine)
+        weakref.finalize(engine, self._wakeup.set)
+
+    def wake(self, engine: ExpiryEngine) -> None:
+        """
+        Start the thread or make it recompute how long to sleep
+
+        :param engine: the engine whose earliest deadline changed
+        :type engine: ExpiryEngine
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(
+                    target=_reaper,
+                    args=(self,),
+                    name=f"{type(engine).__name__}-reaper",
+                    daemon=True,
+                )
+                self._thread.start()
+                return
+        self._wakeup.set()
+
+    def _after_fork(self) -> None:  # pragma: no cover
+        """
+        Drop the reference to the thread that did not survive ``fork``
+        """
+        self._lock = Lock()
+        self._thread = None
+
+
+class ExpiryEngine(ABC):
+    """
+    Base class for expiry engines
+
+    An engine stores a monotonic deadline for every scheduled key
+     and reports keys whose deadline has passed. Background engines
+     service deadlines from a single thread and pass expired keys
+     to the callback given to :meth:`bind`.
+
+    :param background: run a reaper thread for this engine
+    :type background: bool
+    :param reaper: reaper thread shared with other engines,
+     a new one if None
+    :type reaper: Reaper | None
+    """
+
+    def __init__(self, background: bool = True, reaper: Reaper | None = None) -> None:
+        """
+        init expiry engine
+
+        :param background: run a reaper thread for this engine
+        :type background: bool
+        :param reaper: reaper thread shared with other engines,
+         a new one if None
+        :type reaper: Reaper | None
+        """
+        self.background = background
+        self._lock = Lock()
+        self._callback = None  # type: Callable[[list[Any]], None] | None
+        self._reaper = None  # type: Reaper | None
+        if background:
+            self._reaper = reaper if reaper is not None else Reaper()
+            self._reaper.add(self)
+        self._wake_at = None  # type: float | None
+        self._closed = False
+        _ENGINES.add(self)
+
+    def bind(self, callback: Callable[[list[Any]], None]) -> None:
+        """
+        Set the function that receives expired keys from the reaper thread
+
+        :param callback: function called with a list of expired keys
+        :type callback: Callable[[list[Any]], None]
+        """
+        self._callback = callback
+
+    @abstractmethod
+    def schedule(self, key: Any, deadline: float) -> None:
+        """
+        Schedule or reschedule expiry of the key
+
+        :param key: key to expire
+        :type key: Any
+        :param deadline: monotonic time when the key expires
+        :type deadline: float
+        """
+        raise NotImplementedError
+
+    def schedule_many(self, items: Iterable[tuple[Any, float]]) -> None:
+        """
+        Schedule or reschedule expiry of many keys at once
+
+        :param items: pairs of key and its monotonic deadline
+        :type items: Iterable[tuple[Any, float]]
+        """
+        for key, deadline in items:
+            self.schedule(key, deadline)
+
+    @abstractmethod
+    def cancel(self, key: Any) -> None:
+        """
+        Forget the key, missing keys are ignored
+
+        :param key: key to forget
+        :type key: Any
+        """
+        raise NotImplementedError
+
+    def cancel_many(self, keys: Iterable[Any]) -> None:
+        """
+        Forget many keys at once, missing keys are ignored
+
+        :param keys: keys to forget
+        :type keys: Iterable[Any]
+        """
+        for key in keys:
+            self.cancel(key)
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Forget all keys
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def pop_expired(self, now: float, limit: int | None = None) -> list[Any]:
+        """
+        Remove and return keys with deadline not later than ``now``
+
+        :param now: current monotonic time
+        :type now: float
+        :param limit: maximum number of keys to return, all if None
+        :type limit: int | None
+        :return: expired keys in deadline order
+        :rtype: list[Any]
+        """
+        raise NotImplementedError
+
+    def next_deadline(self) -> float | None:
+        """
+        Time when the engine has to be serviced next
+
+        :return: monotonic time of the nearest expiry or None if nothing is scheduled
+        :rtype: float | None
+        """
+        with self._lock:
+            return self._next_deadline()
+
+    @abstractmethod
+    def _next_deadline(self) -> float | None:
+        """
+        Same as :meth:`next_deadline`, must be called with ``self._lock`` held
+        """
+        raise NotImplementedError
+
+    def peek(self, limit: int = 1) -> list[tuple[Any, float]]:
+        """
+        Keys that expire first, without removing them from the engine
+
+        Engines may order keys within their resolution. The deadline is the one
+         the engine keeps for the key, the owner may have moved it since.
+
+        :param limit: maximum number of keys to return
+        :type limit: int
+        :return: pairs of key and its deadline, soonest first
+        :rtype: list[tuple[Any, float]]
+        :raise NotImplementedError: if the engine cannot order its keys
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot find the soonest key")
+
+    def soonest(self) -> Any | None:
+        """
+        Key that expires first, engines may answer within their resolution
+
+        :return: the key or None if nothing is scheduled
+        :rtype: Any | None
+        :raise NotImplementedError: if the engine cannot order its keys
+        """
+        found = self.peek(1)
+        return found[0][0] if found else None
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Stop the reaper thread and forget all keys
+        """
+        self._closed = True
+        self.clear()
+        if self._reaper is not None:
+            self._reaper._wakeup.set()
+
+    def _notify(self, deadline: float) -> None:
+        """
+        Wake the reaper if the new deadline is earlier than the one it waits for
+
+        Must be called with ``self._lock`` held.
+
+        :param deadline: scheduled deadline
+        :type deadline: float
+        """
+        if not self.background or self._closed:
+            return
+        if self._wake_at is None or deadline < self._wake_at:
+            self._wake_at = deadline
+            self._reaper.wake(self)
+
+    def _run_pending(self) -> float | None:
+        """
+        Expire due keys and compute how long the reaper may sleep
+
+        :return: seconds until the next deadline or None if nothing is scheduled
+        :rtype: float | None
+        """
+        expired = self.pop_expired(monotonic())
+        if expired and self._callback is not None:
+            self._callback(expired)
+        with self._lock:
+            deadline = self._wake_at = self._next_deadline()
+        if deadline is None:
+            return None
+        return max(deadline - monotonic(), 0.0)
+
+    def _after_fork(self) -> None:  # pragma: no cover
+        """
+        Restart the reaper that did not survive ``fork`` if keys are scheduled
+        """
+        self._lock = Lock()
+        self._wake_at = None
+        if len(self):
+            self._notify(0.0)
+
+
+class HeapExpiryEngine(ExpiryEngine):
+    """
+    Expiry engine that keeps all deadlines in one min-heap
+
+    Insert and reschedule cost O(log n). A rescheduled or cancelled key leaves
+     a stale record in the heap, which is skipped when popped; the heap is
+     rebuilt when stale records outnumber live ones.
+
+    :param background: run a reaper thread for this engine
+    :type background: bool
+    :param reaper: reaper thread shared with other engines
+    :type reaper: Reaper | None
+    """
+
+    def __init__(self, background: bool = True, reaper: Reaper | None = None) -> None:
+        """
+        init heap expiry engine
+
+        :param background: run a reaper thread for this engine
+        :type background: bool
+        :param reaper: reaper thread shared with other engines,
+         a new one if None
+        :type reaper: Reaper | None
+        """
+        super().__init__(background=background, reaper=reaper)
+        self._heap = []  # type: list[tuple[float, int, Any]]
+        self._deadlines = {}  # type: dict[Any, float]
+        self._counter = count()
+
+    def schedule(self, key: Any, deadline: float) -> None:
+        with self._lock:
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._counter), key))
+            self._compact()
+            self._notify(deadline)
+
+    def schedule_many(self, items: Iterable[tuple[Any, float]]) -> None:
+        """
+        Schedule many keys taking the lock once
+
+        A batch larger than the heap is appended and the heap is rebuilt
+         with one heapify in O(n) instead of pushing keys one by one.
+
+        :param items: pairs of key and its monotonic deadline
+        :type items: Iterable[tuple[Any, float]]
+        """
+        if not isinstance(items, list):
+            items = list(items)
+        if not items:
+            return
+        with self._lock:
+            counter = self._counter
+            records = [(deadline, next(counter), key) for key, deadline in items]
+            self._deadlines.update(items)
+            if len(records) > len(self._heap):
+                self._heap.extend(records)
+                heapq.heapify(self._heap)
+            else:
+                for record in records:
+                    heapq.heappush(self._heap, record)
+            self._compact()
+            self._notify(min(deadline for _, deadline in items))
+
+    def cancel(self, key: Any) -> None:
+        with self._lock:
+            self._deadlines.pop(key, None)
+            self._compact()
+
+    def cancel_many(self, keys: Iterable[Any]) -> None:
+        with self._lock:
+            for key in keys:
+                self._deadlines.pop(key, None)
+            self._compact()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self._deadlines.clear()
+
+    def pop_expired(self, now: float, limit: int | None = None) -> list[Any]:
+        expired = []  # type: list[Any]
+        with self._lock:
+            heap = self._heap
+            deadlines = self._deadlines
+            while heap and heap[0][0] <= now:
+                if limit is not None and len(expired) >= limit:
+                    break
+                deadline, _, key = heapq.heappop(heap)
+                if deadlines.get(key) == deadline:
+                    del deadlines[key]
+                    expired.append(key)
+        return expired
+
+    def _next_deadline(self) -> float | None:
+        heap = self._heap
+        deadlines = self._deadlines
+        while heap and deadlines.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def peek(self, limit: int = 1) -> list[tuple[Any, float]]:
+        found = {}  # type: dict[Any, float]
+        with self._lock:
+            deadlines = self._deadlines
+            for deadline, _, key in _walk(self._heap):
+                if len(found) >= limit:
+                    break
+                if deadlines.get(key) == deadline:
+                    found.setdefault(key, deadline)
+        return list(found.items())
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def _compact(self) -> None:
+        """
+        Rebuild the heap without stale records once they dominate it
+
+        Must be called with ``self._lock`` held.
+        """
+        if len(self._heap) <= 2 * len(self._deadlines) + 64:
+            return
+        deadlines = self._deadlines
+        self._heap = [item for item in self._heap if deadlines.get(item[2]) == item[0]]
+        heapq.heapify(self._heap)
+
+
+class TimingWheelExpiryEngine(ExpiryEngine):
+    """
+    Expiry engine built on a hierarchical timing wheel
+
+    Time is split into ticks of ``tick`` seconds. Level ``n`` of the wheel has
+     ``wheel_size`` slots of ``wheel_size ** n`` ticks each, keys far in the
+     future sit in coarse slots and cascade to finer levels as time advances.
+     Schedule, reschedule and cancel cost O(1); keys expire at most one tick late.
+     Deadlines beyond the range of the top level are parked in its farthest slot
+     and cascade again until they fit.
+
+    :param tick: resolution of the wheel in seconds
+    :type tick: float
+    :param wheel_size: number of slots on each level, a power of two
+    :type wheel_size: int
+    :param levels: number of levels of the wheel
+    :type levels: int
+    :param background: run a reaper thread for this engine
+    :type background: bool
+    :param reaper: reaper thread shared with other engines
+    :type reaper: Reaper | None
+    """
+
+    def __init__(
+        self,
+        tick: float = 0.01,
+        wheel_size: int = 64,
+        levels: int = 4,
+        background: bool = True,
+        reaper: Reaper | None = None,
+    ) -> None:
+        """
+        init timing wheel expiry engine
+
+        :param tick: resolution of the wheel in seconds
+        :type tick: float
+        :param wheel_size: number of slots on each level, a power of two
+        :type wheel_size: int
+        :param levels: number of levels of the wheel
+        :type levels: int
+        :param background: run a reaper thread for this engine
+        :type background: bool
+        :param reaper: reaper thread shared with other engines,
+         a new one if None
+        :type reaper: Reaper | None
+        :raise ValueError: if tick is not positive, wheel_size is not a power of two
+         or levels is less than 1
+        """
+        if tick <= 0:
+            raise ValueError("tick must be greater than 0")
+        if wheel_size < 2 or wheel_size & (wheel_size - 1):
+            raise ValueError("wheel_size must be a power of two")
+        if levels < 1:
+            raise ValueError("levels must be greater than 0")
+        super().__init__(background=background, reaper=reaper)
+        self._tick = tick
+        self._bits = wheel_size.bit_length() - 1
+        self._mask = wheel_size - 1
+        self._levels = levels
+        self._wheels = [
+            [{} for _ in range(wheel_size)] for _ in range(levels)
+        ]  # type: list[list[dict[Any, float]]]
+        self._due = {}  # type: dict[Any, float]
+        self._slots = {}  # type: dict[Any, dict[Any, float]]
+        self._current = int(monotonic() / tick)
+
+    def schedule(self, key: Any, deadline: float) -> None:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                del slot[key]
+            self._place(key, deadline)
+            self._notify(deadline)
+
+    def schedule_many(self, items: Iterable[tuple[Any, float]]) -> None:
+        with self._lock:
+            earliest = None
+            for key, deadline in items:
+                slot = self._slots.get(key)
+                if slot is not None:
+                    del slot[key]
+                self._place(key, deadline)
+                if earliest is None or deadline < earliest:
+                    earliest = deadline
+            if earliest is not None:
+                self._notify(earliest)
+
+    def cancel(self, key: Any) -> None:
+        with self._lock:
+            slot = self._slots.pop(key, None)
+            if slot is not None:
+                del slot[key]
+
+    def cancel_many(self, keys: Iterable[Any]) -> None:
+        with self._lock:
+            for key in keys:
+                slot = self._slots.pop(key, None)
+                if slot is not None:
+                    del slot[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            for wheel in self._wheels:
+                for slot in wheel:
+                    slot.clear()
+            self._due.clear()
+            self._slots.clear()
+
+    def pop_expired(self, now: float, limit: int | None = None) -> list[Any]:
+        with self._lock:
+            self._advance(int(now / self._tick))
+            expired = list(islice(self._due, limit))
+            for key in expired:
+                del self._due[key]
+                del self._slots[key]
+        return expired
+
+    def _next_deadline(self) -> float | None:
+        if self._due:
+            return min(self._due.values())
+        nearest = self._nearest()
+        return None if nearest is None else nearest[0] * self._tick
+
+    def peek(self, limit: int = 1) -> list[tuple[Any, float]]:
+        """
+        Keys that expire first, without removing them from the engine
+
+        Slots are read in the order the wheel visits them until the next slot
+         cannot hold a key sooner than the keys found, so coarse slots that
+         overlap finer ones are ordered by the deadlines of their keys.
+
+        :param limit: maximum number of keys to return
+        :type limit: int
+        :return: pairs of key and its deadline, soonest first
+        :rtype: list[tuple[Any, float]]
+        """
+        deadline = itemgetter(1)
+        with self._lock:
+            found = heapq.nsmallest(limit, self._due.items(), key=deadline)
+            for tick, slot in self._visits():
+                # keys of the slot expire after the tick before its visit
+                if len(found) >= limit and found[-1][1] <= (tick - 1) * self._tick:
+                    break
+                found = heapq.nsmallest(limit, found + list(slot.items()), key=deadline)
+        return found
+
+    def _visits(self) -> list[tuple[int, dict[Any, float]]]:
+        """
+        Non-empty slots of all levels with the tick the wheel visits them at
+
+        Must be called with ``self._lock`` held.
+
+        :return: pairs of tick and slot in visiting order
+        :rtype: list[tuple[int, dict[Any, float]]]
+        """
+        current = self._current
+        visits = []  # type: list[tuple[int, dict[Any, float]]]
+        for level, wheel in enumerate(self._wheels):
+            shift = self._bits * level
+            for step in range(1, self._mask + 2):
+                tick = ((current >> shift) + step) << shift
+                slot = wheel[(tick >> shift) & self._mask]
+                if slot:
+                    visits.append((tick, slot))
+        visits.sort(key=lambda visit: visit[0])
+        return visits
+
+    def _nearest(self) -> tuple[int, dict[Any, float]] | None:
+        """
+        The first tick with a non-empty slot and that slot
+
+        Must be called with ``self._lock`` held.
+
+        :rtype: tuple[int, dict[Any, float]] | None
+        """
+        if not self._slots:
+            return None
+        current = self._current
+        wheel_size = self._mask + 1
+        nearest = None  # type: tuple[int, dict[Any, float]] | None
+        for level, wheel in enumerate(self._wheels):
+            shift = self._bits * level
+            for step in range(1, wheel_size + 1):
+                if level:
+                    tick = ((current >> shift) + step) << shift
+                else:
+                    tick = current + step
+                if nearest is not None and tick >= nearest[0]:
+                    break
+                slot = wheel[(tick >> shift) & self._mask]
+                if slot:
+                    nearest = (tick, slot)
+                    break
+        return nearest
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _place(self, key: Any, deadline: float) -> None:
+        """
+        Put the key into the slot that is visited when its deadline comes
+
+        Must be called with ``self._lock`` held.
+
+        :param key: key to place
+        :type key: Any
+        :param deadline: monotonic time when the key expires
+        :type deadline: float
+        """
+        expires = math.ceil(deadline / self._tick)
+        delta = expires - self._current
+        if delta <= 0:
+            slot = self._due
+        else:
+            for level in range(self._levels):
+                if delta >> (self._bits * (level + 1)) == 0:
+                    break
+            else:
+                expires = self._current + (1 << (self._bits * self._levels)) - 1
+            shift = self._bits * level
+            slot = self._wheels[level][(expires >> shift) & self._mask]
+        slot[key] = deadline
+        self._slots[key] = slot
+
+    def _advance(self, target: int) -> None:
+        """
+        Move the wheel to the tick ``target`` collecting due keys
+
+        Must be called with ``self._lock`` held. The wheel jumps straight to
+         the next tick with a non-empty slot on any level, empty ticks cost nothing.
+
+        :param target: tick to move to
+        :type target: int
+        """
+        wheels = self._wheels
+        while self._current < target:
+            nearest = None
+            if len(self._slots) != len(self._due):
+                nearest = self._nearest()
+            if nearest is None or nearest[0] > target:
+                self._current = target
+                return
+            self._current = current = nearest[0]
+            for level in range(self._levels - 1, 0, -1):
+                shift = self._bits * level
+                if current & ((1 << shift) - 1):
+                    continue
+                slot = wheels[level][(current >> shift) & self._mask]
+                if slot:
+                    items = list(slot.items())
+                    slot.clear()
+                    for key, deadline in items:
+                        self._place(key, deadline)
+            slot = wheels[0][current & self._mask]
+            if slot:
+                for key, deadline in sorted(slot.items(), key=lambda item: item[1]):
+                    self._due[key] = deadline
+                    self._slots[key] = self._due
+                slot.clear()
+
+
+class BucketExpiryEngine(ExpiryEngine):
+    """
+    Compact expiry engine that groups deadlines into buckets
+
+    Deadlines are rounded down to buckets of ``resolution`` seconds and
+     a bucket expires as a whole once its end has passed, so keys expire
+     at most ``resolution`` seconds late. The engine keeps no deadline per key,
+     a key costs one dictionary entry and one list slot. A rescheduled or
+     cancelled key leaves a stale slot in its old bucket, which is skipped
+     when that bucket expires.
+
+    :param resolution: width of a bucket in seconds
+    :type resolution: float
+    :param background: run a reaper thread for this engine
+    :type background: bool
+    :param reaper: reaper thread shared with other engines
+    :type reaper: Reaper | None
+    """
+
+    def __init__(
+        self,
+        resolution: float = 1.0,
+        background: bool = True,
+        reaper: Reaper | None = None,
+    ) -> None:
+        """
+        init bucket expiry engine
+
+        :param resolution: width of a bucket in seconds
+        :type resolution: float
+        :param background: run a reaper thread for this engine
+        :type background: bool
+        :param reaper: reaper thread shared with other engines,
+         a new one if None
+        :type reaper: Reaper | None
+        :raise ValueError: if resolution is not positive
+        """
+        if resolution <= 0:
+            raise ValueError("resolution must be greater than 0")
+        super().__init__(background=background, reaper=reaper)
+        self._resolution = resolution
+        self._buckets = {}  # type: dict[int, list[Any]]
+        self._order = []  # type: list[int]
+        self._where = {}  # type: dict[Any, list[Any]]
+
+    def schedule(self, key: Any, deadline: float) -> None:
+        with self._lock:
+            expires = self._place(key, deadline)
+            if expires is not None:
+                self._notify(expires)
+
+    def schedule_many(self, items: Iterable[tuple[Any, float]]) -> None:
+        with self._lock:
+            earliest = None
+            for key, deadline in items:
+                expires = self._place(key, deadline)
+                if expires is not None and (earliest is None or expires < earliest):
+                    earliest = expires
+            if earliest is not None:
+                self._notify(earliest)
+
+    def cancel(self, key: Any) -> None:
+        with self._lock:
+            self._where.pop(key, None)
+
+    def cancel_many(self, keys: Iterable[Any]) -> None:
+        with self._lock:
+            for key in keys:
+                self._where.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._order.clear()
+            self._where.clear()
+
+    def pop_expired(self, now: float, limit: int | None = None) -> list[Any]:
+        expired = []  # type: list[Any]
+        with self._lock:
+            order = self._order
+            where = self._where
+            last = math.floor(now / self._resolution)
+            while order and order[0] < last:
+                bucket = self._buckets[order[0]]
+                while bucket:
+                    if limit is not None and len(expired) >= limit:
+                        return expired
+                    key = bucket.pop()
+                    if where.get(key) is bucket:
+                        del where[key]
+                        expired.append(key)
+                del self._buckets[heapq.heappop(order)]
+        return expired
+
+    def _next_deadline(self) -> float | None:
+        if not self._order:
+            return None
+        return (self._order[0] + 1) * self._resolution
+
+    def peek(self, limit: int = 1) -> list[tuple[Any, float]]:
+        """
+        Keys of the earliest buckets, without removing them from the engine
+
+        Keys of one bucket come in no particular order,
+         the end of the bucket is reported as their deadline.
+
+        :param limit: maximum number of keys to return
+        :type limit: int
+        :return: pairs of key and the end of its bucket, soonest first
+        :rtype: list[tuple[Any, float]]
+        """
+        found = {}  # type: dict[Any, float]
+        with self._lock:
+            where = self._where
+            for index in _walk(self._order):
+                bucket = self._buckets[index]
+                end = (index + 1) * self._resolution
+                for key in bucket:
+                    if len(found) >= limit:
+                        return list(found.items())
+                    if where.get(key) is bucket:
+                        found.setdefault(key, end)
+        return list(found.items())
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def _place(self, key: Any, deadline: float) -> float | None:
+        """
+        Put the key into the bucket of its deadline
+
+        Must be called with ``self._lock`` held.
+
+        :param key: key to place
+        :type key: Any
+        :param deadline: monotonic time when the key expires
+        :type deadline: float
+        :return: time when the bucket expires,
+         None if the key already was in that bucket
+        :rtype: float | None
+        """
+        index = math.floor(deadline / self._resolution)
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            bucket = self._buckets[index] = []
+            heapq.heappush(self._order, index)
+        elif self._where.get(key) is bucket:
+            return None
+        bucket.append(key)
+        self._where[key] = bucket
+        return (index + 1) * self._resolution
@@ -0,0 +1,384 @@
+"""
+Module with thread-safe TTL dictionary split into independently locked shards
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import Executor
+from itertools import chain
+import math
+from threading import BoundedSemaphore
+from typing import Any
+
+from .expiry import ExpiryEngine, Reaper
+from .ttl_dict import (
+    CallbackOverflowPolicy,
+    EvictionPolicy,
+    TTLDict,
+    _default_engine,
+    shallow_size,
+)
+from .ttl_stats import TTLDictStats
+from ..view.converter_size_to_pretty_view import size as pretty_size
+
+
+class ShardedTTLDict:
+    """
+    ShardedTTLDict(default_ttl=300, shards=16)
+
+    A TTL dictionary that hashes keys across independent :class:`TTLDict`
+     shards. Every shard has its own lock and expiry engine,
+     so threads working with keys of different shards do not contend.
+     The default engines of all shards are serviced by one reaper thread
+     and callbacks of all shards share one queue of ``max_pending_callbacks``.
+
+    :param default_ttl: The default time-to-live for keys in seconds.
+    :type default_ttl: float
+    :param _shards: The shards keys are distributed over.
+    :type _shards: list[TTLDict]
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = 300,
+        shards: int = 16,
+        function_on_expired: Callable[[Any], None] | None = None,
+        engine_factory: Callable[[], ExpiryEngine] | None = None,
+        lazy: bool = False,
+        maxsize: int | None = None,
+        function_on_evicted: Callable[[Any], None] | None = None,
+        function_on_expired_batch: Callable[[list[Any]], None] | None = None,
+        batch_size: int = 100,
+        batch_delay: float = 1.0,
+        callback_executor: Executor | None = None,
+        callback_loop: asyncio.AbstractEventLoop | None = None,
+        max_pending_callbacks: int = 1000,
+        overflow_policy: CallbackOverflowPolicy | str = (
+            CallbackOverflowPolicy.CALLER_RUNS
+        ),
+        compact: bool = False,
+        stats: bool = False,
+        stats_sample_rate: int = 100,
+        max_bytes: int | None = None,
+        sizer: Callable[[Any, Any], int] = shallow_size,
+        eviction_policy: EvictionPolicy | str = EvictionPolicy.LRU,
+        sliding: bool = False,
+    ) -> None:  # pragma: no cover
+        """
+        init sharded ttl dict
+
+        :param default_ttl: The default time-to-live for keys in seconds.
+        :type default_ttl: float
+        :param shards: number of shards
+        :type shards: int
+        :param function_on_expired: the function that will be used when the key expires
+        :type function_on_expired: Callable[[Any], None] | None
+        :param engine_factory: function creating the expiry engine of a shard,
+         the default engine of TTLDict with one :class:`Reaper` for all shards
+         if None
+        :type engine_factory: Callable[[], ExpiryEngine] | None
+        :param lazy: expire keys on access and on writes without background threads
+        :type lazy: bool
+        :param maxsize: maximum number of keys, split evenly between shards,
+         each shard evicts its least recently used key
+        :type maxsize: int | None
+        :param function_on_evicted: the function that will be used when the key
+         is evicted to stay within maxsize
+        :type function_on_evicted: Callable[[Any], None] | None
+        :param function_on_expired_batch: the function that will be used
+         with a list of expired keys, every shard delivers its own batches
+        :type function_on_expired_batch: Callable[[list[Any]], None] | None
+        :param batch_size: maximum number of keys in one batch
+        :type batch_size: int
+        :param batch_delay: maximum time in seconds a key waits for its batch
+        :type batch_delay: float
+        :param callback_executor: executor to run callbacks on
+        :type callback_executor: Executor | None
+        :param callback_loop: event loop to run callbacks on
+        :type callback_loop: asyncio.AbstractEventLoop | None
+        :param max_pending_callbacks: maximum number of callbacks queued
+         by all shards on the executor or the loop
+        :type max_pending_callbacks: int
+        :param overflow_policy: what to do with a callback when the queue is full
+        :type overflow_policy: CallbackOverflowPolicy | str
+        :param compact: use the compact storage of :class:`TTLDict` in every shard
+        :type compact: bool
+        :param stats: collect statistics in every shard, see :meth:`stats`
+        :type stats: bool
+        :param stats_sample_rate: time one of this many lookups and writes
+        :type stats_sample_rate: int
+        :param max_bytes: approximate memory budget in bytes,
+         split evenly between shards
+        :type max_bytes: int | None
+        :param sizer: function returning the size of a key and its value in bytes
+        :type sizer: Callable[[Any, Any], int]
+        :param eviction_policy: which key a shard evicts to stay within its limits
+        :type eviction_policy: EvictionPolicy | str
+        :param sliding: reading a key with get or ``[]`` moves its deadline
+        :type sliding: bool
+        :raise ValueError: if shards is less than 1
+        """
+        if shards < 1:
+            raise ValueError("shards must be greater than 0")
+        shard_maxsize = None if maxsize is None else math.ceil(maxsize / shards)
+        shard_max_bytes = None if max_bytes is None else math.ceil(max_bytes / shards)
+        pending_callbacks = BoundedSemaphore(max_pending_callbacks)
+        if engine_factory is None:
+            reaper = Reaper()
+
+            def engine_factory() -> ExpiryEngine:
+                return _default_engine(compact, lazy, reaper)
+
+        self._shards = [
+            TTLDict(
+                default_ttl=default_ttl,
+                function_on_expired=function_on_expired,
+                engine=engine_factory(),
+                lazy=lazy,
+                maxsize=shard_maxsize,
+                function_on_evicted=function_on_evicted,
+                function_on_expired_batch=function_on_expired_batch,
+                batch_size=batch_size,
+                batch_delay=batch_delay,
+                callback_executor=callback_executor,
+                callback_loop=callback_loop,
+                max_pending_callbacks=max_pending_callbacks,
+                overflow_policy=overflow_policy,
+                compact=compact,
+                stats=stats,
+                stats_sample_rate=stats_sample_rate,
+                max_bytes=shard_max_bytes,
+                sizer=sizer,
+                eviction_policy=eviction_policy,
+                sliding=sliding,
+                pending_callbacks=pending_callbacks,
+            )
+            for _ in range(shards)
+        ]
+
+    def _shard(self, key: Any) -> TTLDict:
+        """
+        Shard that owns the key
+
+        :param key: The key to look up.
+        :type key: Any
+        :rtype: TTLDict
+        """
+        return self._shards[hash(key) % len(self._shards)]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._shard(key).set(key, value)
+
+    def set(self, key: Any, value: Any, ttl: float | None = None) -> None:
+        """
+        Set the value of the key with its own time-to-live
+
+        :param key: The key to set.
+        :type key: Any
+        :param value: The value of the key.
+        :type value: Any
+        :param ttl: The time in seconds after which the key should expire,
+         the default TTL if None.
+        :type ttl: float | None
+        """
+        self._shard(key).set(key, value, ttl=ttl)
+
+    def _group(self, keys: Iterable[Any]) -> dict[int, list[Any]]:
+        """
+        Split keys by the index of the shard that owns them
+
+        :param keys: The keys to split.
+        :type keys: Iterable[Any]
+        :rtype: dict[int, list[Any]]
+        """
+        groups = {}  # type: dict[int, list[Any]]
+        count = len(self._shards)
+        for key in keys:
+            groups.setdefault(hash(key) % count, []).append(key)
+        return groups
+
+    def set_many(
+        self,
+        data: Mapping[Any, Any] | Iterable[tuple[Any, Any]],
+        ttl: float | None = None,
+    ) -> None:
+        """
+        Set many keys, every shard is locked once, see :meth:`TTLDict.set_many`
+
+        :param data: mapping or pairs of key and value
+        :type data: Mapping[Any, Any] | Iterable[tuple[Any, Any]]
+        :param ttl: The time in seconds after which the keys should expire,
+         the default TTL if None.
+        :type ttl: float | None
+        """
+        groups = {}  # type: dict[int, list[tuple[Any, Any]]]
+        count = len(self._shards)
+        for item in data.items() if isinstance(data, Mapping) else data:
+            groups.setdefault(hash(item[0]) % count, []).append(item)
+        for index, items in groups.items():
+            self._shards[index].set_many(items, ttl=ttl)
+
+    def get_many(self, keys: Iterable[Any]) -> dict[Any, Any]:
+        """
+        Get values of many keys, missing and expired keys are skipped
+
+        :param keys: The keys to look up.
+        :type keys: Iterable[Any]
+        :rtype: dict[Any, Any]
+        """
+        found = {}  # type: dict[Any, Any]
+        for index, group in self._group(keys).items():
+            found.update(self._shards[index].get_many(group))
+        return found
+
+    def delete_many(self, keys: Iterable[Any]) -> int:
+        """
+        Delete many keys, missing keys are ignored
+
+        :param keys: The keys to delete.
+        :type keys: Iterable[Any]
+        :return: number of deleted keys
+        :rtype: int
+        """
+        return sum(
+            self._shards[index].delete_many(group)
+            for index, group in self._group(keys).items()
+        )
+
+    def extend_ttl(self, key: Any, ttl: float | None = None) -> None:
+        """
+        Reset the time-to-live of the key, see :meth:`TTLDict.extend_ttl`
+
+        :param key: The key for which the TTL is to be extended.
+        :type key: Any
+        :param ttl: The new time-to-live of the key in seconds.
+        :type ttl: float | None
+        :raises KeyError: If the key is not found.
+        """
+        self._shard(key).extend_ttl(key, ttl=ttl)
+
+    def ttl(self, key: Any) -> float | None:
+        """
+        Remaining time-to-live of the key, see :meth:`TTLDict.ttl`
+
+        :param key: The key to look up.
+        :type key: Any
+        :rtype: float | None
+        """
+        return self._shard(key).ttl(key)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._shard(key)[key]
+
+    def __delitem__(self, key: Any) -> None:
+        del self._shard(key)[key]
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._shard(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self._shard(key).get(key, default)
+
+    def pop(self, key: Any, default: Any | None = None) -> Any | None:
+        return self._shard(key).pop(key, default)
+
+    def setdefault(self, key: Any, default: Any | None = None) -> Any | None:
+        """Insert key with a value of default if key is not in the dictionary.
+
+        Return the value for key if key is in the dictionary, else default.
+        """
+        return self._shard(key).setdefault(key, default)
+
+    def update(self, new_data: TTLDict | ShardedTTLDict | dict[Any, Any]) -> None:
+        if isinstance(new_data, (TTLDict, ShardedTTLDict, dict)):
+            self.set_many(new_data.items())
+        else:
+            raise TypeError("Can't update ttl dict")
+
+    def items(self) -> list[tuple[Any, Any]]:
+        """
+        Returns all items of all shards.
+
+        :rtype: list[tuple[Any, Any]]
+        """
+        return list(chain.from_iterable(shard.items() for shard in self._shards))
+
+    def keys(self) -> list[Any]:
+        """
+        Returns the keys of all shards.
+
+        :rtype: list[Any]
+        """
+        return list(chain.from_iterable(shard.keys() for shard in self._shards))
+
+    def values(self) -> list[Any]:
+        """
+        Returns the values of all shards.
+
+        :rtype: list[Any]
+        """
+        return list(chain.from_iterable(shard.values() for shard in self._shards))
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def __str__(self) -> str:
+        return str(dict(self.items()))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (TTLDict, ShardedTTLDict)):
+            return dict(self.items()) == dict(other.items())
+        elif isinstance(other, dict):
+            return dict(self.items()) == other
+        raise TypeError(f"Can't compare ShardedTTLDict and {type(other)}")
+
+    def clear(self) -> None:
+        for shard in self._shards:
+            shard.clear()
+
+    def flush_expired(self) -> None:
+        """
+        Deliver expired keys waiting for their batch in every shard
+        """
+        for shard in self._shards:
+            shard.flush_expired()
+
+    def close(self) -> None:
+        """
+        Remove all keys and stop the expiry engines of all shards.
+        """
+        for shard in self._shards:
+            shard.close()
+
+    def occupancy(self) -> str:
+        """
+        Readable use of the memory budget of all shards, see :meth:`TTLDict.occupancy`
+
+        :rtype: str
+        :raise ValueError: if max_bytes is not set
+        """
+        if self._shards[0]._max_bytes is None:
+            raise ValueError("Occupancy is tracked only with max_bytes")
+        used = sum(shard._bytes for shard in self._shards)
+        budget = sum(shard._max_bytes for shard in self._shards)
+        return (
+            f"{pretty_size(used) if used else '0B'} of {pretty_size(budget)} "
+            f"({used / budget:.1%})"
+        )
+
+    def stats(self) -> TTLDictStats | None:
+        """
+        Statistics summed over all shards, see :meth:`TTLDict.stats`
+
+        :return: statistics or None if the dictionary was created without stats
+        :rtype: TTLDictStats | None
+        """
+        snapshots = [shard.stats() for shard in self._shards]
+        if snapshots[0] is None:
+            return None
+        return TTLDictStats.merge(snapshots)
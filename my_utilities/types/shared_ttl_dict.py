@@ -0,0 +1,556 @@
+"""
+Module with TTL dictionary shared between processes through shared memory
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from hashlib import blake2b
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.synchronize import Lock
+import pickle
+import struct
+from time import monotonic
+from typing import Any
+
+_HEADER = struct.Struct("<8sQQd")
+_MAGIC = b"TTLSHM02"
+_HEADER_SIZE = 64
+# counters in the header after magic, capacity, slot size and default TTL
+_MOVES = 32
+_CURSOR = 40
+_SLOT = struct.Struct("<QQddII")
+_SEQ = struct.Struct("<Q")
+_EMPTY = 0
+_MISSING = object()
+_RETRIES = 100
+_SWEEP_SIZE = 4
+
+
+class SharedTTLDict:
+    """
+    SharedTTLDict(capacity=1024, slot_size=256, default_ttl=300)
+
+    A TTL dictionary stored in :class:`multiprocessing.shared_memory.SharedMemory`
+     so that processes of one host share its entries.
+
+    The memory is a fixed table of ``capacity`` slots of ``slot_size`` bytes
+     with open addressing and linear probing. Every slot keeps the hash,
+     the pickled key and value and the monotonic deadline of one entry,
+     so keys and values must be picklable and fit into a slot together.
+     Keys are compared by their pickled form.
+
+    Writers serialize on a :class:`multiprocessing.Lock` shared by all processes,
+     readers take no lock: every slot is guarded by a sequence counter which
+     is odd while the slot is written, and a reader retries until it copies
+     the slot between two equal even values of the counter.
+
+    Nothing runs in the background: expired entries are never returned,
+     writes delete the expired entries they probe past and a few more
+     after a cursor shared by all processes. A deletion shifts the following
+     entries of the probe chain back, so no tombstones are left and a miss
+     stops at the first empty slot. Readers that miss while entries move
+     retry, the moves are counted by a sequence counter in the header.
+     There are no expiry callbacks, the processes cannot agree
+     on which of them should run one.
+
+    The dictionary is created in a parent process and inherited by workers
+     on ``fork``, or passed to them as a process argument. Another process
+     may attach by name if it is given the same lock.
+
+    :param default_ttl: The default time-to-live for keys in seconds.
+    :type default_ttl: float
+    :param name: name of the shared memory block
+    :type name: str
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        slot_size: int = 256,
+        default_ttl: float = 300,
+        name: str | None = None,
+        create: bool = True,
+        lock: Lock | None = None,
+    ) -> None:  # pragma: no cover
+        """
+        init shared ttl dict
+
+        :param capacity: number of slots, the maximum number of keys
+        :type capacity: int
+        :param slot_size: size of a slot in bytes including a 40 bytes header
+        :type slot_size: int
+        :param default_ttl: The default time-to-live for keys in seconds.
+        :type default_ttl: float
+        :param name: name of the shared memory block,
+         a random one is chosen if None when creating
+        :type name: str | None
+        :param create: create the block, attach to the existing one named ``name``
+         if False, then capacity, slot_size and default_ttl are read from it
+        :type create: bool
+        :param lock: the lock writers serialize on, must be the lock
+         of the creator when attaching, a new one is created if None when creating
+        :type lock: multiprocessing.synchronize.Lock | None
+        :raise ValueError: if capacity is less than 1, slot_size is too small
+         to hold an entry, the block to attach to is not a shared TTL dictionary
+         or no lock is given when attaching
+        """
+        if create:
+            if capacity < 1:
+                raise ValueError("capacity must be greater than 0")
+            if slot_size < _SLOT.size + 8:
+                raise ValueError(f"slot_size must be at least {_SLOT.size + 8}")
+            self._memory = SharedMemory(
+                name=name, create=True, size=_HEADER_SIZE + capacity * slot_size
+            )
+            self._memory.buf[: self._memory.size] = bytes(self._memory.size)
+            _HEADER.pack_into(
+                self._memory.buf, 0, _MAGIC, capacity, slot_size, default_ttl
+            )
+        else:
+            if name is None or lock is None:
+                raise ValueError("Pass the name and the lock of the dictionary")
+            self._memory = SharedMemory(name=name)
+            magic, capacity, slot_size, default_ttl = _HEADER.unpack_from(
+                self._memory.buf
+            )
+            if magic != _MAGIC:
+                self._memory.close()
+                raise ValueError(f"{name} is not a shared TTL dictionary")
+        self._capacity = capacity
+        self._slot_size = slot_size
+        self._default_ttl = default_ttl
+        self._lock = lock if lock is not None else multiprocessing.Lock()
+
+    @property
+    def name(self) -> str:
+        """
+        Name of the shared memory block to attach other processes to
+
+        :rtype: str
+        """
+        return self._memory.name
+
+    @property
+    def lock(self) -> Lock:
+        """
+        The lock writers serialize on
+
+        :rtype: multiprocessing.synchronize.Lock
+        """
+        return self._lock
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return type(self), (0, 0, 0, self.name, False, self._lock)
+
+    @staticmethod
+    def _hash(key_bytes: bytes) -> int:
+        """
+        Hash of a pickled key, never equal to the mark of empty slots
+
+        :param key_bytes: pickled key
+        :type key_bytes: bytes
+        :rtype: int
+        """
+        value = int.from_bytes(blake2b(key_bytes, digest_size=8).digest(), "little")
+        return max(value, _EMPTY + 1)
+
+    def _offset(self, index: int) -> int:
+        """
+        Position of the slot in the shared memory
+
+        :param index: number of the slot
+        :type index: int
+        :rtype: int
+        """
+        return _HEADER_SIZE + index * self._slot_size
+
+    def _probe(self, hash_: int) -> Iterator[int]:
+        """
+        Slots to visit looking for a key with the hash
+
+        :param hash_: hash of the key
+        :type hash_: int
+        :rtype: Iterator[int]
+        """
+        start = hash_ % self._capacity
+        yield from range(start, self._capacity)
+        yield from range(start)
+
+    def _read(self, key_bytes: bytes) -> tuple[bytes, float, float] | None:
+        """
+        Find the entry of the key without taking the lock
+
+        A miss is trusted only if no deletion moved entries during the search.
+
+        :param key_bytes: pickled key
+        :type key_bytes: bytes
+        :return: pickled value, deadline and TTL of the key or None if it is missing
+        :rtype: tuple[bytes, float, float] | None
+        """
+        buffer = self._memory.buf
+        hash_ = self._hash(key_bytes)
+        retries = 0
+        while True:
+            moves = _SEQ.unpack_from(buffer, _MOVES)[0]
+            entry = self._search(key_bytes, hash_)
+            if entry is not None or (
+                not moves & 1 and _SEQ.unpack_from(buffer, _MOVES)[0] == moves
+            ):
+                return entry
+            retries += 1
+            if retries % _RETRIES == 0:
+                # the writer holds the lock until the entries are moved
+                with self._lock:
+                    pass
+
+    def _search(
+        self, key_bytes: bytes, hash_: int
+    ) -> tuple[bytes, float, float] | None:
+        """
+        Walk the probe chain of the key reading every slot consistently
+
+        :param key_bytes: pickled key
+        :type key_bytes: bytes
+        :param hash_: hash of the key
+        :type hash_: int
+        :return: pickled value, deadline and TTL of the key or None if it is missing
+        :rtype: tuple[bytes, float, float] | None
+        """
+        buffer = self._memory.buf
+        for index in self._probe(hash_):
+            offset = self._offset(index)
+            retries = 0
+            while True:
+                sequence, slot_hash, deadline, ttl, key_size, value_size = (
+                    _SLOT.unpack_from(buffer, offset)
+                )
+                if slot_hash == _EMPTY:
+                    return None
+                if slot_hash != hash_:
+                    break
+                if not sequence & 1:
+                    start = offset + _SLOT.size
+                    payload = bytes(buffer[start : start + key_size + value_size])
+                    if _SEQ.unpack_from(buffer, offset)[0] == sequence:
+                        break
+                retries += 1
+                if retries % _RETRIES == 0:
+                    # the writer holds the lock until the slot is consistent
+                    with self._lock:
+                        pass
+            if slot_hash == hash_ and payload[:key_size] == key_bytes:
+                return payload[key_size:], deadline, ttl
+        return None
+
+    def _find(self, key_bytes: bytes, hash_: int, now: float) -> tuple[int, bool]:
+        """
+        Slot of the key or the empty slot to write it to
+
+        Must be called with ``self._lock`` held. Expired entries on the way,
+         the key itself included, are deleted.
+
+        :param key_bytes: pickled key
+        :type key_bytes: bytes
+        :param hash_: hash of the key
+        :type hash_: int
+        :param now: current monotonic time, entries expired by then are deleted
+        :type now: float
+        :return: number of the slot and whether the key is in it
+        :rtype: tuple[int, bool]
+        :raise ValueError: if the key is missing and there is no empty slot
+        """
+        buffer = self._memory.buf
+        index = hash_ % self._capacity
+        visited = 0
+        while visited < self._capacity:
+            offset = self._offset(index)
+            _, slot_hash, deadline, _, key_size, _ = _SLOT.unpack_from(buffer, offset)
+            if slot_hash == _EMPTY:
+                return index, False
+            if deadline <= now:
+                # an entry of the chain may move into the slot, look at it again
+                self._delete(index)
+                continue
+            if slot_hash == hash_:
+                start = offset + _SLOT.size
+                if buffer[start : start + key_size] == key_bytes:
+                    return index, True
+            index = (index + 1) % self._capacity
+            visited += 1
+        raise ValueError("SharedTTLDict is full, increase capacity")
+
+    def _write(
+        self,
+        index: int,
+        hash_: int,
+        deadline: float,
+        ttl: float,
+        key_bytes: bytes = b"",
+        value_bytes: bytes | None = None,
+    ) -> None:
+        """
+        Write the slot between two increments of its sequence counter
+
+        Must be called with ``self._lock`` held. The payload is kept
+         if ``value_bytes`` is None.
+
+        :param index: number of the slot
+        :type index: int
+        :param hash_: hash of the key or the mark of an empty or deleted slot
+        :type hash_: int
+        :param deadline: monotonic time when the key expires
+        :type deadline: float
+        :param ttl: the time-to-live of the key
+        :type ttl: float
+        :param key_bytes: pickled key
+        :type key_bytes: bytes
+        :param value_bytes: pickled value
+        :type value_bytes: bytes | None
+        """
+        buffer = self._memory.buf
+        offset = self._offset(index)
+        sequence, _, _, _, key_size, value_size = _SLOT.unpack_from(buffer, offset)
+        _SEQ.pack_into(buffer, offset, sequence + 1)
+        if value_bytes is not None:
+            key_size = len(key_bytes)
+            value_size = len(value_bytes)
+            start = offset + _SLOT.size
+            buffer[start : start + key_size + value_size] = key_bytes + value_bytes
+        _SLOT.pack_into(
+            buffer, offset, sequence + 1, hash_, deadline, ttl, key_size, value_size
+        )
+        _SEQ.pack_into(buffer, offset, sequence + 2)
+
+    def _delete(self, index: int) -> None:
+        """
+        Empty the slot shifting back the following entries of its probe chain
+
+        Must be called with ``self._lock`` held. Every following entry whose
+         home slot is not between the hole and the entry moves into the hole,
+         so no chain has a gap. The moves counter of the header is odd
+         while entries move.
+
+        :param index: number of the slot
+        :type index: int
+        """
+        buffer = self._memory.buf
+        capacity = self._capacity
+        moves = _SEQ.unpack_from(buffer, _MOVES)[0]
+        _SEQ.pack_into(buffer, _MOVES, moves + 1)
+        hole = current = index
+        for _ in range(capacity - 1):
+            current = (current + 1) % capacity
+            offset = self._offset(current)
+            _, slot_hash, deadline, ttl, key_size, value_size = _SLOT.unpack_from(
+                buffer, offset
+            )
+            if slot_hash == _EMPTY:
+                break
+            if (current - slot_hash) % capacity < (current - hole) % capacity:
+                # the home slot of the entry is after the hole
+                continue
+            start = offset + _SLOT.size
+            payload = bytes(buffer[start : start + key_size + value_size])
+            self._write(
+                hole, slot_hash, deadline, ttl, payload[:key_size], payload[key_size:]
+            )
+            hole = current
+        self._write(hole, _EMPTY, 0.0, 0.0)
+        _SEQ.pack_into(buffer, _MOVES, moves + 2)
+
+    def _sweep(self, now: float) -> None:
+        """
+        Delete expired entries among the few slots after the shared cursor
+
+        Must be called with ``self._lock`` held.
+
+        :param now: current monotonic time
+        :type now: float
+        """
+        buffer = self._memory.buf
+        index = _SEQ.unpack_from(buffer, _CURSOR)[0] % self._capacity
+        for _ in range(_SWEEP_SIZE):
+            slot_hash, deadline = _SLOT.unpack_from(buffer, self._offset(index))[1:3]
+            if slot_hash != _EMPTY and deadline <= now:
+                self._delete(index)
+                continue
+            index = (index + 1) % self._capacity
+        _SEQ.pack_into(buffer, _CURSOR, index)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.set(key, value)
+
+    def set(self, key: Any, value: Any, ttl: float | None = None) -> None:
+        """
+        Set the value of the key with its own time-to-live
+
+        :param key: The key to set.
+        :type key: Any
+        :param value: The value of the key.
+        :type value: Any
+        :param ttl: The time in seconds after which the key should expire,
+         the default TTL if None.
+        :type ttl: float | None
+        :raise ValueError: if the pickled key and value do not fit into a slot
+         or there is no free slot
+        """
+        if ttl is None:
+            ttl = self._default_ttl
+        key_bytes = pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+        value_bytes = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if _SLOT.size + len(key_bytes) + len(value_bytes) > self._slot_size:
+            raise ValueError(
+                f"Key and value take {len(key_bytes) + len(value_bytes)} bytes, "
+                f"a slot holds {self._slot_size - _SLOT.size}"
+            )
+        hash_ = self._hash(key_bytes)
+        with self._lock:
+            now = monotonic()
+            self._sweep(now)
+            index, _ = self._find(key_bytes, hash_, now)
+            self._write(index, hash_, now + ttl, ttl, key_bytes, value_bytes)
+
+    def extend_ttl(self, key: Any, ttl: float | None = None) -> None:
+        """
+        Reset the time-to-live of the key
+
+        :param key: The key for which the TTL is to be extended.
+        :type key: Any
+        :param ttl: The new time-to-live of the key in seconds,
+         the TTL the key was set with if None.
+        :type ttl: float | None
+        :raises KeyError: If the key is not found.
+        """
+        key_bytes = pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+        hash_ = self._hash(key_bytes)
+        with self._lock:
+            now = monotonic()
+            self._sweep(now)
+            index, found = self._find(key_bytes, hash_, now)
+            if not found:
+                raise KeyError(key)
+            own_ttl = _SLOT.unpack_from(self._memory.buf, self._offset(index))[3]
+            if ttl is None:
+                ttl = own_ttl
+            self._write(index, hash_, now + ttl, ttl)
+
+    def _lookup(self, key: Any) -> Any:
+        """
+        Value of the key if it is present and not expired
+
+        :param key: The key to look up.
+        :type key: Any
+        :return: the value or the missing sentinel
+        :rtype: Any
+        """
+        entry = self._read(pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL))
+        if entry is None or entry[1] <= monotonic():
+            return _MISSING
+        return pickle.loads(entry[0])
+
+    def __getitem__(self, key: Any) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key: Any) -> bool:
+        entry = self._read(pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL))
+        return entry is not None and entry[1] > monotonic()
+
+    def pop(self, key: Any, default: Any | None = None) -> Any | None:
+        key_bytes = pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+        hash_ = self._hash(key_bytes)
+        with self._lock:
+            now = monotonic()
+            self._sweep(now)
+            index, found = self._find(key_bytes, hash_, now)
+            if not found:
+                return default
+            offset = self._offset(index)
+            _, _, _, _, key_size, value_size = _SLOT.unpack_from(
+                self._memory.buf, offset
+            )
+            start = offset + _SLOT.size + key_size
+            value_bytes = bytes(self._memory.buf[start : start + value_size])
+            self._delete(index)
+        return pickle.loads(value_bytes)
+
+    def __delitem__(self, key: Any) -> None:
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def items(self) -> list[tuple[Any, Any]]:
+        """
+        Returns all live items, read under the lock.
+
+        :rtype: list[tuple[Any, Any]]
+        """
+        buffer = self._memory.buf
+        payloads = []
+        with self._lock:
+            now = monotonic()
+            for index in range(self._capacity):
+                offset = self._offset(index)
+                _, slot_hash, deadline, _, key_size, value_size = _SLOT.unpack_from(
+                    buffer, offset
+                )
+                if slot_hash != _EMPTY and deadline > now:
+                    start = offset + _SLOT.size
+                    payloads.append(
+                        (
+                            bytes(buffer[start : start + key_size]),
+                            bytes(
+                                buffer[start + key_size : start + key_size + value_size]
+                            ),
+                        )
+                    )
+        return [(pickle.loads(key), pickle.loads(value)) for key, value in payloads]
+
+    def keys(self) -> list[Any]:
+        return [key for key, _ in self.items()]
+
+    def values(self) -> list[Any]:
+        return [value for _, value in self.items()]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        buffer = self._memory.buf
+        now = monotonic()
+        count = 0
+        for index in range(self._capacity):
+            _, slot_hash, deadline, _, _, _ = _SLOT.unpack_from(
+                buffer, self._offset(index)
+            )
+            if slot_hash != _EMPTY and deadline > now:
+                count += 1
+        return count
+
+    def __str__(self) -> str:
+        return str(dict(self.items()))
+
+    def clear(self) -> None:
+        with self._lock:
+            for index in range(self._capacity):
+                if _SLOT.unpack_from(self._memory.buf, self._offset(index))[1]:
+                    self._write(index, _EMPTY, 0.0, 0.0)
+
+    def close(self) -> None:
+        """
+        Detach this process from the shared memory, other processes keep it
+        """
+        self._memory.close()
+
+    def unlink(self) -> None:
+        """
+        Destroy the shared memory block, call once after all processes closed it
+        """
+        self._memory.unlink()
@@ -1,8 +1,235 @@
 from __future__ import annotations
+import asyncio
 from collections import OrderedDict
-from collections.abc import Callable
-from threading import Timer
+from collections.abc import (
+    Awaitable,
+    Callable,
+    Iterable,
+    ItemsView,
+    Iterator,
+    Mapping,
+    ValuesView,
+)
+from concurrent.futures import Executor
+from enum import StrEnum
+import inspect
+from itertools import compress
+import logging
+import math
+import os
+import sys
+from threading import BoundedSemaphore, RLock
+from time import monotonic, perf_counter, time
 from typing import Any
+import weakref
+
+from .expiry import BucketExpiryEngine, ExpiryEngine, HeapExpiryEngine, Reaper
+from .ttl_snapshot import read_snapshot, write_snapshot
+from .ttl_stats import StatsCollector, TTLDictStats
+from ..view.converter_size_to_pretty_view import size as pretty_size
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_FLUSH_BATCH = object()
+# keys of the engine searched for the soonest expiring one
+_PEEK_LIMIT = 16
+
+
+class CallbackOverflowPolicy(StrEnum):
+    """
+    What TTLDict does with a callback when ``max_pending_callbacks`` are queued
+    """
+
+    BLOCK = "block"
+    DROP = "drop"
+    CALLER_RUNS = "caller_runs"
+
+
+class EvictionPolicy(StrEnum):
+    """
+    Which key TTLDict evicts to stay within ``maxsize`` and ``max_bytes``
+    """
+
+    LRU = "lru"
+    SOONEST_EXPIRING = "soonest_expiring"
+
+
+def shallow_size(key: Any, value: Any) -> int:
+    """
+    Approximate size of an entry in bytes
+
+    Sums :func:`sys.getsizeof` of the key, the value and, for a list, tuple,
+     set or dict value, of its items one level deep.
+
+    :param key: The key of the entry.
+    :type key: Any
+    :param value: The value of the entry.
+    :type value: Any
+    :rtype: int
+    """
+    total = sys.getsizeof(key) + sys.getsizeof(value)
+    if isinstance(value, dict):
+        for item_key, item_value in value.items():
+            total += sys.getsizeof(item_key) + sys.getsizeof(item_value)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        total += sum(map(sys.getsizeof, value))
+    return total
+
+
+def _check_limits(
+    maxsize: int | None,
+    max_bytes: int | None,
+    batch_size: int,
+    batch_delay: float,
+    max_pending_callbacks: int,
+) -> None:
+    """
+    Validate the numeric options of :class:`TTLDict`
+
+    :param maxsize: maximum number of keys, unbounded if None
+    :type maxsize: int | None
+    :param max_bytes: approximate memory budget in bytes, unbounded if None
+    :type max_bytes: int | None
+    :param batch_size: maximum number of keys in one batch
+    :type batch_size: int
+    :param batch_delay: maximum time in seconds a key waits for its batch
+    :type batch_delay: float
+    :param max_pending_callbacks: maximum number of queued callbacks
+    :type max_pending_callbacks: int
+    :raise ValueError: if maxsize, max_bytes, batch_size or max_pending_callbacks
+     is less than 1 or batch_delay is negative
+    """
+    for name, value in (
+        ("maxsize", maxsize),
+        ("max_bytes", max_bytes),
+        ("batch_size", batch_size),
+        ("max_pending_callbacks", max_pending_callbacks),
+    ):
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be greater than 0")
+    if batch_delay < 0:
+        raise ValueError("batch_delay must not be negative")
+
+
+def _default_engine(
+    compact: bool = False, lazy: bool = False, reaper: Reaper | None = None
+) -> ExpiryEngine:
+    """
+    The expiry engine :class:`TTLDict` creates when no engine is given
+
+    :param compact: :class:`BucketExpiryEngine` for the compact storage,
+     :class:`HeapExpiryEngine` otherwise
+    :type compact: bool
+    :param lazy: create the engine without a background thread
+    :type lazy: bool
+    :param reaper: reaper thread shared with other engines, a new one if None
+    :type reaper: Reaper | None
+    :rtype: ExpiryEngine
+    """
+    engine_class = BucketExpiryEngine if compact else HeapExpiryEngine
+    return engine_class(background=not lazy, reaper=reaper)
+
+
+class _Generation(Mapping[Any, Any]):
+    """
+    Point-in-time view of the values of a :class:`TTLDict`
+
+    The dictionaries of a generation are never written again, the TTLDict
+     starts a new generation before its next write while a view is referenced.
+     Keys whose deadline had passed when the view was taken are skipped,
+     so keys waiting for the engine are never returned.
+
+    :param _data: values of the generation
+    :type _data: Mapping[Any, Any]
+    :param _deadlines: monotonic deadlines of the generation
+    :type _deadlines: Mapping[Any, float]
+    :param _now: monotonic time when the view was taken
+    :type _now: float
+    :param _due: whether a key had expired at the view, None until checked
+    :type _due: bool | None
+    """
+
+    __slots__ = ("_data", "_deadlines", "_now", "_due", "__weakref__")
+
+    def __init__(
+        self, data: Mapping[Any, Any], deadlines: Mapping[Any, float]
+    ) -> None:  # pragma: no cover
+        """
+        init generation view
+
+        :param data: values of the generation
+        :type data: Mapping[Any, Any]
+        :param deadlines: monotonic deadlines of the generation
+        :type deadlines: Mapping[Any, float]
+        """
+        self._data = data
+        self._deadlines = deadlines
+        self._now = monotonic()
+        self._due = None  # type: bool | None
+
+    def __getitem__(self, key: Any) -> Any:
+        if self._deadlines.get(key, math.inf) <= self._now:
+            raise KeyError(key)
+        return self._data[key]
+
+    def _select(self, entries: Iterable[Any]) -> Iterator[Any]:
+        """
+        Entries of keys alive at the view, ``entries`` follow the order of keys
+
+        Every key of a generation has a deadline. One ``min`` of deadlines
+         tells whether any key has to be skipped, then keys are checked
+         at C speed only if so.
+
+        :param entries: keys, values or items of the generation
+        :type entries: Iterable[Any]
+        :rtype: Iterator[Any]
+        """
+        if self._due is None:
+            self._due = bool(self._deadlines) and (
+                min(self._deadlines.values()) <= self._now
+            )
+        if not self._due:
+            return iter(entries)
+        alive = map(self._now.__lt__, map(self._deadlines.__getitem__, self._data))
+        return compress(entries, alive)
+
+    def __iter__(self) -> Iterator[Any]:
+        # generator functions keep the view referenced while they run
+        yield from self._select(self._data)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._select(self._data))
+
+    def items(self) -> ItemsView[Any, Any]:
+        return _GenerationItems(self)
+
+    def values(self) -> ValuesView[Any]:
+        return _GenerationValues(self)
+
+
+class _GenerationItems(ItemsView[Any, Any]):
+    """
+    Items of a :class:`_Generation` without a lookup of every key
+    """
+
+    _mapping: _Generation
+
+    def __iter__(self) -> Iterator[tuple[Any, Any]]:
+        generation = self._mapping
+        yield from generation._select(generation._data.items())
+
+
+class _GenerationValues(ValuesView[Any]):
+    """
+    Values of a :class:`_Generation` without a lookup of every key
+    """
+
+    _mapping: _Generation
+
+    def __iter__(self) -> Iterator[Any]:
+        generation = self._mapping
+        yield from generation._select(generation._data.values())
 
 
 class TTLDict:
@@ -14,97 +241,763 @@ class TTLDict:
      dictionary automatically expire and get removed after
      a specified duration.
 
+    Deadlines of all keys are serviced by one expiry engine,
+     by default :class:`HeapExpiryEngine` with a single reaper thread.
+     In lazy mode no thread is started: expired keys are dropped
+     when they are accessed and a few of them are swept on every write.
+     A key is never returned after its deadline in any mode.
+
+    Compact mode trades expiry precision for memory: values are kept in
+     a plain dict and deadlines are serviced by :class:`BucketExpiryEngine`,
+     so the reaper may drop a key up to a second after its deadline.
+
+    With ``maxsize`` the dictionary keeps at most that many keys and evicts
+     the least recently used one when a new key is added.
+
+    ``function_on_expired_batch`` receives expired keys in lists of up to
+     ``batch_size`` keys, a list is delivered at most ``batch_delay`` seconds
+     after its first key expired.
+
+    Callbacks run on the thread that expires the key unless
+     ``callback_executor`` or ``callback_loop`` is given. Then at most
+     ``max_pending_callbacks`` callbacks are queued there and
+     ``overflow_policy`` decides what happens to the next one: ``block``
+     waits for a free place, ``drop`` skips the callback with a warning
+     and ``caller_runs`` runs it on the expiring thread.
+
 
     :param default_ttl: The default time-to-live for keys in seconds.
-    :type default_ttl: int
+    :type default_ttl: float
     :param _dict:  The main dictionary to store key-value pairs.
-    :type _dict: OrderedDict
-    :param _timers: A dictionary to store Timer objects for each key.
-    :type _timers: dict
+    :type _dict: OrderedDict | dict
+    :param _deadlines: A dictionary with monotonic expiry time of each key.
+    :type _deadlines: dict
+    :param _ttls: A dictionary with the TTL of keys set with a non-default TTL.
+    :type _ttls: dict
+    :param _engine: The engine that expires keys.
+    :type _engine: ExpiryEngine
     """
 
     def __init__(
         self,
-        default_ttl: int = 300,
+        default_ttl: float = 300,
         function_on_expired: Callable[[Any], None] | None = None,
+        engine: ExpiryEngine | None = None,
+        lazy: bool = False,
+        sweep_size: int = 20,
+        maxsize: int | None = None,
+        function_on_evicted: Callable[[Any], None] | None = None,
+        function_on_expired_batch: Callable[[list[Any]], None] | None = None,
+        batch_size: int = 100,
+        batch_delay: float = 1.0,
+        callback_executor: Executor | None = None,
+        callback_loop: asyncio.AbstractEventLoop | None = None,
+        max_pending_callbacks: int = 1000,
+        overflow_policy: CallbackOverflowPolicy | str = (
+            CallbackOverflowPolicy.CALLER_RUNS
+        ),
+        compact: bool = False,
+        stats: bool = False,
+        stats_sample_rate: int = 100,
+        max_bytes: int | None = None,
+        sizer: Callable[[Any, Any], int] = shallow_size,
+        eviction_policy: EvictionPolicy | str = EvictionPolicy.LRU,
+        sliding: bool = False,
+        pending_callbacks: BoundedSemaphore | None = None,
     ) -> None:  # pragma: no cover
         """
         init ttl dict
 
         :param default_ttl: The default time-to-live for keys in seconds.
-        :type default_ttl: int
+        :type default_ttl: float
         :param function_on_expired: the function that will be used when the key expires
         :type function_on_expired: Callable[[Any], None] | None
+        :param engine: the engine that tracks deadlines, one is created if None
+        :type engine: ExpiryEngine | None
+        :param lazy: expire keys on access and on writes without a background thread
+        :type lazy: bool
+        :param sweep_size: how many expired keys a write may remove
+         when the engine has no background thread
+        :type sweep_size: int
+        :param maxsize: maximum number of keys, unbounded if None
+        :type maxsize: int | None
+        :param function_on_evicted: the function that will be used when the key
+         is evicted to stay within maxsize
+        :type function_on_evicted: Callable[[Any], None] | None
+        :param function_on_expired_batch: the function that will be used
+         with a list of expired keys
+        :type function_on_expired_batch: Callable[[list[Any]], None] | None
+        :param batch_size: maximum number of keys in one batch
+        :type batch_size: int
+        :param batch_delay: maximum time in seconds a key waits for its batch
+        :type batch_delay: float
+        :param callback_executor: executor to run callbacks on
+        :type callback_executor: Executor | None
+        :param callback_loop: event loop to run callbacks on,
+         callbacks may be coroutine functions
+        :type callback_loop: asyncio.AbstractEventLoop | None
+        :param max_pending_callbacks: maximum number of callbacks queued
+         on the executor or the loop
+        :type max_pending_callbacks: int
+        :param overflow_policy: what to do with a callback when the queue is full
+        :type overflow_policy: CallbackOverflowPolicy | str
+        :param compact: keep values in a plain dict and use
+         :class:`BucketExpiryEngine` if no engine is given to save memory,
+         an OrderedDict is still used with maxsize to track recent use
+        :type compact: bool
+        :param stats: count hits, misses, sets, expirations and evictions
+         and sample latencies, see :meth:`stats`
+        :type stats: bool
+        :param stats_sample_rate: time one of this many lookups and writes
+        :type stats_sample_rate: int
+        :param max_bytes: approximate memory budget of keys and values in bytes,
+         unbounded if None
+        :type max_bytes: int | None
+        :param sizer: function returning the size of a key and its value in bytes
+         when max_bytes is set
+        :type sizer: Callable[[Any, Any], int]
+        :param eviction_policy: which key to evict to stay within maxsize
+         and max_bytes, the least recently used or the soonest to expire one
+        :type eviction_policy: EvictionPolicy | str
+        :param sliding: reading a key with :meth:`get` or ``[]`` moves its
+         deadline by its TTL, so keys expire after a period without access
+        :type sliding: bool
+        :param pending_callbacks: semaphore counting callbacks queued
+         on the executor or the loop, shared by dictionaries that share one
+         queue, a new one of ``max_pending_callbacks`` if None
+        :type pending_callbacks: BoundedSemaphore | None
+        :raise ValueError: if maxsize, max_bytes, batch_size, max_pending_callbacks
+         or stats_sample_rate is less than 1, batch_delay is negative,
+         overflow_policy or eviction_policy is unknown or both callback_executor
+         and callback_loop are given
         """
+        _check_limits(
+            maxsize, max_bytes, batch_size, batch_delay, max_pending_callbacks
+        )
+        if callback_executor is not None and callback_loop is not None:
+            raise ValueError("Use either callback_executor or callback_loop")
         self._default_ttl = default_ttl
-        self._dict = OrderedDict()  # type: ignore
-        self._timers = {}  # type: ignore
+        is_bounded = maxsize is not None or max_bytes is not None
+        if not compact or is_bounded:
+            self._dict = OrderedDict()  # type: OrderedDict[Any, Any]
+        else:
+            self._dict = {}  # type: ignore
+        self._deadlines = {}  # type: dict[Any, float]
+        self._ttls = {}  # type: dict[Any, float]
         self._on_expired = function_on_expired
+        self._lock = RLock()
+        self._engine = engine if engine is not None else _default_engine(compact, lazy)
+        self._sweep_size = sweep_size
+        self._maxsize = maxsize
+        self._max_bytes = max_bytes
+        self._sizer = sizer
+        self._sizes = None if max_bytes is None else {}  # type: dict[Any, int] | None
+        self._bytes = 0
+        self._eviction_policy = EvictionPolicy(eviction_policy)
+        self._lru = is_bounded and self._eviction_policy is EvictionPolicy.LRU
+        self._batch_deadline = 0.0
+        # scans still using the current _dict and _deadlines, see _view
+        self._readers = []  # type: list[weakref.ref[_Generation]]
+        self._on_evicted = function_on_evicted
+        self._on_expired_batch = function_on_expired_batch
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+        self._batch = []  # type: list[Any]
+        self._callback_executor = callback_executor
+        self._callback_loop = callback_loop
+        self._overflow_policy = CallbackOverflowPolicy(overflow_policy)
+        if pending_callbacks is None:
+            pending_callbacks = BoundedSemaphore(max_pending_callbacks)
+        self._pending_callbacks = pending_callbacks
+        self._sliding = sliding
+        self._stats = None  # type: StatsCollector | None
+        self._select_methods(sliding, stats, stats_sample_rate)
+        self._engine.bind(self._expire)
+
+    def _select_methods(self, sliding: bool, stats: bool, sample_rate: int) -> None:
+        """
+        Shadow the plain lookup and set with the variants the options need
+
+        Variants are set only on this instance, so dictionaries without
+         sliding expiration and statistics run exactly the plain code.
+
+        :param sliding: reading a key with get or ``[]`` moves its deadline
+        :type sliding: bool
+        :param stats: count hits, misses and sets and sample latencies
+        :type stats: bool
+        :param sample_rate: time one of this many lookups and writes
+        :type sample_rate: int
+        """
+        # reads of values by get and __getitem__, only they slide and are counted
+        self._read = self._lookup_sliding if sliding else self._lookup
+        if stats:
+            self._stats = StatsCollector(sample_rate)
+            self._read = self._lookup_with_stats
+            self.set = self._set_with_stats  # type: ignore[method-assign]
 
     def __setitem__(
         self,
         key: Any,
         value: Any,
     ) -> None:
-        self._dict[key] = value
-        self._set_ttl(key, self._default_ttl)
+        self.set(key, value)
 
-    def _set_ttl(self, key: Any, ttl: int) -> None:
+    def set(self, key: Any, value: Any, ttl: float | None = None) -> None:
+        """
+        Set the value of the key with its own time-to-live
+
+        :param key: The key to set.
+        :type key: Any
+        :param value: The value of the key.
+        :type value: Any
+        :param ttl: The time in seconds after which the key should expire,
+         the default TTL if None.
+        :type ttl: float | None
+        :rtype: None
+        :raise ValueError: if the entry alone is larger than max_bytes
+        """
+        size = None if self._sizes is None else self._measure(key, value)
+        with self._lock:
+            self._own()
+            self._dict[key] = value
+            self._set_ttl(key, ttl)
+            if size is not None:
+                self._track(key, size)
+            expired, evicted = self._evict((key,))
+        self._notify_evicted(expired, evicted)
+        self._sweep_on_write()
+
+    def _set_with_stats(self, key: Any, value: Any, ttl: float | None = None) -> None:
+        """
+        :meth:`set` counting writes and sampling their latency
+
+        :param key: The key to set.
+        :type key: Any
+        :param value: The value of the key.
+        :type value: Any
+        :param ttl: The time in seconds after which the key should expire,
+         the default TTL if None.
+        :type ttl: float | None
+        """
+        stats = self._stats
+        stats.sets += 1
+        if not stats.sample():
+            TTLDict.set(self, key, value, ttl)
+            return
+        started = perf_counter()
+        TTLDict.set(self, key, value, ttl)
+        stats.observe_set(perf_counter() - started)
+
+    def _set_ttl(self, key: Any, ttl: float | None) -> None:
         """
         Set ttl for key
 
         :param key: The key for which the TTL (Time To Live) is being set.
         :type key: Any
-        :param ttl: The time in seconds after which the key should expire.
-        :type ttl: int
+        :param ttl: The time in seconds after which the key should expire,
+         the default TTL if None.
+        :type ttl: float | None
         :rtype: None
 
         """
-        if key in self._timers:
-            self._timers[key].cancel()
-        self._timers[key] = Timer(ttl, self._expire, args=[key])
-        self._timers[key].start()
+        self._schedule(key, self._store_deadline(key, ttl, monotonic()))
 
-    def extend_ttl(self, key: Any) -> None:
+    def _schedule(self, key: Any, deadline: float) -> None:
+        """
+        Schedule the deadline in the engine, a key that never expires is cancelled
+
+        :param key: The key to schedule.
+        :type key: Any
+        :param deadline: monotonic time when the key expires, ``math.inf`` if never
+        :type deadline: float
+        """
+        if deadline == math.inf:
+            self._engine.cancel(key)
+        else:
+            self._engine.schedule(key, deadline)
+
+    def _schedule_many(self, pairs: list[tuple[Any, float]]) -> None:
+        """
+        Schedule deadlines of many keys, see :meth:`_schedule`
+
+        :param pairs: keys with their monotonic deadlines
+        :type pairs: list[tuple[Any, float]]
+        """
+        endless = [key for key, deadline in pairs if deadline == math.inf]
+        if endless:
+            self._engine.cancel_many(endless)
+            pairs = [pair for pair in pairs if pair[1] != math.inf]
+        self._engine.schedule_many(pairs)
+
+    def _store_deadline(self, key: Any, ttl: float | None, now: float) -> float:
+        """
+        Remember the TTL and the deadline of the key without scheduling it
+
+        Must be called with ``self._lock`` held.
+
+        :param key: The key for which the TTL is being set.
+        :type key: Any
+        :param ttl: The time in seconds after which the key should expire,
+         the default TTL if None.
+        :type ttl: float | None
+        :param now: current monotonic time
+        :type now: float
+        :return: the deadline of the key
+        :rtype: float
+        """
+        self._own()
+        if ttl is None or ttl == self._default_ttl:
+            ttl = self._default_ttl
+            self._ttls.pop(key, None)
+        else:
+            self._ttls[key] = ttl
+        deadline = now + ttl
+        self._deadlines[key] = deadline
+        return deadline
+
+    def set_many(
+        self,
+        data: Mapping[Any, Any] | Iterable[tuple[Any, Any]],
+        ttl: float | None = None,
+    ) -> None:
+        """
+        Set many keys in one pass
+
+        The lock is taken once and the expiry of all keys is scheduled
+         in the engine as one batch.
+
+        :param data: mapping or pairs of key and value
+        :type data: Mapping[Any, Any] | Iterable[tuple[Any, Any]]
+        :param ttl: The time in seconds after which the keys should expire,
+         the default TTL if None.
+        :type ttl: float | None
+        :rtype: None
+        :raise ValueError: if an entry alone is larger than max_bytes
+        """
+        items = list(data.items() if isinstance(data, Mapping) else data)
+        if not items:
+            return
+        if self._stats is not None:
+            self._stats.sets += len(items)
+        sizes = None
+        if self._sizes is not None:
+            sizes = [self._measure(key, value) for key, value in items]
+        with self._lock:
+            now = monotonic()
+            self._own()
+            self._dict.update(items)
+            if sizes is not None:
+                for (key, _), size in zip(items, sizes, strict=True):
+                    self._track(key, size)
+            self._schedule_many(
+                [(key, self._store_deadline(key, ttl, now)) for key, _ in items]
+            )
+            expired, evicted = self._evict([key for key, _ in items])
+        self._notify_evicted(expired, evicted)
+        self._sweep_on_write()
+
+    def get_many(self, keys: Iterable[Any]) -> dict[Any, Any]:
+        """
+        Get values of many keys in one pass, missing and expired keys are skipped
+
+        :param keys: The keys to look up.
+        :type keys: Iterable[Any]
+        :return: found keys with their values
+        :rtype: dict[Any, Any]
+        """
+        found = {}
+        expired = []
+        if self._stats is not None:
+            keys = list(keys)
+        with self._lock:
+            now = monotonic()
+            for key in keys:
+                value = self._dict.get(key, _MISSING)
+                if value is _MISSING:
+                    continue
+                deadline = self._deadlines.get(key)
+                if deadline is not None and deadline <= now:
+                    expired.append(key)
+                    continue
+                if self._lru:
+                    self._own()
+                    self._dict.move_to_end(key)
+                found[key] = value
+            self._engine.cancel_many(expired)
+        if expired:
+            self._expire(expired)
+        if self._stats is not None:
+            self._stats.hits += len(found)
+            self._stats.misses += len(keys) - len(found)  # type: ignore[arg-type]
+        return found
+
+    def delete_many(self, keys: Iterable[Any]) -> int:
+        """
+        Delete many keys in one pass, missing keys are ignored
+
+        :param keys: The keys to delete.
+        :type keys: Iterable[Any]
+        :return: number of deleted keys
+        :rtype: int
+        """
+        deleted = []
+        with self._lock:
+            for key in keys:
+                if key not in self._dict:
+                    continue
+                self._own()
+                del self._dict[key]
+                self._ttls.pop(key, None)
+                if self._sizes is not None:
+                    self._bytes -= self._sizes.pop(key, 0)
+                self._deadlines.pop(key, None)
+                deleted.append(key)
+            self._engine.cancel_many(deleted)
+        return len(deleted)
+
+    def extend_ttl(self, key: Any, ttl: float | None = None) -> None:
         """
         Attempts to extend the time-to-live (TTL) value for the specified key.
 
-        If the key exists in the internal dictionary, it resets its TTL to the default
-         TTL value. If the key does not exist, a KeyError is raised.
+        If the key exists in the internal dictionary, it resets its TTL to ``ttl``
+         or, if it is None, to the TTL the key was set with.
+         If the key does not exist, a KeyError is raised.
 
 
         :param key: The key for which the TTL is to be extended.
         :type key: Any
+        :param ttl: The new time-to-live of the key in seconds.
+        :type ttl: float | None
         :raises KeyError: If the key is not found in the internal dictionary.
         :rtype: None
 
         """
-        if key not in self._dict:
+        if self._lookup(key) is _MISSING:
             raise KeyError(f"Key {key} not found")
-        self._set_ttl(key, self._default_ttl)
+        with self._lock:
+            if key in self._dict:
+                if ttl is None:
+                    ttl = self._ttls.get(key)
+                self._set_ttl(key, ttl)
+
+    def ttl(self, key: Any) -> float | None:
+        """
+        Remaining time-to-live of the key, the deadline is not moved
+         and the key is not marked as used
+
+        :param key: The key to look up.
+        :type key: Any
+        :return: seconds until the key expires, ``math.inf`` if it never expires,
+         None if the key is absent or expired
+        :rtype: float | None
+        """
+        with self._lock:
+            if key not in self._dict:
+                return None
+            deadline = self._deadlines.get(key)
+            if deadline is None:
+                return math.inf
+            remaining = deadline - monotonic()
+            return remaining if remaining > 0 else None
 
     def __getitem__(self, key: Any) -> Any:
-        return self._dict[key]
+        value = self._read(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
 
     def __delitem__(self, key: Any) -> None:
-        self._cleanup(key, is_expire_cleanup=False)
-        del self._dict[key]
-        self._timers[key].cancel()
-        del self._timers[key]
+        with self._lock:
+            deadline = self._deadlines.get(key)
+            if deadline is None or deadline > monotonic():
+                self._cleanup(key, is_expire_cleanup=False)
+                self._own()
+                del self._dict[key]
+                self._forget(key)
+                return
+            # expired but not swept yet, expire it as a read would
+            self._engine.cancel(key)
+        self._expire([key])
+        raise KeyError(key)
 
     def __contains__(self, key: Any) -> bool:
-        return key in self._dict
+        return self._lookup(key) is not _MISSING
+
+    def _lookup(self, key: Any) -> Any:
+        """
+        Get the value of the key, expiring the key if its deadline has passed
+
+        :param key: The key to look up.
+        :type key: Any
+        :return: the value or ``_MISSING`` if the key is absent or expired
+        :rtype: Any
+        """
+        with self._lock:
+            value = self._dict.get(key, _MISSING)
+            if value is _MISSING:
+                return _MISSING
+            deadline = self._deadlines.get(key)
+            if deadline is None or deadline > monotonic():
+                if self._lru:
+                    self._own()
+                    self._dict.move_to_end(key)
+                return value
+            self._engine.cancel(key)
+        self._expire([key])
+        return _MISSING
 
-    def _expire(self, key: Any) -> None:
+    def _lookup_sliding(self, key: Any) -> Any:
         """
-        a method for the timer that will be called when the timer expires
+        :meth:`_lookup` moving the deadline of a found key by its TTL
+
+        Only the stored deadline is written, the engine keeps the old one
+         and :meth:`_expire` re-queues the key when it finds the deadline moved.
 
-        :param key: The key of the item to expire from the dictionary.
+        :param key: The key to look up.
         :type key: Any
+        :return: the value or ``_MISSING`` if the key is absent or expired
+        :rtype: Any
+        """
+        with self._lock:
+            value = self._dict.get(key, _MISSING)
+            if value is _MISSING:
+                return _MISSING
+            now = monotonic()
+            deadline = self._deadlines.get(key)
+            if deadline is None or deadline > now:
+                self._own()
+                if deadline is not None:
+                    self._deadlines[key] = now + self._ttls.get(key, self._default_ttl)
+                if self._lru:
+                    self._dict.move_to_end(key)
+                return value
+            self._engine.cancel(key)
+        self._expire([key])
+        return _MISSING
+
+    def _lookup_with_stats(self, key: Any) -> Any:
         """
-        self._cleanup(key, is_expire_cleanup=True)
-        del self._dict[key]
-        del self._timers[key]
+        :meth:`_lookup` counting hits and misses and sampling their latency
+
+        Only :meth:`get` and ``__getitem__`` read through it, :meth:`get_many`
+         counts its keys itself. Membership tests, :meth:`pop`,
+         :meth:`setdefault` and :meth:`extend_ttl` are not counted.
+
+        :param key: The key to look up.
+        :type key: Any
+        :return: the value or ``_MISSING`` if the key is absent or expired
+        :rtype: Any
+        """
+        stats = self._stats
+        lookup = self._lookup_sliding if self._sliding else self._lookup
+        if stats.sample():
+            started = perf_counter()
+            value = lookup(key)
+            stats.observe_get(perf_counter() - started)
+        else:
+            value = lookup(key)
+        if value is _MISSING:
+            stats.misses += 1
+        else:
+            stats.hits += 1
+        return value
+
+    def _sweep(self, limit: int | None = None) -> None:
+        """
+        Expire keys whose deadline has passed without waiting for the engine
+
+        :param limit: maximum number of keys to expire, all if None
+        :type limit: int | None
+        """
+        keys = self._engine.pop_expired(monotonic(), limit)
+        if keys:
+            self._expire(keys)
+
+    def _sweep_on_write(self) -> None:
+        """
+        Amortized active expiry for engines without a background thread
+        """
+        if not self._engine.background:
+            self._sweep(self._sweep_size)
+
+    def _forget(self, key: Any) -> None:
+        """
+        Drop the deadline and the size of the key and cancel its expiry
+
+        :param key: The key whose deadline is dropped.
+        :type key: Any
+        """
+        self._own()
+        self._ttls.pop(key, None)
+        if self._sizes is not None:
+            self._bytes -= self._sizes.pop(key, 0)
+        if self._deadlines.pop(key, None) is not None:
+            self._engine.cancel(key)
+
+    def _expire(self, keys: Iterable[Any]) -> None:
+        """
+        a method for the expiry engine that will be called when deadlines pass
+
+        Keys whose deadline was moved after the engine reported them are kept.
+
+        :param keys: The keys of the items to expire from the dictionary.
+        :type keys: Iterable[Any]
+        """
+        now = monotonic()
+        expired = []
+        flush = False
+        with self._lock:
+            for key in keys:
+                if key is _FLUSH_BATCH:
+                    flush = True
+                    continue
+                deadline = self._deadlines.get(key)
+                if deadline is None:
+                    continue
+                if deadline > now:
+                    self._schedule(key, deadline)
+                    continue
+                self._own()
+                del self._deadlines[key]
+                self._ttls.pop(key, None)
+                self._dict.pop(key, None)
+                if self._sizes is not None:
+                    self._bytes -= self._sizes.pop(key, 0)
+                expired.append(key)
+            if self._stats is not None:
+                self._stats.expirations += len(expired)
+        for key in expired:
+            self._cleanup(key, is_expire_cleanup=True)
+        if flush:
+            self.flush_expired()
+
+    def _evict(self, keys: Iterable[Any]) -> tuple[list[Any], list[Any]]:
+        """
+        Mark the keys as recently used and evict keys over maxsize and max_bytes
+
+        Must be called with ``self._lock`` held. Evicted keys whose deadline has
+         already passed are expired instead of evicted.
+
+        :param keys: The keys that were just written.
+        :type keys: Iterable[Any]
+        :return: expired and evicted keys
+        :rtype: tuple[list[Any], list[Any]]
+        """
+        if self._maxsize is None and self._max_bytes is None:
+            return [], []
+        if self._lru:
+            self._own()
+            for key in keys:
+                self._dict.move_to_end(key)
+        now = monotonic()
+        evicted = []
+        expired = []
+        while self._dict and (
+            (self._maxsize is not None and len(self._dict) > self._maxsize)
+            or (self._max_bytes is not None and self._bytes > self._max_bytes)
+        ):
+            old_key = self._victim()
+            self._own()
+            del self._dict[old_key]
+            deadline = self._deadlines.get(old_key)
+            self._forget(old_key)
+            if deadline is not None and deadline <= now:
+                expired.append(old_key)
+            else:
+                evicted.append(old_key)
+        return expired, evicted
+
+    def _victim(self) -> Any:
+        """
+        Key to evict according to the eviction policy
+
+        Must be called with ``self._lock`` held. The soonest expiring key is
+         looked up among the first keys of the engine by their current
+         deadlines, sliding reads move deadlines without telling the engine.
+         A key whose deadline the engine knows ends the search, keys after it
+         do not expire sooner.
+
+        :rtype: Any
+        """
+        if self._eviction_policy is EvictionPolicy.SOONEST_EXPIRING:
+            victim = None
+            soonest = math.inf
+            for key, scheduled in self._engine.peek(_PEEK_LIMIT):
+                # the pending batch delivery has no deadline of its own
+                deadline = self._deadlines.get(key)
+                if deadline is None:
+                    continue
+                if deadline < soonest:
+                    victim, soonest = key, deadline
+                if deadline <= scheduled:
+                    break
+            if victim is not None:
+                return victim
+        return next(iter(self._dict))
+
+    def _measure(self, key: Any, value: Any) -> int:
+        """
+        Size of the entry in bytes
+
+        :param key: The key of the entry.
+        :type key: Any
+        :param value: The value of the entry.
+        :type value: Any
+        :rtype: int
+        :raise ValueError: if the entry alone is larger than max_bytes
+        """
+        size = self._sizer(key, value)
+        if size > self._max_bytes:
+            raise ValueError(
+                f"Entry of {pretty_size(size)} does not fit "
+                f"into max_bytes of {pretty_size(self._max_bytes)}"
+            )
+        return size
+
+    def _track(self, key: Any, size: int) -> None:
+        """
+        Remember the size of the entry, must be called with ``self._lock`` held
+
+        :param key: The key of the entry.
+        :type key: Any
+        :param size: size of the entry in bytes
+        :type size: int
+        """
+        self._bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+    def occupancy(self) -> str:
+        """
+        Readable use of the memory budget, e.g. ``1.91M of 10M (19.1%)``
+
+        :rtype: str
+        :raise ValueError: if max_bytes is not set
+        """
+        if self._max_bytes is None:
+            raise ValueError("Occupancy is tracked only with max_bytes")
+        used = pretty_size(self._bytes) if self._bytes else "0B"
+        return (
+            f"{used} of {pretty_size(self._max_bytes)} "
+            f"({self._bytes / self._max_bytes:.1%})"
+        )
+
+    def _notify_evicted(self, expired: list[Any], evicted: list[Any]) -> None:
+        """
+        Report keys removed by :meth:`_evict`
+
+        :param expired: The keys removed because their deadline had passed.
+        :type expired: list[Any]
+        :param evicted: The keys removed to stay within maxsize.
+        :type evicted: list[Any]
+        """
+        if self._stats is not None:
+            self._stats.expirations += len(expired)
+            self._stats.evictions += len(evicted)
+        for key in expired:
+            self._cleanup(key, is_expire_cleanup=True)
+        if self._on_evicted is not None:
+            for key in evicted:
+                self._call(self._on_evicted, key)
 
     def _cleanup(self, key: Any, is_expire_cleanup: bool = False) -> None:
         """
@@ -113,17 +1006,182 @@ class TTLDict:
         :param key: The key used to identify the item to be cleaned up.
         :type key: Any
         """
-        if is_expire_cleanup and self._on_expired is not None:
-            self._on_expired(key)
+        if not is_expire_cleanup:
+            return
+        if self._on_expired is not None:
+            self._call(self._on_expired, key)
+        if self._on_expired_batch is not None:
+            self._add_to_batch(key)
+
+    def _add_to_batch(self, key: Any) -> None:
+        """
+        Queue the expired key for function_on_expired_batch
+
+        The first key of a batch schedules its delivery in the expiry engine,
+         a full batch is delivered at once.
+
+        :param key: The expired key.
+        :type key: Any
+        """
+        with self._lock:
+            self._batch.append(key)
+            if len(self._batch) == 1 and self._batch_size > 1:
+                self._batch_deadline = monotonic() + self._batch_delay
+                self._engine.schedule(_FLUSH_BATCH, self._batch_deadline)
+            is_full = len(self._batch) >= self._batch_size
+        if is_full:
+            self.flush_expired()
+
+    def flush_expired(self) -> None:
+        """
+        Deliver expired keys waiting for their batch to function_on_expired_batch
+        """
+        with self._lock:
+            batch = self._batch
+            if not batch:
+                return
+            self._batch = []
+            self._engine.cancel(_FLUSH_BATCH)
+        self._call(self._on_expired_batch, batch)
+
+    def _call(self, function: Callable[[Any], Any], argument: Any) -> None:
+        """
+        Run a user callback
+
+        :param function: function_on_expired, function_on_evicted
+         or function_on_expired_batch
+        :type function: Callable[[Any], Any]
+        :param argument: The key or the list of keys passed to the callback.
+        :type argument: Any
+        """
+        if self._callback_executor is None and self._callback_loop is None:
+            self._run_callback(function, argument)
+            return
+        is_block = self._overflow_policy is CallbackOverflowPolicy.BLOCK
+        if not self._pending_callbacks.acquire(blocking=is_block):
+            if self._overflow_policy is CallbackOverflowPolicy.DROP:
+                logger.warning("Callback queue is full, dropped %r", function)
+            else:
+                self._run_callback(function, argument)
+            return
+        try:
+            if self._callback_executor is not None:
+                self._callback_executor.submit(
+                    self._run_queued_callback, function, argument
+                )
+            else:
+                self._callback_loop.call_soon_threadsafe(
+                    self._run_queued_callback, function, argument
+                )
+        except RuntimeError:
+            self._pending_callbacks.release()
+            self._run_callback(function, argument)
+
+    @staticmethod
+    def _run_callback(
+        function: Callable[[Any], Any], argument: Any
+    ) -> Awaitable[Any] | None:
+        """
+        Run a user callback, its errors are logged and do not stop expiry
+
+        :param function: the callback
+        :type function: Callable[[Any], Any]
+        :param argument: The key or the list of keys passed to the callback.
+        :type argument: Any
+        :return: the result if it is awaitable
+        :rtype: Awaitable[Any] | None
+        """
+        try:
+            result = function(argument)
+        except Exception:
+            logger.exception("TTLDict callback %r failed", function)
+            return None
+        return result if inspect.isawaitable(result) else None
+
+    def _run_queued_callback(
+        self, function: Callable[[Any], Any], argument: Any
+    ) -> None:
+        """
+        Run a callback queued on the executor or the loop and free its place
+
+        :param function: the callback
+        :type function: Callable[[Any], Any]
+        :param argument: The key or the list of keys passed to the callback.
+        :type argument: Any
+        """
+        result = self._run_callback(function, argument)
+        if result is None:
+            self._pending_callbacks.release()
+            return
+        task = asyncio.ensure_future(result)
+        task.add_done_callback(self._on_callback_task_done)
+
+    def _on_callback_task_done(self, task: asyncio.Future[Any]) -> None:
+        """
+        Free the place of a finished coroutine callback and log its error
+
+        :param task: the finished task
+        :type task: asyncio.Future[Any]
+        """
+        self._pending_callbacks.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("TTLDict callback failed", exc_info=task.exception())
+
+    def _view(self) -> _Generation:
+        """
+        Read-only view of the current generation of values and deadlines
+
+        Taking a view costs O(1) and copies nothing. While a view is referenced,
+         the next write copies the dictionaries first, see :meth:`_own`,
+         so iterating the view needs no lock and never fails when keys
+         are set or expire.
+
+        :rtype: _Generation
+        """
+        with self._lock:
+            generation = _Generation(self._dict, self._deadlines)
+            self._readers = [ref for ref in self._readers if ref() is not None]
+            self._readers.append(weakref.ref(generation))
+        return generation
+
+    def _own(self) -> None:
+        """
+        Start a new generation before a write if a scan still uses the current one
+
+        Must be called with ``self._lock`` held before every write
+         of ``self._dict`` or ``self._deadlines``, reordering included.
+         Without live views it costs one truth test.
+        """
+        if self._readers:
+            if any(ref() is not None for ref in self._readers):
+                self._dict = self._dict.copy()
+                self._deadlines = self._deadlines.copy()
+            self._readers = []
 
-    def items(self) -> tuple[list[Any], list[Any]]:
+    def _drop_values(self) -> None:
+        """
+        Forget all keys, must be called with ``self._lock`` held
+        """
+        self._readers = []
+        self._dict = type(self._dict)()
+        self._deadlines = {}
+        self._ttls.clear()
+        if self._sizes is not None:
+            self._sizes.clear()
+            self._bytes = 0
+
+    def items(self) -> ItemsView[Any, Any]:
         """
         Returns all items in the dictionary.
 
+        The view belongs to a snapshot taken at the call, it does not change
+         when keys are set or removed later. Keys whose deadline had passed
+         at the call are skipped.
+
         :returns: A view object that displays a list of a dictionary's
-        :rtype: tuple[list[Any], list[Any]]
+        :rtype: ItemsView[Any, Any]
         """
-        return self._dict.items()  # type: ignore
+        return self._view().items()
 
     def values(self) -> Any:
         """
@@ -132,7 +1190,7 @@ class TTLDict:
         :returns: An object containing all the values in the dictionary.
         :rtype: list[Any]
         """
-        return self._dict.values()
+        return self._view().values()
 
     def keys(self) -> Any:
         """
@@ -141,43 +1199,69 @@ class TTLDict:
         :returns: A view object that displays a list of all the keys.
         :rtype: list[Any]
         """
-        return self._dict.keys()
+        return self._view().keys()
 
     def __iter__(self) -> Any:
-        for i in self._dict.keys():  # noqa:UP028
-            yield i
+        return iter(self._view())
 
     def __str__(self) -> str:
-        return str(dict(self._dict.items()))
+        return str(dict(self._view().items()))
 
     def get(self, key: Any, default: Any = None) -> Any:
-        return self._dict.get(key, default)
+        value = self._read(key)
+        return default if value is _MISSING else value
 
     def clear(self) -> None:
-        self._dict.clear()
-        for item in self._timers.values():
-            item.cancel()
+        self.flush_expired()
+        with self._lock:
+            self._drop_values()
+            self._engine.clear()
+
+    def close(self) -> None:
+        """
+        Remove all keys and stop the expiry engine.
+        """
+        self.flush_expired()
+        with self._lock:
+            self._drop_values()
+            self._engine.close()
 
     def pop(self, key: Any, default: Any | None = None) -> Any | None:
-        if key in self._dict:
-            self._timers[key].cancel()
-            del self._timers[key]
-        return self._dict.pop(key=key, default=default)
+        if self._lookup(key) is _MISSING:
+            return default
+        with self._lock:
+            self._forget(key)
+            return self._dict.pop(key, default)
 
     def setdefault(self, key: Any, default: Any | None = None) -> Any | None:
         """Insert key with a value of default if key is not in the dictionary.
 
         Return the value for key if key is in the dictionary, else default.
         """
-        if key in self._dict:
-            return self._dict[key]
-        self._dict[key] = default
-        return default
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        size = None if self._sizes is None else self._measure(key, default)
+        with self._lock:
+            self._own()
+            value = self._dict.setdefault(key, default)
+            if key not in self._deadlines:
+                self._set_ttl(key, None)
+                if size is not None:
+                    self._track(key, size)
+                if self._stats is not None:
+                    self._stats.sets += 1
+            expired, evicted = self._evict((key,))
+        self._notify_evicted(expired, evicted)
+        self._sweep_on_write()
+        return value
 
     def __len__(self) -> int:
+        self._sweep()
         return len(self._dict)
 
     def __eq__(self, other: Any) -> bool:
+        self._sweep()
         if isinstance(other, TTLDict):
             return dict.__eq__(self._dict, other._dict)
         elif isinstance(other, dict):
@@ -185,9 +1269,94 @@ class TTLDict:
         raise TypeError(f"Can't compare TTLDict and {type(other)}")
 
     def update(self, new_data: TTLDict | dict[Any, Any]) -> None:
-        if isinstance(new_data, TTLDict):
-            self._dict.update(new_data._dict)
-        elif isinstance(new_data, dict):
-            self._dict.update(new_data)
+        if isinstance(new_data, (TTLDict, dict)):
+            self.set_many(new_data.items())
         else:
             raise TypeError("Can't update ttl dict")
+
+    def dump(self, path: str | os.PathLike[str]) -> int:
+        """
+        Write live keys with their values and deadlines to a snapshot file
+
+        Deadlines are stored as wall-clock time, so a snapshot can be loaded
+         after a restart. Keys and values must be picklable.
+
+        :param path: path of the snapshot file, replaced atomically
+        :type path: str | os.PathLike[str]
+        :return: number of written keys
+        :rtype: int
+        """
+        with self._lock:
+            now = monotonic()
+            offset = time() - now
+            entries = [
+                (deadline + offset, key, self._dict[key], self._ttls.get(key))
+                for key, deadline in self._deadlines.items()
+                if deadline > now
+            ]
+        write_snapshot(path, entries)
+        return len(entries)
+
+    def load(self, path: str | os.PathLike[str]) -> int:
+        """
+        Add keys from a snapshot file written by :meth:`dump`
+
+        The file is read through ``mmap``. Keys that expired before loading
+         are skipped without being deserialized, loaded keys keep their
+         deadlines and replace keys with the same name.
+
+        :param path: path of the snapshot file
+        :type path: str | os.PathLike[str]
+        :return: number of loaded keys
+        :rtype: int
+        :raise ValueError: if the file is not a snapshot
+         or an entry alone is larger than max_bytes
+        """
+        keys, values, deadlines, ttls = read_snapshot(path, time())
+        if not keys:
+            return 0
+        sizes = None
+        if self._sizes is not None:
+            sizes = [
+                self._measure(key, value)
+                for key, value in zip(keys, values, strict=True)
+            ]
+        with self._lock:
+            offset = time() - monotonic()
+            pairs = list(
+                zip(keys, [deadline - offset for deadline in deadlines], strict=True)
+            )
+            self._own()
+            self._dict.update(zip(keys, values, strict=True))
+            if self._ttls:
+                for key in keys:
+                    self._ttls.pop(key, None)
+            self._ttls.update(ttls)
+            self._deadlines.update(pairs)
+            self._schedule_many(pairs)
+            if sizes is not None:
+                for key, size in zip(keys, sizes, strict=True):
+                    self._track(key, size)
+            expired, evicted = self._evict(keys)
+        self._notify_evicted(expired, evicted)
+        self._sweep_on_write()
+        return len(keys)
+
+    def stats(self) -> TTLDictStats | None:
+        """
+        Snapshot of statistics, cheap enough to call from a metrics scraper
+
+        :return: statistics or None if the dictionary was created without stats
+        :rtype: TTLDictStats | None
+        """
+        if self._stats is None:
+            return None
+        with self._lock:
+            size = len(self._dict)
+            memory = (
+                sys.getsizeof(self._dict)
+                + sys.getsizeof(self._deadlines)
+                + sys.getsizeof(self._ttls)
+                + self._bytes
+            )
+        return self._stats.snapshot(size, memory)
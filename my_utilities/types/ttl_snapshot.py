@@ -0,0 +1,157 @@
+"""
+Module with the binary snapshot format of TTL dictionaries
+
+A snapshot keeps live entries sorted by their wall-clock deadline::
+
+    header    magic, version, block size and number of entries
+    deadlines one little-endian double per entry
+    offsets   end offset of every block, relative to the first block
+    blocks    pickled keys, values and own TTLs of ``block_size`` entries each
+
+Deadlines are read from the memory-mapped file without touching the blocks.
+ Expired entries form a prefix of the file, so the blocks holding only
+ expired entries are skipped without being deserialized.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from typing import Any
+
+from ..iterables.chunk import chunks
+
+_HEADER = struct.Struct("<4sIQQ")
+_MAGIC = b"TTLS"
+_VERSION = 1
+BLOCK_SIZE = 512
+
+
+def _byteswap(values: array[Any]) -> array[Any]:
+    """
+    Convert an array between the native and the little-endian byte order
+
+    :param values: array to convert in place
+    :type values: array[Any]
+    :rtype: array[Any]
+    """
+    if sys.byteorder == "big":  # pragma: no cover
+        values.byteswap()
+    return values
+
+
+def write_snapshot(
+    path: str | os.PathLike[str],
+    entries: list[tuple[float, Any, Any, float | None]],
+    block_size: int = BLOCK_SIZE,
+) -> None:
+    """
+    Write entries to the snapshot file
+
+    The snapshot is written to a uniquely named temporary file next to ``path``
+     and renamed over it, so a reader never sees a partially written snapshot
+     and concurrent writers do not overwrite each other's temporary file.
+
+    :param path: path of the snapshot file
+    :type path: str | os.PathLike[str]
+    :param entries: wall-clock deadline, key, value and the own TTL
+     of every key, None for the default TTL
+    :type entries: list[tuple[float, Any, Any, float | None]]
+    :param block_size: number of entries pickled together
+    :type block_size: int
+    :raise ValueError: if block_size is less than 1
+    """
+    if block_size < 1:
+        raise ValueError("block_size must be greater than 0")
+    entries = sorted(entries, key=lambda entry: entry[0])
+    blocks = [
+        pickle.dumps(
+            (
+                [entry[1] for entry in block],
+                [entry[2] for entry in block],
+                {
+                    index: entry[3]
+                    for index, entry in enumerate(block)
+                    if entry[3] is not None
+                },
+            ),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        for block in chunks(entries, block_size)
+    ]
+    offsets = array("Q")
+    end = 0
+    for blob in blocks:
+        end += len(blob)
+        offsets.append(end)
+    directory, name = os.path.split(os.path.abspath(path))
+    file = tempfile.NamedTemporaryFile(
+        dir=directory, prefix=f"{name}.", suffix=".tmp", delete=False
+    )
+    try:
+        with file:
+            file.write(_HEADER.pack(_MAGIC, _VERSION, block_size, len(entries)))
+            file.write(_byteswap(array("d", [entry[0] for entry in entries])))
+            file.write(_byteswap(offsets))
+            for blob in blocks:
+                file.write(blob)
+        os.replace(file.name, path)
+    except BaseException:
+        os.unlink(file.name)
+        raise
+
+
+def read_snapshot(
+    path: str | os.PathLike[str], now: float
+) -> tuple[list[Any], list[Any], list[float], dict[Any, float]]:
+    """
+    Read entries with a deadline later than ``now`` from the snapshot file
+
+    :param path: path of the snapshot file
+    :type path: str | os.PathLike[str]
+    :param now: current wall-clock time
+    :type now: float
+    :return: keys, values, wall-clock deadlines and own TTLs of keys
+    :rtype: tuple[list[Any], list[Any], list[float], dict[Any, float]]
+    :raise ValueError: if the file is not a snapshot
+    """
+    keys = []  # type: list[Any]
+    values = []  # type: list[Any]
+    ttls = {}  # type: dict[Any, float]
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < _HEADER.size:
+            raise ValueError(f"{os.fspath(path)} is not a TTLDict snapshot")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            magic, version, block_size, count = _HEADER.unpack_from(view)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"{os.fspath(path)} is not a TTLDict snapshot")
+            position = _HEADER.size
+            deadlines = array("d")
+            deadlines.frombytes(view[position : position + count * 8])
+            position += count * 8
+            block_count = -(-count // block_size)
+            offsets = array("Q")
+            offsets.frombytes(view[position : position + block_count * 8])
+            position += block_count * 8
+            _byteswap(deadlines)
+            _byteswap(offsets)
+
+            first = bisect_right(deadlines, now)
+            for block in range(first // block_size, block_count):
+                start = position + (offsets[block - 1] if block else 0)
+                block_keys, block_values, block_ttls = pickle.loads(
+                    view[start : position + offsets[block]]
+                )
+                skip = max(first - block * block_size, 0)
+                keys.extend(block_keys[skip:])
+                values.extend(block_values[skip:])
+                for index, ttl in block_ttls.items():
+                    if index >= skip:
+                        ttls[block_keys[index]] = ttl
+    return keys, values, deadlines[first:].tolist(), ttls
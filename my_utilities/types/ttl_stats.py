@@ -0,0 +1,220 @@
+"""
+Module with statistics of TTL dictionaries
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterable
+
+from pydantic import BaseModel, Field
+
+LATENCY_BUCKETS = (
+    1e-6,
+    2e-6,
+    5e-6,
+    1e-5,
+    2e-5,
+    5e-5,
+    1e-4,
+    2e-4,
+    5e-4,
+    1e-3,
+    1e-2,
+    1e-1,
+)
+
+
+class LatencyHistogram(BaseModel):
+    """
+    Snapshot of sampled latencies of one operation
+    """
+
+    bounds: tuple[float, ...] = Field(
+        LATENCY_BUCKETS,
+        description="upper bounds of buckets in seconds, "
+        "the last bucket counts slower samples",
+    )
+    counts: list[int] = Field(..., description="number of samples in every bucket")
+    count: int = Field(0, description="number of samples")
+    total: float = Field(0.0, description="sum of sampled latencies in seconds")
+
+    @property
+    def mean(self) -> float:
+        """
+        Mean sampled latency in seconds, 0 without samples
+
+        :rtype: float
+        """
+        return self.total / self.count if self.count else 0.0
+
+
+class TTLDictStats(BaseModel):
+    """
+    Snapshot of statistics of a TTL dictionary
+    """
+
+    hits: int = Field(0, description="lookups of present keys")
+    misses: int = Field(0, description="lookups of absent or expired keys")
+    sets: int = Field(0, description="written keys")
+    expirations: int = Field(0, description="keys removed after their deadline")
+    evictions: int = Field(0, description="keys removed to stay within limits")
+    size: int = Field(0, description="stored keys, expired keys not yet removed too")
+    memory: int = Field(
+        0,
+        description="approximate size of the internal tables in bytes, "
+        "keys and values are included only with max_bytes",
+    )
+    get_latency: LatencyHistogram = Field(..., description="sampled lookups")
+    set_latency: LatencyHistogram = Field(..., description="sampled writes")
+
+    @property
+    def hit_ratio(self) -> float:
+        """
+        Share of lookups that found the key, 0 without lookups
+
+        :rtype: float
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @classmethod
+    def merge(cls, snapshots: Iterable[TTLDictStats]) -> TTLDictStats:
+        """
+        Sum statistics of several dictionaries, e.g. of shards
+
+        :param snapshots: statistics to sum
+        :type snapshots: Iterable[TTLDictStats]
+        :rtype: TTLDictStats
+        """
+        result = StatsCollector().snapshot(0, 0)
+        for item in snapshots:
+            result.hits += item.hits
+            result.misses += item.misses
+            result.sets += item.sets
+            result.expirations += item.expirations
+            result.evictions += item.evictions
+            result.size += item.size
+            result.memory += item.memory
+            for histogram, other in (
+                (result.get_latency, item.get_latency),
+                (result.set_latency, item.set_latency),
+            ):
+                histogram.counts = [
+                    left + right
+                    for left, right in zip(histogram.counts, other.counts, strict=True)
+                ]
+                histogram.count += other.count
+                histogram.total += other.total
+        return result
+
+
+class StatsCollector:
+    """
+    Mutable counters updated by a TTL dictionary
+
+    Counters are plain integers updated without a lock of their own, so a count
+     may be lost when threads race, which is fine for monitoring.
+     One of every ``sample_rate`` lookups and writes is timed.
+
+    :param sample_rate: time one of this many operations
+    :type sample_rate: int
+    """
+
+    __slots__ = (
+        "sample_rate",
+        "hits",
+        "misses",
+        "sets",
+        "expirations",
+        "evictions",
+        "_operations",
+        "_get_counts",
+        "_get_total",
+        "_set_counts",
+        "_set_total",
+    )
+
+    def __init__(self, sample_rate: int = 100) -> None:
+        """
+        init stats collector
+
+        :param sample_rate: time one of this many operations
+        :type sample_rate: int
+        :raise ValueError: if sample_rate is less than 1
+        """
+        if sample_rate < 1:
+            raise ValueError("sample_rate must be greater than 0")
+        self.sample_rate = sample_rate
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._operations = 0
+        self._get_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._get_total = 0.0
+        self._set_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._set_total = 0.0
+
+    def sample(self) -> bool:
+        """
+        Whether the current operation should be timed
+
+        :rtype: bool
+        """
+        self._operations += 1
+        return self._operations % self.sample_rate == 0
+
+    def observe_get(self, seconds: float) -> None:
+        """
+        Record the latency of a sampled lookup
+
+        :param seconds: latency in seconds
+        :type seconds: float
+        """
+        self._get_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self._get_total += seconds
+
+    def observe_set(self, seconds: float) -> None:
+        """
+        Record the latency of a sampled write
+
+        :param seconds: latency in seconds
+        :type seconds: float
+        """
+        self._set_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self._set_total += seconds
+
+    def snapshot(self, size: int, memory: int) -> TTLDictStats:
+        """
+        Copy counters into a snapshot
+
+        :param size: current number of keys
+        :type size: int
+        :param memory: approximate size of the internal tables
+         and of tracked entries in bytes
+        :type memory: int
+        :rtype: TTLDictStats
+        """
+        return TTLDictStats(
+            hits=self.hits,
+            misses=self.misses,
+            sets=self.sets,
+            expirations=self.expirations,
+            evictions=self.evictions,
+            size=size,
+            memory=memory,
+            get_latency=LatencyHistogram(
+                bounds=LATENCY_BUCKETS,
+                counts=list(self._get_counts),
+                count=sum(self._get_counts),
+                total=self._get_total,
+            ),
+            set_latency=LatencyHistogram(
+                bounds=LATENCY_BUCKETS,
+                counts=list(self._set_counts),
+                count=sum(self._set_counts),
+                total=self._set_total,
+            ),
+        )
@@ -0,0 +1,263 @@
+# mypy: ignore-errors
+import asyncio
+import threading
+import time
+
+import pytest
+
+from my_utilities.cache import (
+    AsyncCacheEngine,
+    AsyncMemoryCacheEngine,
+    CacheEngine,
+    MemoryCacheEngine,
+)
+
+
+def test_key_value():
+    cache = MemoryCacheEngine()
+    assert isinstance(cache, CacheEngine)
+    assert cache.set("a", 123)
+    assert cache.get("a") == 123
+    assert cache.delete("a") is True
+    assert cache.delete("a") is False
+    assert cache.get("a") is None
+
+    cache.set("short", 1, ttl=0.05)
+    cache.set("forever", 2)
+    assert not cache.update_ttl("missing", 1)
+    assert cache.update_ttl("forever", 0.05)
+    assert sorted(cache.keys()) == ["forever", "short"]
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert cache.keys() == []
+
+    cache.set("a", 1)
+    cache.lpush("list", 1)
+    assert cache.reset_cache()
+    assert cache.keys() == []
+    cache._disconnect()
+    cache._connect()
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+
+def test_ttl():
+    cache = MemoryCacheEngine()
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2)
+    assert 9 < cache.ttl("a") <= 10
+    assert cache.ttl("b") == float("inf")
+    assert cache.ttl("missing") is None
+
+
+def test_lists():
+    cache = MemoryCacheEngine()
+    assert cache.lpush("list", "a") == 1
+    assert cache.lpush("list", "b") == 2
+    assert cache.lpush("list", "a") == 3
+    assert cache.get("list") == ["a", "b", "a"]
+    assert cache.lrange("list") == ["a", "b", "a"]
+    assert cache.lrange("list", 1, 1) == ["b"]
+    assert cache.lrange("list", -2, -1) == ["b", "a"]
+    assert cache.lrange("list", 1, 10) == ["b", "a"]
+    assert cache.lrange("list", 2, 1) == []
+    assert cache.lrange("missing") == []
+    assert cache.lpos("list", "a") == 0
+    assert cache.lpos("list", "b") == 1
+    assert cache.lpos("list", "c") == -1
+    assert cache.lpos("missing", "c") == -1
+
+    assert cache.lrem("list", "a", count=-1) == 1
+    assert cache.lrange("list") == ["a", "b"]
+    assert cache.lpos("list", "b") == 1
+    cache.lpush("list", "b")
+    cache.lpush("list", "a")
+    assert cache.lrange("list") == ["a", "b", "a", "b"]
+    assert cache.lrem("list", "b", count=1) == 1
+    assert cache.lrange("list") == ["a", "a", "b"]
+    assert cache.lpos("list", "b") == 2
+    assert cache.lrem("list", "a") == 2
+    assert cache.lrem("list", "c") == 0
+    assert cache.lrem("missing", "c") == 0
+    assert cache.lrem("list", "b", count=5) == 1
+    assert "list" not in cache.keys()
+
+    cache.lpush("expiring", 1)
+    assert cache.update_ttl("expiring", 0.05)
+    time.sleep(0.1)
+    assert cache.lrange("expiring") == []
+
+    cache.set("string", "value")
+    for method, args in (
+        (cache.lpush, (1,)),
+        (cache.lpos, (1,)),
+        (cache.lrange, ()),
+        (cache.lrem, (1,)),
+    ):
+        with pytest.raises(ValueError):
+            method("string", *args)
+
+
+def test_concurrent_lpush():
+    cache = MemoryCacheEngine()
+
+    def worker(offset):
+        for index in range(200):
+            cache.lpush("list", offset + index)
+
+    threads = [threading.Thread(target=worker, args=(n * 1000,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache.lrange("list")) == 800
+    assert cache.lpos("list", 199) >= 0
+
+
+def test_delete_expired():
+    cache = MemoryCacheEngine()
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.delete("a") is False
+
+
+def test_async_engine():
+    async def main():
+        cache = AsyncMemoryCacheEngine()
+        assert isinstance(cache, AsyncCacheEngine)
+        assert await cache.set("a", 1, ttl=10)
+        assert await cache.get("a") == 1
+        assert await cache.update_ttl("a", 20)
+        assert 19 < await cache.ttl("a") <= 20
+        assert await cache.ttl("missing") is None
+        assert await cache.lpush("list", "x") == 1
+        assert await cache.lpos("list", "x") == 0
+        assert await cache.lrange("list") == ["x"]
+        assert sorted(await cache.keys()) == ["a", "list"]
+        assert await cache.lrem("list", "x") == 1
+        assert await cache.delete("a")
+        assert await cache.reset_cache()
+        await cache._disconnect()
+        await cache._connect()
+        assert await cache.keys() == []
+
+    asyncio.run(main())
+
+
+class LoopEngine(MemoryCacheEngine):
+    get_many = CacheEngine.get_many
+    set_many = CacheEngine.set_many
+    delete_many = CacheEngine.delete_many
+    update_ttl_many = CacheEngine.update_ttl_many
+    ttl = CacheEngine.ttl
+
+
+@pytest.mark.parametrize("engine_class", [MemoryCacheEngine, LoopEngine])
+def test_bulk(engine_class):
+    cache = engine_class()
+    assert cache.set_many({"a": 1, "b": 2, "c": 3}, ttl=10, ttls={"c": 0.05})
+    cache.lpush("list", "x")
+    assert cache.get_many(["a", "b", "c", "list", "missing"]) == {
+        "a": 1,
+        "b": 2,
+        "c": 3,
+        "list": ["x"],
+    }
+    time.sleep(0.1)
+    assert cache.get_many(["a", "c"]) == {"a": 1}
+    cache.set("short", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.delete_many(["a", "short", "missing"]) == 1
+    assert cache.update_ttl_many({"b": 0.05, "missing": 1}) == 1
+    assert cache.set_many({"d": 4})
+    time.sleep(0.1)
+    assert cache.keys() == ["list", "d"]
+
+
+def test_ttl_is_optional():
+    with pytest.raises(NotImplementedError):
+        LoopEngine().ttl("a")
+
+
+def test_async_bulk():
+    class AsyncLoopEngine(AsyncMemoryCacheEngine):
+        get_many = AsyncCacheEngine.get_many
+        set_many = AsyncCacheEngine.set_many
+        delete_many = AsyncCacheEngine.delete_many
+        update_ttl_many = AsyncCacheEngine.update_ttl_many
+        ttl = AsyncCacheEngine.ttl
+
+    async def main():
+        with pytest.raises(NotImplementedError):
+            await AsyncLoopEngine().ttl("a")
+        for cache in (AsyncMemoryCacheEngine(), AsyncLoopEngine()):
+            assert await cache.set_many({"a": 1, "b": 2}, ttls={"b": 0.05})
+            assert await cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+            assert await cache.update_ttl_many({"a": 0.05, "c": 1}) == 1
+            time.sleep(0.1)
+            assert await cache.get_many(["a", "b"]) == {}
+            await cache.set_many({"c": 3, "d": 4}, ttl=10)
+            assert await cache.delete_many(["c", "d", "e"]) == 2
+
+    asyncio.run(main())
+
+
+def test_pipeline():
+    cache = MemoryCacheEngine()
+    with cache.pipeline() as pipe:
+        pipe.set("a", 1, ttl=10).lpush("list", "x").lpush("list", "y")
+        pipe.get("a")
+        pipe.lrange("list")
+        pipe.get_many(["a", "missing"])
+        assert len(pipe) == 6
+    assert pipe.results == [True, 1, 2, 1, ["y", "x"], {"a": 1}]
+    assert len(pipe) == 0
+
+    with pytest.raises(RuntimeError):
+        with cache.pipeline() as pipe:
+            pipe.delete("a")
+            raise RuntimeError
+    assert len(pipe) == 0 and pipe.results == []
+    assert cache.get("a") == 1
+
+    pipe = cache.pipeline()
+    assert pipe.execute() == []
+    pipe.lrem("list", "x").delete("a")
+    assert pipe.execute() == [1, True]
+    assert cache.get("a") is None
+
+
+def test_pipeline_is_atomic_for_memory_engine():
+    class PausingEngine(MemoryCacheEngine):
+        def pause(self):
+            time.sleep(0.1)
+
+    cache = PausingEngine()
+    seen = []
+
+    def reader():
+        time.sleep(0.03)
+        seen.append(cache.lrange("list"))
+
+    thread = threading.Thread(target=reader)
+    with cache.pipeline() as pipe:
+        pipe.lpush("list", 1)
+        pipe._queue("pause")
+        pipe.lpush("list", 2)
+        thread.start()
+    thread.join()
+    # the reader waited for the whole batch
+    assert seen == [[2, 1]]
+
+
+def test_pipeline_falls_back_to_sequential_commands():
+    class LoopEngine(MemoryCacheEngine):
+        _execute_pipeline = CacheEngine._execute_pipeline
+
+    cache = LoopEngine()
+    with cache.pipeline() as pipe:
+        pipe.set_many({"a": 1, "b": 2}, ttls={"b": 0.05})
+        pipe.update_ttl("a", 10)
+        pipe.get("b")
+        pipe.delete_many(["a"])
+    assert pipe.results == [True, True, 2, 1]
@@ -0,0 +1,187 @@
+# mypy: ignore-errors
+import time
+
+import pytest
+
+from my_utilities.cache import CacheEngine, MemoryCacheEngine, NearCacheEngine
+
+
+class CountingEngine(MemoryCacheEngine):
+    """counts commands reaching the remote engine"""
+
+    def __init__(self):
+        super().__init__()
+        self.commands = []
+        self._in_batch = False
+
+    def _execute_pipeline(self, commands):
+        self.commands.extend(name for name, _, _ in commands)
+        self._in_batch = True
+        try:
+            return super()._execute_pipeline(commands)
+        finally:
+            self._in_batch = False
+
+    def get(self, key, **kwargs):
+        if not self._in_batch:
+            self.commands.append("get")
+        return super().get(key, **kwargs)
+
+
+def test_local_hits():
+    remote = CountingEngine()
+    cache = NearCacheEngine(remote, local_ttl=10)
+    remote.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    assert cache.get("missing") is None
+    # one pipeline of get and ttl for every miss, absent keys are not kept
+    assert remote.commands == ["get", "ttl", "get", "ttl", "get", "ttl"]
+
+
+def test_local_ttl_is_capped_by_remote_ttl():
+    remote = MemoryCacheEngine()
+    cache = NearCacheEngine(remote, local_ttl=10)
+    remote.set("a", 1, ttl=0.1)
+    remote.set("b", 2)
+    assert cache.get("a") == 1 and cache.get("b") == 2
+    assert cache._local.ttl("a") <= 0.1
+    assert 9 < cache._local.ttl("b") <= 10
+    time.sleep(0.15)
+    assert cache.get("a") is None
+
+
+def test_writes_invalidate_local_values():
+    written = []
+    remote = MemoryCacheEngine()
+    cache = NearCacheEngine(remote, function_on_write=written.extend)
+    cache.set("a", 1)
+    cache.set_many({"b": 2, "c": 3})
+    cache.lpush("list", "x")
+    assert cache.get_many(["a", "b", "c", "list"]) == {
+        "a": 1,
+        "b": 2,
+        "c": 3,
+        "list": ["x"],
+    }
+    assert len(cache._local) == 4
+
+    cache.set("a", 10)
+    cache.delete("b")
+    cache.update_ttl_many({"c": 5})
+    cache.lpush("list", "y")
+    assert len(cache._local) == 0
+    assert cache.get_many(["a", "b", "c", "list"]) == {
+        "a": 10,
+        "c": 3,
+        "list": ["y", "x"],
+    }
+    assert cache.lrem("list", "x") == 1
+    assert cache.get("list") == ["y"]
+    assert cache.delete_many(["a", "c"]) == 2
+    assert written == ["a", "b", "c", "list", "a", "b", "c", "list", "list", "a", "c"]
+
+
+def test_remote_invalidation():
+    remote = MemoryCacheEngine()
+    cache = NearCacheEngine(remote)
+    remote.set_many({"a": 1, "b": 2})
+    assert cache.get_many(["a", "b"]) == {"a": 1, "b": 2}
+    # written by another process
+    remote.set_many({"a": 10, "b": 20})
+    assert cache.get("a") == 1
+    cache.invalidate(["a"])
+    assert cache.get_many(["a", "b"]) == {"a": 10, "b": 2}
+    cache.invalidate()
+    assert cache.get("b") == 20
+
+
+def test_value_read_during_invalidation_is_not_kept():
+    class RacingEngine(MemoryCacheEngine):
+        def _execute_pipeline(self, commands):
+            results = super()._execute_pipeline(commands)
+            # another process writes the key and its message arrives
+            super().set("a", 2)
+            cache.invalidate(["a"])
+            return results
+
+    cache = NearCacheEngine(RacingEngine())
+    cache._remote.set("a", 1)
+    assert cache.get("a") == 1
+    assert "a" not in cache._local
+    assert cache.get_many(["a"]) == {"a": 2}
+    assert "a" not in cache._local
+
+
+def test_invalidation_of_other_keys_keeps_value():
+    class RacingEngine(MemoryCacheEngine):
+        def _execute_pipeline(self, commands):
+            results = super()._execute_pipeline(commands)
+            cache.invalidate([2])
+            return results
+
+    cache = NearCacheEngine(RacingEngine())
+    cache._remote.set_many({1: "a", 2: "b"})
+    assert cache.get(1) == "a"
+    assert 1 in cache._local
+    assert cache.get_many([1, 2]) == {1: "a", 2: "b"}
+    assert 2 not in cache._local
+    cache.invalidate()
+    assert cache.get(1) == "a"
+    assert cache._versions[hash(2) % len(cache._versions)] == 3
+
+
+def test_remote_without_ttl_is_read_through():
+    class NoTTLEngine(CountingEngine):
+        ttl = CacheEngine.ttl
+
+    remote = NoTTLEngine()
+    cache = NearCacheEngine(remote)
+    remote.set_many({"a": 1, "b": 2})
+    assert cache.get("a") == 1
+    assert cache.get("a") == 1
+    assert cache.get_many(["a", "b"]) == {"a": 1, "b": 2}
+    assert remote.commands == ["get", "get"]
+    assert len(cache._local) == 0
+
+
+def test_pipeline():
+    remote = CountingEngine()
+    cache = NearCacheEngine(remote)
+    remote.set_many({"a": 1, "b": 2})
+    assert cache.get("a") == 1
+    remote.commands.clear()
+
+    with cache.pipeline() as pipe:
+        pipe.get("a")
+        pipe.get("b")
+        pipe.set("b", 20)
+        pipe.get("b")
+        pipe.lpush("list", "x")
+    assert pipe.results == [1, 2, True, 20, 1]
+    # the local hit is not sent, the ttl of the first read of b is appended
+    assert remote.commands == ["get", "set", "get", "lpush", "ttl"]
+    # b was read before its write, so it is not kept
+    assert "b" not in cache._local
+    assert cache.get("b") == 20
+
+    remote.set(3, "c")
+    with cache.pipeline() as pipe:
+        pipe.get(3)
+        pipe.set(4, "d")
+    assert pipe.results == ["c", True]
+    # the write of another key does not drop the read
+    assert 3 in cache._local
+    assert 4 not in cache._local
+
+    with cache.pipeline() as pipe:
+        pipe.get("a")
+    assert pipe.results == [1]
+
+
+def test_wrong_params():
+    with pytest.raises(TypeError):
+        NearCacheEngine({})
+    with pytest.raises(ValueError):
+        NearCacheEngine(MemoryCacheEngine(), local_ttl=0)
@@ -0,0 +1,353 @@
+# mypy: ignore-errors
+import asyncio
+import math
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+
+from my_utilities.cache import NearCacheEngine, RESPCacheEngine, RESPError
+from my_utilities.jwt_handler.auth_cache_handler import AuthCacheHandler
+from my_utilities.jwt_handler.exc import NotValidSession
+from my_utilities.jwt_handler.jwt_handler import JWTAuthHandler, JWTHandlerConfig
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+class StubServer:
+    """in-process asyncio server answering the RESP commands the engine sends"""
+
+    def __init__(self, password=None):
+        self.password = password
+        self.data = {}
+        self.deadlines = {}
+        self.requests = []
+        self.connections = 0
+        self.open_connections = 0
+        self.tasks = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self.handle, "127.0.0.1", 0), self.loop
+        ).result()
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def shutdown(self):
+        self.server.close()
+        for task, writer in list(self.tasks.items()):
+            # the handler reads the end of the stream and returns
+            writer.transport.abort()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.tasks[task] = writer
+        self.connections += 1
+        self.open_connections += 1
+        authenticated = self.password is None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                request = []
+                for _ in range(int(line[1:])):
+                    length = int((await reader.readline())[1:])
+                    request.append((await reader.readexactly(length + 2))[:-2])
+                name = request[0].decode().upper()
+                self.requests.append(name)
+                if name == "AUTH":
+                    authenticated = request[1].decode() == self.password
+                    reply = "+OK" if authenticated else "-WRONGPASS invalid password"
+                elif not authenticated:
+                    reply = "-NOAUTH Authentication required."
+                else:
+                    reply = self.command(name, request[1:])
+                writer.write(self.encode(reply))
+                await writer.drain()
+        finally:
+            self.open_connections -= 1
+            self.tasks.pop(task, None)
+            writer.close()
+
+    def encode(self, reply):
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, str):
+            return reply.encode() + b"\r\n"
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        return b"*%d\r\n" % len(reply) + b"".join(self.encode(item) for item in reply)
+
+    def lookup(self, key):
+        deadline = self.deadlines.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.deadlines.pop(key, None)
+        return self.data.get(key)
+
+    def command(self, name, args):
+        if name in ("PING", "SELECT"):
+            return "+PONG" if name == "PING" else "+OK"
+        if name == "FLUSHDB":
+            self.data.clear()
+            self.deadlines.clear()
+            return "+OK"
+        if name == "SCAN":
+            keys = [key for key in list(self.data) if self.lookup(key) is not None]
+            return [b"0", keys]
+        key = args[0]
+        value = self.lookup(key)
+        if name == "SET":
+            self.data[key] = args[1]
+            self.deadlines.pop(key, None)
+            if len(args) == 4:
+                self.deadlines[key] = time.monotonic() + int(args[3]) / 1000
+            return "+OK"
+        if name == "GET":
+            return "-" + WRONGTYPE if isinstance(value, list) else value
+        if name == "MGET":
+            values = [self.lookup(item) for item in args]
+            return [None if isinstance(item, list) else item for item in values]
+        if name == "DEL":
+            deleted = [item for item in args if self.lookup(item) is not None]
+            for item in deleted:
+                del self.data[item]
+                self.deadlines.pop(item, None)
+            return len(deleted)
+        if name == "PEXPIRE":
+            if value is None:
+                return 0
+            self.deadlines[key] = time.monotonic() + int(args[1]) / 1000
+            return 1
+        if name == "PTTL":
+            if value is None:
+                return -2
+            if key not in self.deadlines:
+                return -1
+            return math.ceil((self.deadlines[key] - time.monotonic()) * 1000)
+        if value is not None and not isinstance(value, list):
+            return "-" + WRONGTYPE
+        items = value or []
+        if name == "LPUSH":
+            self.data[key] = [args[1]] + items
+            return len(items) + 1
+        if name == "LRANGE":
+            start, end = int(args[1]), int(args[2])
+            end = len(items) if end == -1 else end + 1
+            return items[start:end]
+        if name == "LPOS":
+            return items.index(args[1]) if args[1] in items else None
+        if name == "LREM":
+            count, val = int(args[1]), args[2]
+            if count < 0:
+                items.reverse()
+            kept, removed = [], 0
+            for item in items:
+                if item == val and (count == 0 or removed < abs(count)):
+                    removed += 1
+                else:
+                    kept.append(item)
+            if count < 0:
+                kept.reverse()
+            if kept:
+                self.data[key] = kept
+            elif key in self.data:
+                del self.data[key]
+            return removed
+        return f"-ERR unknown command '{name}'"
+
+
+@pytest.fixture
+def server():
+    stub = StubServer()
+    yield stub
+    stub.close()
+
+
+def test_key_value(server):
+    cache = RESPCacheEngine(port=server.port)
+    assert cache.set("a", {"x": [1, 2]})
+    assert cache.set("b", "token", ttl=0.05)
+    assert cache.get("a") == {"x": [1, 2]}
+    assert cache.get("b") == "token"
+    assert cache.get("missing") is None
+    assert cache.ttl("a") == math.inf
+    assert 0 < cache.ttl("b") <= 0.05
+    assert cache.ttl("missing") is None
+    time.sleep(0.1)
+    assert cache.get("b") is None
+    assert cache.update_ttl("a", 10)
+    assert 9 < cache.ttl("a") <= 10
+    assert not cache.update_ttl("missing", 10)
+    assert sorted(cache.keys()) == ["a"]
+    assert cache.delete("a")
+    assert not cache.delete("a")
+    assert cache.set("c", 1)
+    assert cache.reset_cache()
+    assert cache.keys() == []
+
+
+def test_bulk(server):
+    cache = RESPCacheEngine(port=server.port)
+    assert cache.set_many({"a": 1, "b": 2, "c": 3}, ttl=10, ttls={"c": 0.05})
+    assert cache.get_many(["a", "b", "c", "missing"]) == {"a": 1, "b": 2, "c": 3}
+    assert cache.get_many([]) == {}
+    time.sleep(0.1)
+    assert cache.update_ttl_many({"a": 20, "c": 1}) == 1
+    assert 19 < cache.ttl("a") <= 20
+    assert cache.delete_many(["a", "c"]) == 1
+    assert cache.delete_many([]) == 0
+    assert cache.keys() == ["b"]
+
+
+def test_lists(server):
+    cache = RESPCacheEngine(port=server.port)
+    for value in ["x", "y", "x", "z"]:
+        cache.lpush("list", value)
+    assert cache.lrange("list") == ["z", "x", "y", "x"]
+    assert cache.lrange("list", 1, 2) == ["x", "y"]
+    assert cache.lpos("list", "y") == 2
+    assert cache.lpos("list", "missing") == -1
+    assert cache.lrem("list", "x", -1) == 1
+    assert cache.lrange("list") == ["z", "x", "y"]
+    assert cache.lrem("list", "x") == 1
+    assert cache.lrem("missing", "x") == 0
+    assert cache.lrange("missing") == []
+
+    cache.set("string", 1)
+    with pytest.raises(RESPError, match="WRONGTYPE"):
+        cache.lpush("string", "x")
+    with pytest.raises(RESPError, match="WRONGTYPE"):
+        cache.get("list")
+    # the connection is still in sync after the error
+    assert cache.get("string") == 1
+
+
+def test_pipeline_is_one_round_trip(server):
+    cache = RESPCacheEngine(port=server.port, pool_size=1)
+    server.requests.clear()
+    with cache.pipeline() as pipe:
+        pipe.set("a", 1, ttl=10)
+        pipe.set_many({"b": 2, "c": 3})
+        pipe.lpush("list", "x")
+        pipe.get("a")
+        pipe.get_many(["b", "c"])
+        pipe.ttl("b")
+    assert pipe.results == [True, True, 1, 1, {"b": 2, "c": 3}, math.inf]
+    assert server.requests == ["SET", "SET", "SET", "LPUSH", "GET", "MGET", "PTTL"]
+    assert server.connections == 1
+
+    with pytest.raises(RESPError):
+        with cache.pipeline() as pipe:
+            pipe.get("list")
+            pipe.set("d", 4)
+    # replies of all commands were read, the failed one does not stop the rest
+    assert cache.get("d") == 4
+
+
+def test_pool(server):
+    cache = RESPCacheEngine(port=server.port, pool_size=4)
+    errors = []
+
+    def worker(offset):
+        try:
+            for index in range(100):
+                key = f"{offset}-{index}"
+                cache.set(key, index)
+                assert cache.get(key) == index
+        except Exception as exc:  # pragma: no cover
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache.keys()) == 800
+    assert server.connections <= 4
+    assert len(cache._idle) == server.connections
+
+
+def test_pool_timeout(server):
+    cache = RESPCacheEngine(port=server.port, pool_size=1, timeout=0.05)
+    with cache._connection():
+        with pytest.raises(TimeoutError):
+            cache.get("a")
+    assert cache.get("a") is None
+
+
+def test_disconnect(server):
+    cache = RESPCacheEngine(port=server.port, pool_size=2)
+    cache.set("a", 1)
+    with cache._connection() as connection:
+        cache._disconnect()
+        assert len(cache._idle) == 0
+        connection.call("PING")
+    # the connection borrowed before the disconnect is closed on return
+    assert len(cache._idle) == 0
+    time.sleep(0.05)
+    assert server.open_connections == 0
+    assert cache.get("a") == 1
+    cache._connect()
+    assert len(cache._idle) == 1
+
+
+def test_auth_and_select():
+    server = StubServer(password="secret")
+    try:
+        with pytest.raises(RESPError, match="WRONGPASS"):
+            RESPCacheEngine(port=server.port, password="wrong")
+        server.requests.clear()
+        cache = RESPCacheEngine(port=server.port, password="secret", db=2)
+        assert server.requests == ["AUTH", "SELECT", "PING"]
+        assert cache.set("a", 1)
+    finally:
+        server.close()
+
+
+def test_wrong_params(server):
+    with pytest.raises(ValueError):
+        RESPCacheEngine(port=server.port, pool_size=0)
+
+
+def test_near_cache(server):
+    remote = RESPCacheEngine(port=server.port)
+    cache = NearCacheEngine(remote, local_ttl=10)
+    remote.set("a", 1, ttl=0.05)
+    assert cache.get("a") == 1
+    server.requests.clear()
+    assert cache.get("a") == 1
+    assert server.requests == []
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+
+def test_auth_cache_handler(server):
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=5, ttl_refresh_token=5, secret=str(uuid4()), leeway=0
+    )
+    cache = RESPCacheEngine(port=server.port)
+    ach = AuthCacheHandler(config=config, cache=cache, is_multy_session=True)
+    at, rt = ach.get_pair_tokens(user_id="1", payload={"a": 1})
+    other_at, other_rt = ach.get_pair_tokens(user_id="1")
+    assert ach.verify_token(at)[2]["a"] == 1
+    ach.clear_other_sessions(at)
+    with pytest.raises(NotValidSession):
+        ach.verify_token(other_rt, is_access_token=False)
+    new_at, new_rt = ach.refresh_pair_tokens(rt)
+    assert cache.lrange("user_1_access_tokens") == [new_at]
+    ach.delete_pair_tokens(new_at)
+    assert cache.keys() == []
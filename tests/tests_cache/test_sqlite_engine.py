@@ -0,0 +1,193 @@
+# mypy: ignore-errors
+import math
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from my_utilities.cache import NearCacheEngine, SQLiteCacheEngine
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "cache.db"
+
+
+def _worker(path, offset):
+    cache = SQLiteCacheEngine(path)
+    for index in range(100):
+        cache.set(f"{offset}-{index}", index, ttl=60)
+        cache.lpush("list", f"{offset}-{index}")
+    cache._disconnect()
+
+
+def test_wal_mode_and_persistence(path):
+    cache = SQLiteCacheEngine(path)
+    assert cache._db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    cache.set("a", {"x": [1, 2]})
+    cache.lpush("list", "x")
+    cache._disconnect()
+    cache = SQLiteCacheEngine(path)
+    assert cache.get("a") == {"x": [1, 2]}
+    assert cache.get("list") == ["x"]
+
+
+def test_key_value(path):
+    cache = SQLiteCacheEngine(path)
+    assert cache.set("a", 1)
+    assert cache.set("b", "token", ttl=0.05)
+    assert cache.get("a") == 1
+    assert cache.get("b") == "token"
+    assert cache.get("missing") is None
+    assert cache.ttl("a") == math.inf
+    assert 0 < cache.ttl("b") <= 0.05
+    assert cache.ttl("missing") is None
+    time.sleep(0.1)
+    assert cache.get("b") is None
+    assert cache.ttl("b") is None
+    assert not cache.update_ttl("b", 10)
+    assert not cache.delete("b")
+    assert cache.update_ttl("a", 10)
+    assert 9 < cache.ttl("a") <= 10
+    assert cache.keys() == ["a"]
+    assert cache.delete("a")
+    assert not cache.delete("a")
+    cache.set("c", 1)
+    assert cache.reset_cache()
+    assert cache.keys() == []
+
+
+def test_bulk(path):
+    cache = SQLiteCacheEngine(path)
+    assert cache.set_many({"a": 1, "b": 2, "c": 3}, ttl=10, ttls={"c": 0.05})
+    cache.lpush("list", "x")
+    keys = [f"k{index}" for index in range(1200)]
+    cache.set_many(dict.fromkeys(keys, 0))
+    found = cache.get_many(["a", "b", "c", "list", "missing"] + keys)
+    assert len(found) == 1204
+    assert found["list"] == ["x"] and found["c"] == 3
+    time.sleep(0.1)
+    assert cache.get_many(["a", "c"]) == {"a": 1}
+    assert cache.update_ttl_many({"b": 0.05, "c": 1}) == 1
+    assert cache.delete_many(["a", "c"] + keys) == 1201
+    time.sleep(0.1)
+    assert cache.keys() == ["list"]
+
+
+def test_lists(path):
+    cache = SQLiteCacheEngine(path)
+    for length, value in enumerate(["x", "y", "x", "z"], 1):
+        assert cache.lpush("list", value) == length
+    assert cache.lrange("list") == ["z", "x", "y", "x"]
+    assert cache.lrange("list", 1, 2) == ["x", "y"]
+    assert cache.lrange("list", -2) == ["y", "x"]
+    assert cache.lrange("list", 2, 1) == []
+    assert cache.lpos("list", "y") == 2
+    assert cache.lpos("list", "missing") == -1
+    assert cache.lpos("missing", "x") == -1
+    assert cache.lrem("list", "x", -1) == 1
+    assert cache.lrange("list") == ["z", "x", "y"]
+    assert cache.lrem("list", "x", 1) == 1
+    assert cache.lpush("list", "w") == 3
+    assert cache.lrem("list", "w") == 1
+    assert cache.lrem("list", "y") == 1
+    assert cache.lrem("list", "z") == 1
+    assert cache.get("list") is None
+    assert cache.lrem("list", "z") == 0
+
+    cache.set("string", 1)
+    with pytest.raises(ValueError):
+        cache.lpush("string", "x")
+    with pytest.raises(ValueError):
+        cache.lrange("string")
+    # a failed write leaves nothing behind
+    assert cache.get("string") == 1
+
+    cache.lpush("expiring", "old")
+    cache.update_ttl("expiring", 0.05)
+    time.sleep(0.1)
+    assert cache.lpush("expiring", "new") == 1
+    assert cache.get("expiring") == ["new"]
+    cache.set("expiring", 1)
+    assert cache._db.execute("SELECT COUNT(*) FROM cache_list").fetchone()[0] == 0
+
+
+def test_incremental_purge(path):
+    cache = SQLiteCacheEngine(path, purge_size=10)
+    cache.set_many({index: index for index in range(25)}, ttl=0.05)
+    cache.lpush("list", "x")
+    cache.update_ttl("list", 0.05)
+    time.sleep(0.1)
+    assert cache._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 26
+    cache.set("a", 1)
+    assert cache._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 17
+    cache.set("b", 1)
+    cache.set("c", 1)
+    assert sorted(cache.keys()) == ["a", "b", "c"]
+    assert cache._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 3
+    assert cache._db.execute("SELECT COUNT(*) FROM cache_list").fetchone()[0] == 0
+
+
+def test_pipeline_is_one_transaction(path):
+    cache = SQLiteCacheEngine(path)
+    with cache.pipeline() as pipe:
+        pipe.set("a", 1).lpush("list", "x").get("a").lrange("list")
+    assert pipe.results == [True, 1, 1, ["x"]]
+
+    cache.set("string", 1)
+    with pytest.raises(ValueError):
+        with cache.pipeline() as pipe:
+            pipe.set("b", 2)
+            pipe.lpush("string", "x")
+    # the whole pipeline was rolled back
+    assert cache.get("b") is None
+
+
+def test_threads(path):
+    cache = SQLiteCacheEngine(path)
+
+    def worker(offset):
+        for index in range(100):
+            cache.set(f"{offset}-{index}", index)
+            cache.lpush("list", index)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache.keys()) == 401
+    assert len(cache.lrange("list")) == 400
+
+
+def test_processes(path):
+    cache = SQLiteCacheEngine(path, timeout=30)
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_worker, args=(path, i)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+    assert len(cache.keys()) == 401
+    assert len(cache.lrange("list")) == 400
+    assert cache.get("3-99") == 99
+
+
+def test_near_cache(path):
+    remote = SQLiteCacheEngine(path)
+    cache = NearCacheEngine(remote)
+    remote.set("a", 1, ttl=0.05)
+    assert cache.get("a") == 1
+    assert cache._local.ttl("a") <= 0.05
+
+
+def test_wrong_params(path):
+    with pytest.raises(ValueError):
+        SQLiteCacheEngine(path, purge_size=-1)
+    cache = SQLiteCacheEngine(path)
+    cache._disconnect()
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache.get("a")
@@ -0,0 +1,181 @@
+# mypy: ignore-errors
+import asyncio
+import threading
+import time
+
+import pytest
+
+from my_utilities.cache import make_key, ttl_cache
+
+
+def test_make_key():
+    assert make_key(1, 2) == (1, 2)
+    assert make_key(1, b=2, a=1) == make_key(1, a=1, b=2)
+    assert make_key(1, a=1) != make_key(1, 1)
+
+
+def test_sync_cache_and_expire():
+    calls = []
+
+    @ttl_cache(ttl=0.1, maxsize=2)
+    def square(x):
+        """square"""
+        calls.append(x)
+        return x * x
+
+    assert square.__doc__ == "square"
+    assert square(2) == 4
+    assert square(2) == 4
+    assert calls == [2]
+    square(3)
+    square(4)
+    square(2)
+    assert calls == [2, 3, 4, 2]
+    square.cache_invalidate(2)
+    square(2)
+    assert calls == [2, 3, 4, 2, 2]
+    time.sleep(0.15)
+    square(4)
+    assert calls[-1] == 4
+    square.cache_clear()
+    assert len(square.cache) == 0
+
+
+def test_custom_key():
+    calls = []
+
+    @ttl_cache(key=lambda user, request_id=None: user)
+    def load(user, request_id=None):
+        calls.append(request_id)
+        return user
+
+    load("a", request_id=1)
+    load("a", request_id=2)
+    assert calls == [1]
+
+
+def test_negative_caching():
+    calls = []
+
+    @ttl_cache(ttl=10)
+    def find(x):
+        calls.append(x)
+        return None
+
+    find(1)
+    find(1)
+    assert calls == [1, 1]
+
+    @ttl_cache(ttl=10, negative_ttl=0.05, cache_exceptions=(KeyError,))
+    def lookup(x):
+        calls.append(x)
+        if x == "missing":
+            raise KeyError(x)
+        if x == "boom":
+            raise RuntimeError(x)
+        return None
+
+    calls.clear()
+    lookup(1)
+    lookup(1)
+    for _ in range(2):
+        with pytest.raises(KeyError):
+            lookup("missing")
+        with pytest.raises(RuntimeError):
+            lookup("boom")
+    assert calls == [1, "missing", "boom", "boom"]
+    time.sleep(0.1)
+    lookup(1)
+    assert calls[-1] == 1
+
+    with pytest.raises(ValueError):
+        ttl_cache(ttl=0)
+    with pytest.raises(ValueError):
+        ttl_cache(negative_ttl=0)
+    with pytest.raises(ValueError):
+        ttl_cache(cache_exceptions=(KeyError,))
+
+
+def test_sync_single_flight():
+    calls = []
+    release = threading.Event()
+
+    @ttl_cache(ttl=10)
+    def slow(x):
+        calls.append(x)
+        release.wait()
+        if x == "error":
+            raise RuntimeError(x)
+        return x
+
+    results = []
+    errors = []
+
+    def worker(x):
+        try:
+            results.append(slow(x))
+        except RuntimeError as error:
+            errors.append(error)
+
+    threads = [
+        threading.Thread(target=worker, args=(x,))
+        for x in ["cold"] * 50 + ["error"] * 10
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sorted(calls) == ["cold", "error"]
+    assert results == ["cold"] * 50
+    assert len(errors) == 10
+
+
+def test_async_single_flight():
+    calls = []
+
+    @ttl_cache(ttl=10)
+    async def fetch(x):
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return x * 2
+
+    async def main():
+        results = await asyncio.gather(*(fetch(1) for _ in range(500)))
+        assert results == [2] * 500
+        assert await fetch(1) == 2
+
+    asyncio.run(main())
+    assert calls == [1]
+
+
+def test_async_errors_and_cancel():
+    calls = []
+
+    @ttl_cache(ttl=10, negative_ttl=10, cache_exceptions=(KeyError,))
+    async def fetch(x):
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        if x == "missing":
+            raise KeyError(x)
+        return x
+
+    async def main():
+        results = await asyncio.gather(
+            *(fetch("missing") for _ in range(5)), return_exceptions=True
+        )
+        assert all(isinstance(result, KeyError) for result in results)
+        with pytest.raises(KeyError):
+            await fetch("missing")
+        assert calls == ["missing"]
+
+        leader = asyncio.ensure_future(fetch("a"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(fetch("a"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "a"
+        assert calls == ["missing", "a", "a"]
+
+    asyncio.run(main())
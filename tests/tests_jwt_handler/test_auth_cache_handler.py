@@ -1,4 +1,5 @@
 # mypy: ignore-errors
+import asyncio
 import time
 from enum import verify
 from pprint import pprint
@@ -7,8 +8,16 @@ from uuid import uuid4
 
 import pytest
 
-from my_utilities.cache import CacheEngine
-from my_utilities.jwt_handler.auth_cache_handler import AuthCacheHandler
+from my_utilities.cache import (
+    AsyncMemoryCacheEngine,
+    CacheEngine,
+    MemoryCacheEngine,
+    NearCacheEngine,
+)
+from my_utilities.jwt_handler.auth_cache_handler import (
+    AsyncAuthCacheHandler,
+    AuthCacheHandler,
+)
 from my_utilities.jwt_handler.exc import (
     WrongTypeToken,
     TTLTokenExpiredError,
@@ -243,8 +252,9 @@ def test_auth_cache_handler_multy_session() -> None:
     JWTAuthHandler.reset_instance_force()
 
     secret = str(uuid4())
+    # exp is truncated to whole seconds, 3 seconds leave at least 2 before it
     config = JWTHandlerConfig(
-        ttl_access_token=1, ttl_refresh_token=5, secret=secret, leeway=0
+        ttl_access_token=3, ttl_refresh_token=10, secret=secret, leeway=0
     )
     cache = DictCache()
     ach = AuthCacheHandler(config=config, cache=cache, is_multy_session=True)
@@ -264,7 +274,7 @@ def test_auth_cache_handler_multy_session() -> None:
     with pytest.raises(WrongTypeToken):
         ach.verify_token(rt, is_access_token=True)
 
-    time.sleep(2)
+    time.sleep(3.1)
     with pytest.raises(TTLTokenExpiredError):
         ach.verify_token(at, is_access_token=True)
 
@@ -282,12 +292,81 @@ def test_auth_cache_handler_multy_session() -> None:
         ach.clear_other_sessions(new_at, is_access_token=True)
 
 
+@pytest.mark.parametrize(
+    "cache_class",
+    [MemoryCacheEngine, lambda: NearCacheEngine(MemoryCacheEngine())],
+)
+def test_auth_cache_handler_multy_session_engines(cache_class) -> None:
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=5, ttl_refresh_token=5, secret=str(uuid4()), leeway=0
+    )
+    cache = cache_class()
+    ach = AuthCacheHandler(config=config, cache=cache, is_multy_session=True)
+    at, rt = ach.get_pair_tokens(
+        user_id=USER_ID, payload=PAYLOAD, headers=HEADER, is_add_expired=True
+    )
+    other_at, other_rt = ach.get_pair_tokens(
+        user_id=USER_ID, payload=PAYLOAD, headers=HEADER, is_add_expired=True
+    )
+    sub_at, head_at, pl_at = ach.verify_token(at, is_access_token=True)
+    sub_rt, head_rt, pl_rt = ach.verify_token(rt, is_access_token=False)
+    assert sub_at == USER_ID == sub_rt
+    assert pl_at == PAYLOAD == pl_rt
+    assert head_at == HEADER == head_rt
+    with pytest.raises(WrongTypeToken):
+        ach.verify_token(rt, is_access_token=True)
+
+    new_at, new_rt = ach.refresh_pair_tokens(rt)
+    ach.verify_token(new_at)
+    ach.verify_token(other_at)
+    with pytest.raises(NotValidSession):
+        ach.verify_token(rt, is_access_token=False)
+    with pytest.raises(NotValidSession):
+        ach.clear_other_sessions(rt, is_access_token=False)
+
+    ach.clear_other_sessions(new_at)
+    with pytest.raises(NotValidSession):
+        ach.verify_token(other_rt, is_access_token=False)
+
+    ach.delete_pair_tokens(new_at)
+    with pytest.raises(NotValidSession):
+        ach.clear_other_sessions(new_at, is_access_token=True)
+
+
+@pytest.mark.parametrize(
+    "cache_class",
+    [DictCache, MemoryCacheEngine, lambda: NearCacheEngine(MemoryCacheEngine())],
+)
+def test_clear_other_sessions_after_access_token_expired(cache_class) -> None:
+    JWTAuthHandler.reset_instance_force()
+    # the cache drops the access token after 2 seconds, its exp is at least
+    # 1 second after it is issued
+    config = JWTHandlerConfig(
+        ttl_access_token=2, ttl_refresh_token=10, secret=str(uuid4()), leeway=0
+    )
+    cache = cache_class()
+    ach = AuthCacheHandler(config=config, cache=cache, is_multy_session=True)
+    other_at, other_rt = ach.get_pair_tokens(user_id=USER_ID)
+    time.sleep(2.1)
+    assert cache.get(other_at) is None
+    at, rt = ach.get_pair_tokens(user_id=USER_ID)
+
+    ach.clear_other_sessions(at)
+    with pytest.raises(NotValidSession):
+        ach.refresh_pair_tokens(other_rt)
+    assert cache.get(None) is None and cache.get("null") is None
+    assert cache.lrange(f"user_{USER_ID}_access_tokens") == [at]
+    assert cache.lrange(f"user_{USER_ID}_refresh_tokens") == [rt]
+    ach.refresh_pair_tokens(rt)
+
+
 def test_auth_cache_handler_without_multy_session() -> None:
     JWTAuthHandler.reset_instance_force()
 
     secret = str(uuid4())
     config = JWTHandlerConfig(
-        ttl_access_token=1, ttl_refresh_token=5, secret=secret, leeway=0
+        ttl_access_token=3, ttl_refresh_token=10, secret=secret, leeway=0
     )
     cache = DictCache()
 
@@ -310,17 +389,47 @@ def test_auth_cache_handler_without_multy_session() -> None:
     ach.verify_token(new_at, is_access_token=True)
     ach.verify_token(new_rt, is_access_token=False)
 
-    time.sleep(2)
+    time.sleep(3.1)
     with pytest.raises(TTLTokenExpiredError):
         ach.verify_token(new_at)
 
 
+@pytest.mark.parametrize(
+    "cache_class",
+    [MemoryCacheEngine, lambda: NearCacheEngine(MemoryCacheEngine())],
+)
+def test_auth_cache_handler_without_multy_session_engines(cache_class) -> None:
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=5, ttl_refresh_token=5, secret=str(uuid4()), leeway=0
+    )
+    cache = cache_class()
+    ach = AuthCacheHandler(config=config, cache=cache, is_multy_session=False)
+    at, rt = ach.get_pair_tokens(
+        user_id=USER_ID, payload=PAYLOAD, headers=HEADER, is_add_expired=True
+    )
+    at2, rt2 = ach.get_pair_tokens(
+        user_id=USER_ID, payload=PAYLOAD, headers=HEADER, is_add_expired=True
+    )
+    with pytest.raises(NotValidSession):
+        ach.verify_token(rt, is_access_token=False)
+    ach.verify_token(rt2, is_access_token=False)
+    with pytest.raises(NotValidSession):
+        ach.refresh_pair_tokens(rt)
+
+    new_at, new_rt = ach.refresh_pair_tokens(rt2)
+    with pytest.raises(NotValidSession):
+        ach.verify_token(rt2, is_access_token=False)
+    ach.verify_token(new_at, is_access_token=True)
+    ach.verify_token(new_rt, is_access_token=False)
+
+
 def test_auth_cache_without_cache() -> None:
     JWTAuthHandler.reset_instance_force()
     secret = str(uuid4())
 
     config = JWTHandlerConfig(
-        ttl_access_token=1, ttl_refresh_token=5, secret=secret, leeway=0
+        ttl_access_token=3, ttl_refresh_token=10, secret=secret, leeway=0
     )
     ach = AuthCacheHandler(config=config, is_multy_session=False)
     at, rt = ach.get_pair_tokens(
@@ -341,7 +450,7 @@ def test_auth_cache_without_cache() -> None:
     assert (rec_header1 == rec_header2) != HEADER
     assert (rec_payload1 == rec_payload2) != PAYLOAD
 
-    time.sleep(2)
+    time.sleep(3.1)
     with pytest.raises(TTLTokenExpiredError):
         ach.verify_token(at, is_access_token=True)
     with pytest.raises(TTLTokenExpiredError):
@@ -360,3 +469,224 @@ def test_auth_cache_without_cache() -> None:
     ach.delete_pair_tokens(new_at2, is_access_token=True)
     ach.clear_other_sessions(new_rt2, is_access_token=False)
     ach.clear_other_sessions(new_at2, is_access_token=True)
+
+
+class RoundTripCache(MemoryCacheEngine):
+    """counts commands sent outside pipelines and pipeline batches"""
+
+    def __init__(self):
+        super().__init__()
+        self.round_trips = 0
+        self._in_batch = False
+
+    def _count(self):
+        if not self._in_batch:
+            self.round_trips += 1
+
+    def get(self, key, **kwargs):
+        self._count()
+        return super().get(key, **kwargs)
+
+    def lrange(self, key, start=0, end=-1):
+        self._count()
+        return super().lrange(key, start, end)
+
+    def _execute_pipeline(self, commands):
+        self.round_trips += 1
+        self._in_batch = True
+        try:
+            return super()._execute_pipeline(commands)
+        finally:
+            self._in_batch = False
+
+
+def test_auth_cache_handler_pipelines_commands() -> None:
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=5, ttl_refresh_token=5, secret=str(uuid4()), leeway=0
+    )
+    cache = RoundTripCache()
+    ach = AuthCacheHandler(config=config, cache=cache, is_multy_session=True)
+
+    at, rt = ach.get_pair_tokens(user_id=USER_ID)
+    other_at, other_rt = ach.get_pair_tokens(user_id=USER_ID)
+    assert cache.round_trips == 2
+    ach.clear_other_sessions(at)
+    # pair token, session lists, removal
+    assert cache.round_trips == 5
+    assert cache.get(other_at) is None and cache.get(other_rt) is None
+    assert cache.get(rt) == at
+    assert cache.lrange(f"user_{USER_ID}_access_tokens") == [at]
+    assert cache.lrange(f"user_{USER_ID}_refresh_tokens") == [rt]
+    cache.round_trips = 0
+    new_at, new_rt = ach.refresh_pair_tokens(rt)
+    # pair token, removal, new pair
+    assert cache.round_trips == 3
+    assert cache.get(at) is None
+    ach.delete_pair_tokens(new_at)
+    assert cache.keys() == []
+
+    ach = AuthCacheHandler(config=config, cache=cache, is_multy_session=False)
+    cache.round_trips = 0
+    ach.get_pair_tokens(user_id=USER_ID)
+    # old tokens, new pair
+    assert cache.round_trips == 2
+
+
+class SlowAsyncCache(AsyncMemoryCacheEngine):
+    """every write waits like a network round trip"""
+
+    async def set(self, key, value, ttl=None, **kwargs):
+        await asyncio.sleep(0.05)
+        return await super().set(key, value, ttl=ttl)
+
+    async def lpush(self, key, value):
+        await asyncio.sleep(0.05)
+        return await super().lpush(key, value)
+
+
+def test_async_auth_cache_handler_multy_session() -> None:
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=5, ttl_refresh_token=5, secret=str(uuid4()), leeway=0
+    )
+    ach = AsyncAuthCacheHandler(
+        config=config, cache=SlowAsyncCache(), is_multy_session=True
+    )
+
+    async def main():
+        started = time.perf_counter()
+        at, rt = await ach.get_pair_tokens(
+            user_id=USER_ID, payload=PAYLOAD, headers=HEADER, is_add_expired=True
+        )
+        # two lpush and two set overlap instead of taking four round trips
+        assert time.perf_counter() - started < 0.15
+        other_at, other_rt = await ach.get_pair_tokens(
+            user_id=USER_ID, payload=PAYLOAD, headers=HEADER
+        )
+        sub_at, head_at, pl_at = await ach.verify_token(at, is_access_token=True)
+        sub_rt, _, pl_rt = await ach.verify_token(rt, is_access_token=False)
+        assert sub_at == USER_ID == sub_rt
+        assert pl_at == PAYLOAD == pl_rt
+        assert head_at == HEADER
+        with pytest.raises(WrongTypeToken):
+            await ach.verify_token(rt, is_access_token=True)
+
+        new_at, new_rt = await ach.refresh_pair_tokens(rt)
+        await ach.verify_token(new_at)
+        with pytest.raises(NotValidSession):
+            await ach.verify_token(rt, is_access_token=False)
+
+        await ach.clear_other_sessions(new_at)
+        with pytest.raises(NotValidSession):
+            await ach.verify_token(other_at)
+        with pytest.raises(NotValidSession):
+            await ach.verify_token(other_rt, is_access_token=False)
+        await ach.verify_token(new_rt, is_access_token=False)
+        assert await ach._cache.lrange(f"user_{USER_ID}_access_tokens") == [new_at]
+
+        await ach.delete_pair_tokens(new_at)
+        with pytest.raises(NotValidSession):
+            await ach.verify_token(new_at)
+        assert await ach._cache.lrange(f"user_{USER_ID}_access_tokens") == []
+
+    asyncio.run(main())
+
+
+class GetCountingAsyncCache(AsyncMemoryCacheEngine):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    async def get(self, key, **kwargs):
+        self.gets += 1
+        return await super().get(key)
+
+
+def test_async_auth_cache_handler_reads_pair_token_once() -> None:
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=5, ttl_refresh_token=5, secret=str(uuid4()), leeway=0
+    )
+    cache = GetCountingAsyncCache()
+    ach = AsyncAuthCacheHandler(config=config, cache=cache, is_multy_session=True)
+
+    async def main():
+        at, rt = await ach.get_pair_tokens(user_id=USER_ID)
+        new_at, new_rt = await ach.update_user_data(at, new_payload={"a": 1})
+        assert cache.gets == 1
+        await ach.delete_pair_tokens(new_rt, is_access_token=False)
+        assert cache.gets == 2
+        assert await cache.get(new_at) is None
+
+    asyncio.run(main())
+
+
+def test_async_clear_other_sessions_after_access_token_expired() -> None:
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=2, ttl_refresh_token=10, secret=str(uuid4()), leeway=0
+    )
+    cache = AsyncMemoryCacheEngine()
+    ach = AsyncAuthCacheHandler(config=config, cache=cache, is_multy_session=True)
+
+    async def main():
+        other_at, other_rt = await ach.get_pair_tokens(user_id=USER_ID)
+        await asyncio.sleep(2.1)
+        assert await cache.get(other_at) is None
+        at, rt = await ach.get_pair_tokens(user_id=USER_ID)
+
+        await ach.clear_other_sessions(at)
+        with pytest.raises(NotValidSession):
+            await ach.refresh_pair_tokens(other_rt)
+        assert await cache.lrange(f"user_{USER_ID}_access_tokens") == [at]
+        assert await cache.lrange(f"user_{USER_ID}_refresh_tokens") == [rt]
+        await ach.refresh_pair_tokens(rt)
+
+    asyncio.run(main())
+
+
+def test_async_auth_cache_handler_without_multy_session() -> None:
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=5, ttl_refresh_token=5, secret=str(uuid4()), leeway=0
+    )
+    ach = AsyncAuthCacheHandler(
+        config=config, cache=AsyncMemoryCacheEngine(), is_multy_session=False
+    )
+
+    async def main():
+        at, rt = await ach.get_pair_tokens(user_id=USER_ID, payload=PAYLOAD)
+        at2, rt2 = await ach.get_pair_tokens(user_id=USER_ID, payload=PAYLOAD)
+        with pytest.raises(NotValidSession):
+            await ach.verify_token(rt, is_access_token=False)
+        await ach.verify_token(rt2, is_access_token=False)
+        await ach.clear_other_sessions(at2)
+
+        new_at, new_rt = await ach.update_user_data(at2, new_payload={"a": 1})
+        with pytest.raises(NotValidSession):
+            await ach.verify_token(rt2, is_access_token=False)
+        _, _, payload = await ach.verify_token(new_rt, is_access_token=False)
+        assert payload == {"a": 1}
+        await ach.delete_pair_tokens(new_rt, is_access_token=False)
+        with pytest.raises(NotValidSession):
+            await ach.verify_token(new_at)
+
+    asyncio.run(main())
+
+
+def test_async_auth_cache_without_cache() -> None:
+    JWTAuthHandler.reset_instance_force()
+    config = JWTHandlerConfig(
+        ttl_access_token=5, ttl_refresh_token=5, secret=str(uuid4()), leeway=0
+    )
+    ach = AsyncAuthCacheHandler(config=config)
+
+    async def main():
+        at, rt = await ach.get_pair_tokens(user_id=USER_ID)
+        new_at, new_rt = await ach.refresh_pair_tokens(rt)
+        await ach.verify_token(rt, is_access_token=False)
+        await ach.delete_pair_tokens(new_at)
+        await ach.clear_other_sessions(new_at)
+
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+# mypy: ignore-errors
+import asyncio
+import threading
+
+import pytest
+
+from my_utilities.types.async_ttl_dict import AsyncioExpiryEngine, AsyncTTLDict
+
+
+def test_expire_on_loop_without_threads():
+    expired = []
+    threads = []
+
+    def on_expired(key):
+        expired.append(key)
+        threads.append(threading.current_thread())
+
+    async def main():
+        before = threading.active_count()
+        t = AsyncTTLDict(default_ttl=0.1, function_on_expired=on_expired)
+        t["b"] = 2
+        t.set("a", 1, ttl=0.05)
+        assert threading.active_count() == before
+        assert t["a"] == 1
+        await asyncio.sleep(0.2)
+        assert expired == ["a", "b"]
+        assert len(t) == 0
+        t.close()
+
+    asyncio.run(main())
+    assert threads == [threading.main_thread()] * 2
+
+
+def test_async_callbacks():
+    expired, evicted = [], []
+
+    async def on_expired(key):
+        await asyncio.sleep(0)
+        expired.append(key)
+
+    async def on_evicted(key):
+        evicted.append(key)
+
+    async def main():
+        t = AsyncTTLDict(
+            default_ttl=0.05,
+            function_on_expired=on_expired,
+            function_on_evicted=on_evicted,
+            maxsize=1,
+        )
+        t["a"] = 1
+        t["b"] = 2
+        await asyncio.sleep(0.1)
+        await t.wait_callbacks()
+        assert evicted == ["a"]
+        assert expired == ["b"]
+
+    asyncio.run(main())
+
+
+def test_rearm_for_earlier_deadline():
+    async def main():
+        expired = []
+        t = AsyncTTLDict(default_ttl=10, function_on_expired=expired.append)
+        t["late"] = 1
+        t.set("early", 2, ttl=0.05)
+        await asyncio.sleep(0.1)
+        assert expired == ["early"]
+        assert "late" in t
+        t.close()
+        assert t._engine._handle is None
+
+    asyncio.run(main())
+
+
+def test_created_outside_loop():
+    expired = []
+    t = AsyncTTLDict(default_ttl=0.05, function_on_expired=expired.append)
+    t["outside"] = 1
+    assert t._engine._handle is None
+
+    async def main():
+        t["inside"] = 2
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert expired == ["outside", "inside"]
+
+
+def test_engine_with_explicit_loop():
+    loop = asyncio.new_event_loop()
+    try:
+        engine = AsyncioExpiryEngine(loop=loop)
+        expired = []
+        engine.bind(expired.extend)
+        engine.schedule("a", 0.0)
+        loop.run_until_complete(asyncio.sleep(0.01))
+        assert expired == ["a"]
+    finally:
+        loop.close()
+
+
+def test_engine_without_reaper_moves_to_next_loop():
+    expired = []
+    t = AsyncTTLDict(default_ttl=10, function_on_expired=expired.append)
+    assert t._engine._reaper is None
+    assert t._engine.background
+
+    async def first():
+        t.set("first", 1, ttl=0.05)
+        t["late"] = 2
+
+    async def second():
+        t.set("second", 3, ttl=0.1)
+        await asyncio.sleep(0.15)
+
+    asyncio.run(first())
+    asyncio.run(second())
+    assert expired == ["first", "second"]
+    assert "late" in t
+    t.close()
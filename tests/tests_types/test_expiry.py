@@ -0,0 +1,362 @@
+# mypy: ignore-errors
+import time
+import gc
+import random
+import weakref
+
+import pytest
+
+from my_utilities.types.expiry import (
+    BucketExpiryEngine,
+    ExpiryEngine,
+    HeapExpiryEngine,
+    Reaper,
+    TimingWheelExpiryEngine,
+)
+from my_utilities.types.ttl_dict import TTLDict
+
+
+def test_heap_pop_expired_in_order():
+    engine = HeapExpiryEngine(background=False)
+    engine.schedule("c", 3.0)
+    engine.schedule("a", 1.0)
+    engine.schedule("b", 2.0)
+    assert engine.next_deadline() == 1.0
+    assert engine.pop_expired(2.5) == ["a", "b"]
+    assert engine.pop_expired(2.5) == []
+    assert len(engine) == 1
+    assert engine.pop_expired(10.0) == ["c"]
+    assert engine.next_deadline() is None
+
+
+def test_heap_reschedule_and_cancel():
+    engine = HeapExpiryEngine(background=False)
+    engine.schedule("a", 1.0)
+    engine.schedule("b", 1.5)
+    engine.schedule("a", 5.0)
+    engine.cancel("b")
+    engine.cancel("missing")
+    assert engine.next_deadline() == 5.0
+    assert engine.pop_expired(2.0) == []
+    assert engine.pop_expired(5.0) == ["a"]
+
+
+def test_heap_limit():
+    engine = HeapExpiryEngine(background=False)
+    for i in range(10):
+        engine.schedule(i, float(i))
+    assert engine.pop_expired(100.0, limit=3) == [0, 1, 2]
+    assert len(engine) == 7
+
+
+def test_heap_compacts_stale_records():
+    engine = HeapExpiryEngine(background=False)
+    for i in range(1000):
+        engine.schedule("key", float(i))
+    assert len(engine._heap) < 200
+    assert engine.pop_expired(10_000.0) == ["key"]
+
+
+def test_heap_clear():
+    engine = HeapExpiryEngine(background=False)
+    engine.schedule("a", 1.0)
+    engine.clear()
+    assert len(engine) == 0
+    assert engine.pop_expired(2.0) == []
+
+
+def test_background_reaper_calls_callback():
+    expired = []
+    engine = HeapExpiryEngine()
+    engine.bind(expired.extend)
+    now = time.monotonic()
+    engine.schedule("b", now + 0.2)
+    engine.schedule("a", now + 0.1)
+    time.sleep(0.4)
+    assert expired == ["a", "b"]
+    thread = engine._reaper._thread
+    engine.close()
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_reaper_stops_with_engine():
+    engine = HeapExpiryEngine()
+    engine.schedule("a", time.monotonic() + 100)
+    thread = engine._reaper._thread
+    ref = weakref.ref(engine)
+    del engine
+    gc.collect()
+    assert ref() is None
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_shared_reaper():
+    expired = []
+    reaper = Reaper()
+    heap = HeapExpiryEngine(reaper=reaper)
+    wheel = TimingWheelExpiryEngine(tick=0.005, reaper=reaper)
+    heap.bind(expired.extend)
+    wheel.bind(expired.extend)
+    now = time.monotonic()
+    heap.schedule("heap", now + 0.1)
+    wheel.schedule("wheel", now + 0.05)
+    thread = reaper._thread
+    time.sleep(0.3)
+    assert sorted(expired) == ["heap", "wheel"]
+    assert reaper._thread is thread
+    heap.close()
+    wheel.schedule("late", time.monotonic() + 0.05)
+    time.sleep(0.2)
+    assert expired[-1] == "late"
+    assert thread.is_alive()
+    wheel.close()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert reaper._thread is None
+
+
+def _wheel(**kwargs):
+    engine = TimingWheelExpiryEngine(background=False, **kwargs)
+    return engine, engine._current * engine._tick
+
+
+@pytest.mark.parametrize(
+    "kwargs", [dict(tick=0), dict(wheel_size=3), dict(wheel_size=1), dict(levels=0)]
+)
+def test_wheel_wrong_params(kwargs):
+    with pytest.raises(ValueError):
+        TimingWheelExpiryEngine(background=False, **kwargs)
+
+
+def test_wheel_pop_expired_in_order():
+    engine, base = _wheel(tick=1.0, wheel_size=4, levels=2)
+    engine.schedule("c", base + 3)
+    engine.schedule("a", base + 1)
+    engine.schedule("b", base + 2)
+    assert engine.next_deadline() == base + 1
+    assert engine.pop_expired(base + 2.5) == ["a", "b"]
+    assert len(engine) == 1
+    assert engine.pop_expired(base + 10) == ["c"]
+    assert engine.next_deadline() is None
+
+
+def test_wheel_cascades_and_overflow():
+    engine, base = _wheel(tick=1.0, wheel_size=4, levels=2)
+    engine.schedule("near", base + 3)
+    engine.schedule("level1", base + 9)
+    engine.schedule("overflow", base + 40)
+    assert engine.pop_expired(base + 8) == ["near"]
+    assert engine.pop_expired(base + 9) == ["level1"]
+    assert engine.pop_expired(base + 39) == []
+    assert engine.pop_expired(base + 40) == ["overflow"]
+
+
+def test_wheel_reschedule_cancel_and_limit():
+    engine, base = _wheel(tick=0.5)
+    engine.schedule("a", base + 1)
+    engine.schedule("b", base + 1)
+    engine.schedule("a", base + 100)
+    engine.cancel("b")
+    engine.cancel("missing")
+    assert engine.pop_expired(base + 50) == []
+    engine.schedule("past", base - 10)
+    engine.schedule("past2", base - 5)
+    assert engine.next_deadline() == base - 10
+    assert engine.pop_expired(base, limit=1) == ["past"]
+    assert engine.pop_expired(base + 100) == ["past2", "a"]
+    engine.schedule("x", base + 200)
+    engine.clear()
+    assert len(engine) == 0
+    assert engine.pop_expired(base + 1000) == []
+
+
+def test_wheel_skips_empty_ticks():
+    engine, base = _wheel(tick=0.000001)
+    engine.schedule("a", base + 5)
+    engine.schedule("b", base + 50)
+    started = time.perf_counter()
+    assert engine.pop_expired(base + 4.9) == []
+    assert engine.pop_expired(base + 10) == ["a"]
+    assert engine.pop_expired(base + 100) == ["b"]
+    # tick by tick this took 10 ** 8 steps
+    assert time.perf_counter() - started < 1
+    assert engine._current == int((base + 100) / 0.000001)
+
+
+def test_wheel_matches_heap():
+    rnd = random.Random(42)
+    wheel, base = _wheel(tick=0.01, wheel_size=8, levels=3)
+    heap = HeapExpiryEngine(background=False)
+    for i in range(2000):
+        deadline = base + rnd.uniform(0, 30)
+        wheel.schedule(i % 1500, deadline)
+        heap.schedule(i % 1500, deadline)
+    for i in range(0, 1500, 7):
+        wheel.cancel(i)
+        heap.cancel(i)
+    now = base
+    lagging, from_heap, from_wheel = set(), set(), set()
+    while len(heap) or len(wheel):
+        now += rnd.uniform(0, 0.5)
+        lagging.update(heap.pop_expired(now - 0.01))
+        from_heap.update(lagging, heap.pop_expired(now))
+        from_wheel.update(wheel.pop_expired(now))
+        assert lagging <= from_wheel <= from_heap
+    assert from_heap == from_wheel
+    assert len(from_wheel) == 1500 - len(range(0, 1500, 7))
+
+
+def test_wheel_background_with_ttl_dict():
+    expired = []
+    t = TTLDict(
+        default_ttl=0.1,
+        function_on_expired=expired.append,
+        engine=TimingWheelExpiryEngine(tick=0.005),
+    )
+    t["a"] = 1
+    time.sleep(0.05)
+    t["b"] = 2
+    time.sleep(0.2)
+    assert expired == ["a", "b"]
+    assert len(t) == 0
+    t.close()
+
+
+@pytest.mark.parametrize(
+    "factory",
+    [
+        lambda: HeapExpiryEngine(background=False),
+        lambda: TimingWheelExpiryEngine(tick=0.5, background=False),
+        lambda: BucketExpiryEngine(resolution=0.5, background=False),
+    ],
+)
+def test_schedule_many_and_cancel_many(factory):
+    engine = factory()
+    now = time.monotonic()
+    engine.schedule("a", now + 100)
+    engine.schedule_many([(i, now + i) for i in range(10)])
+    engine.schedule_many([])
+    engine.schedule_many([("a", now - 1)])
+    assert len(engine) == 11
+    engine.cancel_many([0, 1, 2, "missing"])
+    assert engine.pop_expired(now + 4.6) == ["a", 3, 4]
+    assert engine.pop_expired(now + 100) == [5, 6, 7, 8, 9]
+
+
+def test_bucket_wrong_resolution():
+    with pytest.raises(ValueError):
+        BucketExpiryEngine(resolution=0)
+
+
+def test_bucket_pop_expired():
+    engine = BucketExpiryEngine(resolution=1.0, background=False)
+    engine.schedule("c", 3.5)
+    engine.schedule("a", 1.2)
+    engine.schedule("b", 1.7)
+    assert engine.next_deadline() == 2.0
+    assert engine.pop_expired(1.9) == []
+    assert sorted(engine.pop_expired(2.0)) == ["a", "b"]
+    assert len(engine) == 1
+    assert engine.pop_expired(10.0) == ["c"]
+    assert engine.next_deadline() is None
+
+
+def test_bucket_stale_slots_and_limit():
+    engine = BucketExpiryEngine(resolution=1.0, background=False)
+    for i in range(10):
+        engine.schedule(i, 1.5)
+    engine.schedule(0, 1.6)
+    engine.schedule(1, 5.5)
+    engine.cancel(2)
+    engine.cancel(3)
+    engine.schedule(3, 1.1)
+    assert len(engine._buckets[1]) == 11
+    first = engine.pop_expired(2.0, limit=4)
+    rest = engine.pop_expired(2.0)
+    assert len(first) == 4
+    assert sorted(first + rest) == [0, 3, 4, 5, 6, 7, 8, 9]
+    assert list(engine._buckets) == [5]
+    assert engine.pop_expired(6.0) == [1]
+    engine.schedule("a", 1.0)
+    engine.clear()
+    assert len(engine) == 0
+    assert engine.next_deadline() is None
+
+
+def test_bucket_background_with_ttl_dict():
+    expired = []
+    t = TTLDict(
+        default_ttl=0.05,
+        engine=BucketExpiryEngine(resolution=0.05),
+        function_on_expired=expired.append,
+    )
+    t["a"] = 1
+    assert t._engine._reaper._thread is not None
+    time.sleep(0.3)
+    assert expired == ["a"]
+    assert t._dict == {}
+    t.close()
+
+
+@pytest.mark.parametrize(
+    "factory",
+    [
+        lambda: HeapExpiryEngine(background=False),
+        lambda: TimingWheelExpiryEngine(tick=0.5, background=False),
+        lambda: BucketExpiryEngine(resolution=0.5, background=False),
+    ],
+)
+def test_soonest(factory):
+    engine = factory()
+    assert engine.soonest() is None
+    now = time.monotonic()
+    engine.schedule("late", now + 50)
+    engine.schedule("early", now + 2)
+    engine.schedule("middle", now + 10)
+    assert engine.soonest() == "early"
+    engine.cancel("early")
+    assert engine.soonest() == "middle"
+    engine.schedule("middle", now + 100)
+    assert engine.soonest() == "late"
+    engine.schedule("due", now - 10)
+    engine.pop_expired(now, limit=0)
+    assert engine.soonest() == "due"
+
+
+@pytest.mark.parametrize(
+    "factory",
+    [
+        lambda: HeapExpiryEngine(background=False),
+        lambda: TimingWheelExpiryEngine(tick=0.5, background=False),
+        lambda: BucketExpiryEngine(resolution=0.5, background=False),
+    ],
+)
+def test_peek(factory):
+    engine = factory()
+    assert engine.peek(3) == []
+    now = time.monotonic()
+    for i in range(20):
+        engine.schedule(i, now + 100 - i * 4)
+    engine.schedule(19, now + 500)
+    engine.schedule(18, now + 500)
+    engine.schedule(18, now + 30)
+    engine.cancel(17)
+    found = engine.peek(4)
+    assert [key for key, _ in found] == [18, 16, 15, 14]
+    assert [deadline for _, deadline in found] == sorted(
+        deadline for _, deadline in found
+    )
+    assert found[0][1] >= now + 30
+    assert len(engine) == 19
+    assert engine.pop_expired(now) == []
+    assert [key for key, _ in engine.peek(19)][-1] == 19
+
+
+def test_soonest_not_supported():
+    class Engine(HeapExpiryEngine):
+        peek = ExpiryEngine.peek
+
+    with pytest.raises(NotImplementedError):
+        Engine(background=False).soonest()
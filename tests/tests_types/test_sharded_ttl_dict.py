@@ -0,0 +1,129 @@
+# mypy: ignore-errors
+import threading
+import time
+
+import pytest
+
+from my_utilities.types.expiry import TimingWheelExpiryEngine
+from my_utilities.types.sharded_ttl_dict import ShardedTTLDict
+
+
+def test_wrong_shards():
+    with pytest.raises(ValueError):
+        ShardedTTLDict(shards=0)
+
+
+def test_mapping_api():
+    t = ShardedTTLDict(default_ttl=5, shards=4, lazy=True)
+    for i in range(100):
+        t[i] = str(i)
+    assert len(t) == 100
+    assert {len(shard) for shard in t._shards} == {25}
+    assert t[5] == "5"
+    assert 5 in t
+    assert t.get(500, "missing") == "missing"
+    del t[5]
+    assert 5 not in t
+    assert t.pop(6) == "6"
+    assert t.pop(6, None) is None
+    assert t.setdefault(7, "new") == "7"
+    assert t.setdefault(700, "new") == "new"
+    assert sorted(t) == sorted(t.keys())
+    assert dict(t.items())[8] == "8"
+    assert "9" in t.values()
+    t.update({"x": 1})
+    with pytest.raises(TypeError):
+        t.update([1])
+    assert t == dict(t.items())
+    assert t == t
+    with pytest.raises(TypeError):
+        _ = t == [1]
+    assert str(t).startswith("{")
+    t.extend_ttl(8, ttl=10)
+    t.set("own", 1, ttl=10)
+    t.clear()
+    assert len(t) == 0
+    t.close()
+
+
+def test_expiry_and_eviction():
+    expired, evicted = [], []
+    t = ShardedTTLDict(
+        default_ttl=0.1,
+        shards=2,
+        function_on_expired=expired.append,
+        engine_factory=lambda: TimingWheelExpiryEngine(tick=0.005),
+        maxsize=4,
+        function_on_evicted=evicted.append,
+    )
+    for i in range(6):
+        t[i] = i
+    assert sorted(evicted) == [0, 1]
+    time.sleep(0.2)
+    assert sorted(expired) == [2, 3, 4, 5]
+    assert len(t) == 0
+    t.close()
+
+
+def test_shards_share_reaper_and_callback_queue():
+    expired = []
+    before = threading.active_count()
+    t = ShardedTTLDict(
+        default_ttl=0.05,
+        function_on_expired=expired.append,
+        max_pending_callbacks=10,
+    )
+    t.set_many({i: i for i in range(100)})
+    assert threading.active_count() - before == 1
+    assert len({shard._engine._reaper for shard in t._shards}) == 1
+    assert len({shard._pending_callbacks for shard in t._shards}) == 1
+    time.sleep(0.2)
+    assert sorted(expired) == list(range(100))
+    t.close()
+
+
+def test_concurrent_writers():
+    t = ShardedTTLDict(default_ttl=5, shards=8)
+
+    def worker(offset):
+        for i in range(1000):
+            t[offset + i] = i
+            assert t[offset + i] == i
+
+    threads = [threading.Thread(target=worker, args=(n * 1000,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(t) == 8000
+    t.close()
+
+
+def test_bulk_api():
+    t = ShardedTTLDict(default_ttl=5, shards=4, lazy=True)
+    t.set_many({i: i for i in range(100)})
+    t.set_many([("short", 1)], ttl=10)
+    assert len(t) == 101
+    assert t.get_many([1, 2, 500]) == {1: 1, 2: 2}
+    assert t.delete_many(range(50)) == 50
+    assert len(t) == 51
+    assert 9 < t.ttl("short") <= 10
+    assert t.ttl(0) is None
+
+
+def test_max_bytes():
+    t = ShardedTTLDict(
+        default_ttl=5,
+        shards=4,
+        lazy=True,
+        max_bytes=40,
+        sizer=lambda key, value: 5,
+        eviction_policy="soonest_expiring",
+    )
+    t.set_many({i: i for i in range(100)})
+    assert len(t) == 8
+    assert t.occupancy() == "40B of 40B (100.0%)"
+    t.clear()
+    assert t.occupancy() == "0B of 40B (0.0%)"
+    with pytest.raises(ValueError):
+        ShardedTTLDict(shards=2).occupancy()
@@ -0,0 +1,201 @@
+# mypy: ignore-errors
+import multiprocessing
+import pickle
+import threading
+import time
+
+import pytest
+
+from my_utilities.types.shared_ttl_dict import _MOVES, _SEQ, _SLOT, SharedTTLDict
+
+
+@pytest.fixture
+def shared():
+    t = SharedTTLDict(capacity=64, slot_size=128, default_ttl=10)
+    yield t
+    t.close()
+    t.unlink()
+
+
+def _worker(t, key, value):
+    t[key] = value
+    t.extend_ttl("parent", ttl=100)
+
+
+def test_wrong_params():
+    with pytest.raises(ValueError):
+        SharedTTLDict(capacity=0)
+    with pytest.raises(ValueError):
+        SharedTTLDict(slot_size=16)
+    with pytest.raises(ValueError):
+        SharedTTLDict(name="missing", create=False)
+
+
+def test_set_get_pop(shared):
+    shared["a"] = {"value": 1}
+    shared.set(("tuple", 2), [1, 2], ttl=20)
+    assert shared["a"] == {"value": 1}
+    assert shared[("tuple", 2)] == [1, 2]
+    assert "a" in shared
+    assert "b" not in shared
+    assert shared.get("b", 5) == 5
+    with pytest.raises(KeyError):
+        shared["b"]
+    shared["a"] = 2
+    assert shared["a"] == 2
+    assert len(shared) == 2
+    assert sorted(shared.keys(), key=str) == [("tuple", 2), "a"]
+    assert shared.pop("a") == 2
+    assert shared.pop("a", 3) == 3
+    with pytest.raises(KeyError):
+        del shared["a"]
+    del shared[("tuple", 2)]
+    assert shared.items() == []
+    with pytest.raises(ValueError):
+        shared["big"] = "x" * 200
+
+
+def test_expiry_and_extend_ttl(shared):
+    shared.set("short", 1, ttl=0.05)
+    shared.set("own", 2, ttl=0.05)
+    shared.extend_ttl("own", ttl=10)
+    time.sleep(0.1)
+    assert "short" not in shared
+    assert shared.get("short") is None
+    assert shared.pop("short") is None
+    assert shared["own"] == 2
+    with pytest.raises(KeyError):
+        shared.extend_ttl("short")
+    shared.set("again", 3, ttl=0.05)
+    time.sleep(0.1)
+    with pytest.raises(KeyError):
+        shared.extend_ttl("again")
+    assert len(shared) == 1
+
+
+def test_probing_reuses_free_slots(shared):
+    for i in range(64):
+        shared[i] = i
+    with pytest.raises(ValueError):
+        shared["one more"] = 1
+    for i in range(0, 64, 2):
+        del shared[i]
+    assert shared.get(1) == 1
+    for i in range(64, 96):
+        shared[i] = i
+    assert len(shared) == 64
+    assert sorted(shared.values()) == list(range(1, 64, 2)) + list(range(64, 96))
+    shared.clear()
+    assert len(shared) == 0
+    assert bytes(shared._memory.buf[64:]).count(0) > 64 * 100
+
+
+def test_expired_slots_are_reused(shared):
+    for i in range(64):
+        shared.set(i, i, ttl=0.05)
+    time.sleep(0.1)
+    for i in range(64, 128):
+        shared[i] = i
+    assert len(shared) == 64
+
+
+def _longest_run(t):
+    """longest run of occupied slots, the worst probe length of a miss"""
+    occupied = [
+        _SLOT.unpack_from(t._memory.buf, t._offset(index))[1] != 0
+        for index in range(t._capacity)
+    ]
+    longest = run = 0
+    for is_occupied in occupied * 2:
+        run = run + 1 if is_occupied else 0
+        longest = max(longest, run)
+    return longest
+
+
+def test_churn_keeps_probes_short():
+    t = SharedTTLDict(capacity=1000, slot_size=96)
+    try:
+        for wave in range(20):
+            for i in range(400):
+                t.set((wave, i), i, ttl=0.01)
+            time.sleep(0.02)
+        t["live"] = 1
+        assert len(t) == 1
+        # writes deleted the expired entries, a miss stops at an empty slot
+        assert _longest_run(t) < 20
+        assert "missing" not in t
+        assert t["live"] == 1
+    finally:
+        t.close()
+        t.unlink()
+
+
+def test_delete_shifts_chain_back(shared):
+    keys = [i for i in range(1000) if shared._hash(pickle.dumps(i, 5)) % 64 == 7][:5]
+    for key in keys:
+        shared[key] = key
+    del shared[keys[1]]
+    assert [shared.get(key) for key in keys] == [keys[0], None] + keys[2:]
+    # the chain is contiguous again and no slot is left marked
+    assert _longest_run(shared) == 4
+
+
+def test_miss_during_move_is_retried(shared):
+    # a deletion is moving entries while the reader searches for "a"
+    _SEQ.pack_into(shared._memory.buf, _MOVES, 1)
+
+    def finish_move():
+        time.sleep(0.05)
+        shared["a"] = 1
+        _SEQ.pack_into(shared._memory.buf, _MOVES, 2)
+
+    thread = threading.Thread(target=finish_move)
+    thread.start()
+    assert shared.get("a") == 1
+    thread.join()
+
+
+def test_shared_between_processes(shared):
+    shared["parent"] = 1
+    context = multiprocessing.get_context("fork")
+    process = context.Process(target=_worker, args=(shared, "child", [1, 2]))
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+    assert shared["child"] == [1, 2]
+    assert shared._read(pickle.dumps("parent", protocol=pickle.HIGHEST_PROTOCOL))[
+        2
+    ] == pytest.approx(100)
+
+
+def test_attach_by_name(shared):
+    shared["a"] = 1
+    other = SharedTTLDict(name=shared.name, create=False, lock=shared.lock)
+    assert other["a"] == 1
+    other["b"] = 2
+    assert shared["b"] == 2
+    assert other._capacity == 64
+    other.close()
+
+
+def test_readers_see_consistent_values(shared):
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            shared["key"] = (i, "x" * (i % 40), i)
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            value = shared.get("key")
+            if value is not None:
+                assert value[0] == value[2]
+                assert len(value[1]) == value[0] % 40
+    finally:
+        stop.set()
+        thread.join()
@@ -1,10 +1,20 @@
 # mypy: ignore-errors
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import math
+import sys
+import threading
 import time
 from collections import OrderedDict
 
 import pytest
 
-from my_utilities.types.ttl_dict import TTLDict
+from my_utilities.types.expiry import (
+    BucketExpiryEngine,
+    HeapExpiryEngine,
+    TimingWheelExpiryEngine,
+)
+from my_utilities.types.ttl_dict import EvictionPolicy, TTLDict, shallow_size
 
 TEST_DICT = dict()
 
@@ -18,7 +28,8 @@ def test_init():
     t = TTLDict(default_ttl=5)
     assert isinstance(t, TTLDict)
     assert isinstance(t._dict, OrderedDict)
-    assert isinstance(t._timers, dict)
+    assert isinstance(t._deadlines, dict)
+    assert isinstance(t._engine, HeapExpiryEngine)
 
 
 @pytest.mark.parametrize("key, value", [("test_key", "test_value")])
@@ -174,3 +185,814 @@ def test_pop_function(key, value):
     # time.sleep(1.1)
     assert len(TEST_DICT.keys()) == 0
     # assert t.get(key, None) is None
+
+
+def test_single_reaper_thread():
+    t = TTLDict(default_ttl=5)
+    before = threading.active_count()
+    for i in range(1000):
+        t[i] = i
+    for i in range(1000):
+        t.extend_ttl(i)
+    assert threading.active_count() - before <= 1
+    assert len(t._engine) == 1000
+    t.close()
+
+
+def test_expire_in_deadline_order():
+    expired = []
+    t = TTLDict(default_ttl=5, function_on_expired=expired.append)
+    t["late"] = 1
+    t["early"] = 2
+    t._set_ttl("late", 0.3)
+    t._set_ttl("early", 0.1)
+    time.sleep(0.5)
+    assert expired == ["early", "late"]
+    assert len(t) == 0
+
+
+def test_overwrite_reschedules_key():
+    expired = []
+    t = TTLDict(default_ttl=1, function_on_expired=expired.append)
+    t["key"] = 1
+    time.sleep(0.6)
+    t["key"] = 2
+    time.sleep(0.6)
+    assert t["key"] == 2
+    assert expired == []
+    time.sleep(0.6)
+    assert expired == ["key"]
+    assert "key" not in t
+
+
+def test_delete_and_pop_cancel_expiry():
+    expired = []
+    t = TTLDict(default_ttl=5, function_on_expired=expired.append)
+    t["a"] = 1
+    t["b"] = 2
+    del t["a"]
+    t.pop("b")
+    assert len(t._engine) == 0
+    assert t._deadlines == {}
+
+
+def test_lazy_mode_without_threads():
+    expired = []
+    before = threading.active_count()
+    t = TTLDict(default_ttl=0.1, function_on_expired=expired.append, lazy=True)
+    for i in range(100):
+        t[i] = i
+    assert threading.active_count() <= before
+    assert t._engine._reaper is None
+    time.sleep(0.15)
+    assert 0 not in t
+    assert t.get(1) is None
+    with pytest.raises(KeyError):
+        _ = t[2]
+    assert expired == [0, 1, 2]
+    assert len(t) == 0
+    assert sorted(expired) == list(range(100))
+
+
+def test_lazy_mode_delete_expired_key():
+    expired = []
+    t = TTLDict(default_ttl=0.1, function_on_expired=expired.append, lazy=True)
+    t["old"] = 1
+    t.set("new", 2, ttl=5)
+    time.sleep(0.15)
+    with pytest.raises(KeyError):
+        del t["old"]
+    assert expired == ["old"]
+    del t["new"]
+    assert expired == ["old"]
+    assert len(t) == 0
+    assert t._engine.next_deadline() is None
+
+
+def test_lazy_mode_sweeps_on_write():
+    expired = []
+    t = TTLDict(
+        default_ttl=0.1, function_on_expired=expired.append, lazy=True, sweep_size=5
+    )
+    for i in range(20):
+        t[i] = i
+    time.sleep(0.15)
+    t["new"] = 1
+    assert expired == [0, 1, 2, 3, 4]
+    assert list(t) == ["new"]
+    assert len(expired) == 20
+
+
+def test_expired_key_not_returned_before_reaper():
+    t = TTLDict(default_ttl=5, lazy=True)
+    t["key"] = 1
+    t._set_ttl("key", -1)
+    assert t.get("key", 2) == 2
+    assert t.pop("key", 3) == 3
+    assert t.setdefault("key", 4) == 4
+    t._set_ttl("key", -1)
+    with pytest.raises(KeyError):
+        t.extend_ttl("key")
+
+
+def test_maxsize_evicts_least_recently_used():
+    expired, evicted = [], []
+    t = TTLDict(
+        default_ttl=5,
+        function_on_expired=expired.append,
+        function_on_evicted=evicted.append,
+        maxsize=3,
+    )
+    for key in "abc":
+        t[key] = key
+    assert t["a"] == "a"
+    t["d"] = "d"
+    assert evicted == ["b"]
+    t["c"] = "new"
+    t.setdefault("e", "e")
+    assert evicted == ["b", "a"]
+    assert list(t) == ["d", "c", "e"]
+    assert len(t._engine) == 3
+    assert expired == []
+
+
+def test_maxsize_reports_expired_keys_as_expired():
+    expired, evicted = [], []
+    t = TTLDict(
+        default_ttl=5,
+        function_on_expired=expired.append,
+        function_on_evicted=evicted.append,
+        maxsize=1,
+        lazy=True,
+    )
+    t["a"] = 1
+    t._set_ttl("a", -1)
+    t["b"] = 2
+    assert expired == ["a"]
+    assert evicted == []
+
+
+def test_maxsize_wrong_value():
+    with pytest.raises(ValueError):
+        TTLDict(maxsize=0)
+
+
+def test_set_with_own_ttl():
+    expired = []
+    t = TTLDict(default_ttl=5, function_on_expired=expired.append)
+    before = threading.active_count()
+    t.set("access", 1, ttl=0.1)
+    t.set("refresh", 2, ttl=10)
+    t["default"] = 3
+    assert t._ttls == {"access": 0.1, "refresh": 10}
+    assert threading.active_count() - before <= 1
+    time.sleep(0.3)
+    assert expired == ["access"]
+    assert list(t) == ["refresh", "default"]
+    assert t._ttls == {"refresh": 10}
+    t["refresh"] = 4
+    assert t._ttls == {}
+
+
+def test_extend_ttl_with_own_ttl():
+    expired = []
+    t = TTLDict(default_ttl=0.1, function_on_expired=expired.append, lazy=True)
+    t.set("key", 1, ttl=0.3)
+    t.set("other", 2)
+    t.extend_ttl("other", ttl=1)
+    time.sleep(0.2)
+    t.extend_ttl("key")
+    assert t._deadlines["key"] - time.monotonic() > 0.2
+    t.extend_ttl("key", ttl=0.05)
+    time.sleep(0.15)
+    assert "key" not in t
+    assert t["other"] == 2
+    assert expired == ["key"]
+
+
+def test_ttl():
+    t = TTLDict(default_ttl=float("inf"), lazy=True, sliding=True)
+    t.set("key", 1, ttl=0.2)
+    t["forever"] = 2
+    assert 0.1 < t.ttl("key") <= 0.2
+    assert t.ttl("forever") == float("inf")
+    assert t.ttl("missing") is None
+    time.sleep(0.1)
+    # reading the ttl does not slide the deadline
+    assert t.ttl("key") < 0.11
+    time.sleep(0.15)
+    assert t.ttl("key") is None
+
+
+def test_expired_batch_by_size():
+    batches = []
+    t = TTLDict(
+        default_ttl=0.05,
+        function_on_expired_batch=batches.append,
+        batch_size=3,
+        batch_delay=10,
+        lazy=True,
+    )
+    for i in range(7):
+        t[i] = i
+    time.sleep(0.1)
+    assert len(t) == 0
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+    t.flush_expired()
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    t.flush_expired()
+    assert len(batches) == 3
+
+
+def test_expired_batch_by_delay():
+    batches, expired = [], []
+    t = TTLDict(
+        default_ttl=0.05,
+        function_on_expired=expired.append,
+        function_on_expired_batch=batches.append,
+        batch_size=100,
+        batch_delay=0.1,
+    )
+    t["a"] = 1
+    t["b"] = 2
+    time.sleep(0.1)
+    assert expired == ["a", "b"]
+    assert batches == []
+    time.sleep(0.15)
+    assert batches == [["a", "b"]]
+    t["c"] = 3
+    time.sleep(0.1)
+    t.close()
+    assert batches == [["a", "b"], ["c"]]
+
+
+@pytest.mark.parametrize("kwargs", [dict(batch_size=0), dict(batch_delay=-1)])
+def test_expired_batch_wrong_params(kwargs):
+    with pytest.raises(ValueError):
+        TTLDict(**kwargs)
+
+
+def test_callbacks_on_executor():
+    threads = []
+    done = threading.Event()
+
+    def on_expired(key):
+        threads.append(threading.current_thread())
+        done.set()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        t = TTLDict(
+            default_ttl=0.05, function_on_expired=on_expired, callback_executor=executor
+        )
+        t["a"] = 1
+        assert done.wait(1)
+        t.close()
+    assert threads[0] is not threading.main_thread()
+    assert threads[0] is not t._engine._reaper._thread
+
+
+def _blocked_dict(policy, calls, release):
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def on_expired(key):
+        calls.append((key, threading.current_thread()))
+        release.wait(1)
+
+    t = TTLDict(
+        default_ttl=5,
+        function_on_expired=on_expired,
+        callback_executor=executor,
+        max_pending_callbacks=1,
+        overflow_policy=policy,
+        lazy=True,
+    )
+    return t, executor
+
+
+@pytest.mark.parametrize(
+    "policy, expected_calls", [("drop", ["a"]), ("caller_runs", ["a", "b"])]
+)
+def test_callback_overflow_policy(policy, expected_calls):
+    calls = []
+    release = threading.Event()
+    t, executor = _blocked_dict(policy, calls, release)
+    t["a"] = 1
+    t["b"] = 2
+    t._set_ttl("a", -1)
+    t._set_ttl("b", -1)
+    assert len(t) == 0
+    release.set()
+    executor.shutdown(wait=True)
+    assert sorted(key for key, _ in calls) == expected_calls
+    threads = dict(calls)
+    assert threads["a"] is not threading.main_thread()
+    if policy == "caller_runs":
+        assert threads["b"] is threading.main_thread()
+
+
+def test_callback_queue_shared_between_dicts():
+    calls = []
+    release = threading.Event()
+    first, executor = _blocked_dict("drop", calls, release)
+    second = TTLDict(
+        default_ttl=5,
+        function_on_expired=lambda key: calls.append((key, None)),
+        callback_executor=executor,
+        overflow_policy="drop",
+        lazy=True,
+        pending_callbacks=first._pending_callbacks,
+    )
+    first["a"] = 1
+    second["b"] = 2
+    first._set_ttl("a", -1)
+    second._set_ttl("b", -1)
+    assert len(first) == len(second) == 0
+    release.set()
+    executor.shutdown(wait=True)
+    assert [key for key, _ in calls] == ["a"]
+
+
+def test_callback_overflow_block():
+    calls = []
+    release = threading.Event()
+    t, executor = _blocked_dict("block", calls, release)
+    t["a"] = 1
+    t["b"] = 2
+    t._set_ttl("a", -1)
+    t._set_ttl("b", -1)
+    threading.Timer(0.1, release.set).start()
+    assert len(t) == 0
+    executor.shutdown(wait=True)
+    assert [key for key, _ in calls] == ["a", "b"]
+    assert all(thread is not threading.main_thread() for _, thread in calls)
+
+
+def test_callbacks_on_loop():
+    expired = []
+
+    async def on_expired(key):
+        expired.append(key)
+
+    async def main():
+        t = TTLDict(
+            default_ttl=5,
+            function_on_expired=on_expired,
+            callback_loop=asyncio.get_running_loop(),
+            lazy=True,
+        )
+        t["a"] = 1
+        t._set_ttl("a", -1)
+        assert "a" not in t
+        await asyncio.sleep(0.01)
+        assert expired == ["a"]
+        assert t._pending_callbacks._value == 1000
+
+    asyncio.run(main())
+
+
+def test_failed_callback_does_not_stop_expiry(caplog):
+    expired = []
+
+    def on_expired(key):
+        expired.append(key)
+        raise ValueError(key)
+
+    t = TTLDict(default_ttl=5, function_on_expired=on_expired, lazy=True)
+    t["a"] = 1
+    t["b"] = 2
+    t._set_ttl("a", -1)
+    t._set_ttl("b", -1)
+    assert len(t) == 0
+    assert expired == ["a", "b"]
+    assert "failed" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(max_pending_callbacks=0),
+        dict(overflow_policy="unknown"),
+        dict(callback_executor=ThreadPoolExecutor(), callback_loop=object()),
+    ],
+)
+def test_callback_wrong_params(kwargs):
+    with pytest.raises(ValueError):
+        TTLDict(**kwargs)
+
+
+def test_update_schedules_ttl():
+    expired = []
+    t = TTLDict(default_ttl=0.05, function_on_expired=expired.append, lazy=True)
+    t.update({"a": 1})
+    t.update(TTLDict(default_ttl=10, lazy=True))
+    assert "a" in t._deadlines
+    time.sleep(0.1)
+    assert len(t) == 0
+    assert expired == ["a"]
+
+
+def test_set_many():
+    expired = []
+    t = TTLDict(default_ttl=5, function_on_expired=expired.append, lazy=True)
+    t["old"] = 0
+    t.set_many({i: i for i in range(100)})
+    t.set_many([("short", 1), ("short2", 2)], ttl=0.05)
+    t.set_many([])
+    assert len(t._engine) == 103
+    assert t._ttls == {"short": 0.05, "short2": 0.05}
+    time.sleep(0.1)
+    assert len(t) == 101
+    assert expired == ["short", "short2"]
+
+
+def test_set_many_heapifies_large_batch():
+    t = TTLDict(default_ttl=5, lazy=True)
+    t["a"] = 1
+    t.set_many((i, i) for i in range(1000))
+    heap = t._engine._heap
+    assert all(heap[i] <= heap[2 * i + 1] for i in range(len(heap) // 2))
+    t.set_many((i, i) for i in range(10))
+    assert len(t) == 1001
+
+
+def test_set_many_with_maxsize():
+    evicted = []
+    t = TTLDict(default_ttl=5, maxsize=3, function_on_evicted=evicted.append)
+    t.set_many({"a": 1, "b": 2})
+    t.set_many({"c": 3, "a": 4, "d": 5})
+    assert evicted == ["b"]
+    assert list(t) == ["c", "a", "d"]
+    t.close()
+
+
+def test_get_many_and_delete_many():
+    expired = []
+    t = TTLDict(default_ttl=5, function_on_expired=expired.append, lazy=True)
+    t.set_many({i: str(i) for i in range(10)})
+    t._set_ttl(3, -1)
+    assert t.get_many([1, 2, 3, 42]) == {1: "1", 2: "2"}
+    assert expired == [3]
+    assert t.delete_many([1, 2, 3, 42]) == 2
+    assert len(t) == 7
+    assert len(t._engine) == 7
+
+
+def test_compact():
+    expired = []
+    t = TTLDict(default_ttl=0.05, function_on_expired=expired.append, compact=True)
+    assert type(t._dict) is dict
+    assert isinstance(t._engine, BucketExpiryEngine)
+    t["a"] = 1
+    t.set("b", 2, ttl=10)
+    assert t["a"] == 1
+    time.sleep(0.06)
+    assert "a" not in t
+    assert t == {"b": 2}
+    t.close()
+    assert expired == ["a"]
+    assert isinstance(TTLDict(compact=True, maxsize=2)._dict, OrderedDict)
+
+
+def test_shallow_size():
+    assert shallow_size("k", 1) == sys.getsizeof("k") + sys.getsizeof(1)
+    value = {"a": [1, 2]}
+    assert shallow_size("k", value) == (
+        sys.getsizeof("k")
+        + sys.getsizeof(value)
+        + sys.getsizeof("a")
+        + sys.getsizeof([1, 2])
+    )
+    assert shallow_size(1, (1, 2)) == sys.getsizeof(1) + sys.getsizeof((1, 2)) + 2 * (
+        sys.getsizeof(1)
+    )
+
+
+def test_max_bytes_lru():
+    evicted = []
+    t = TTLDict(
+        default_ttl=10,
+        max_bytes=100,
+        sizer=lambda key, value: len(value),
+        function_on_evicted=evicted.append,
+    )
+    t["a"] = "x" * 40
+    t["b"] = "x" * 40
+    assert t["a"]
+    t["c"] = "x" * 30
+    assert evicted == ["b"]
+    assert t._bytes == 70
+    t["a"] = "x" * 10
+    assert t._bytes == 40
+    t.set_many({"d": "x" * 50, "e": "x" * 10})
+    assert t._bytes == 100
+    assert t.occupancy() == "100B of 100B (100.0%)"
+    del t["d"]
+    assert t.pop("e") == "x" * 10
+    assert t.delete_many(["c"]) == 1
+    assert t._bytes == 10
+    assert t.setdefault("f", "x" * 95) == "x" * 95
+    assert evicted == ["b", "a"]
+    with pytest.raises(ValueError):
+        t["big"] = "x" * 101
+    t.clear()
+    assert t._bytes == 0
+    assert t.occupancy() == "0B of 100B (0.0%)"
+    t.close()
+    with pytest.raises(ValueError):
+        TTLDict(max_bytes=0)
+    with pytest.raises(ValueError):
+        TTLDict().occupancy()
+
+
+def test_max_bytes_soonest_expiring():
+    evicted = []
+    t = TTLDict(
+        default_ttl=10,
+        lazy=True,
+        max_bytes=3,
+        sizer=lambda key, value: 1,
+        eviction_policy="soonest_expiring",
+        function_on_evicted=evicted.append,
+        function_on_expired_batch=lambda keys: None,
+    )
+    t.set("a", 1, ttl=30)
+    t.set("b", 1, ttl=5)
+    t.set("c", 1, ttl=20)
+    t._add_to_batch("fake")
+    t.set("d", 1, ttl=40)
+    assert evicted == ["b"]
+    t.set("e", 1, ttl=40)
+    assert evicted == ["b", "c"]
+    assert sorted(t) == ["a", "d", "e"]
+    assert t._engine.soonest() is not None
+    assert len(t._engine) == 4
+
+
+def test_maxsize_soonest_expiring_compact():
+    expired = []
+    t = TTLDict(
+        default_ttl=10,
+        compact=True,
+        lazy=True,
+        maxsize=2,
+        eviction_policy=EvictionPolicy.SOONEST_EXPIRING,
+        function_on_expired=expired.append,
+    )
+    t.set("gone", 1, ttl=-1)
+    t.set("a", 1, ttl=30)
+    t.set("b", 1, ttl=5)
+    assert sorted(t) == ["a", "b"]
+    assert expired == ["gone"]
+    t.set("c", 1, ttl=30)
+    assert sorted(t) == ["a", "c"]
+
+
+def test_max_bytes_load_and_stats(tmp_path):
+    source = TTLDict(default_ttl=10, lazy=True)
+    source.set_many({i: "x" * 10 for i in range(10)})
+    source.dump(tmp_path / "snapshot")
+    t = TTLDict(
+        lazy=True, max_bytes=50, sizer=lambda key, value: len(value), stats=True
+    )
+    t.load(tmp_path / "snapshot")
+    assert len(t) == 5
+    assert t._bytes == 50
+    assert t.stats().evictions == 5
+    assert t.stats().memory > 50
+    source["big"] = "x" * 51
+    source.dump(tmp_path / "snapshot")
+    with pytest.raises(ValueError):
+        t.load(tmp_path / "snapshot")
+    assert len(t) == 5
+    assert "big" not in t
+
+
+def test_max_bytes_soonest_expiring_sliding():
+    evicted = []
+    t = TTLDict(
+        default_ttl=10,
+        lazy=True,
+        sliding=True,
+        maxsize=3,
+        eviction_policy="soonest_expiring",
+        function_on_evicted=evicted.append,
+    )
+    t.set("a", 1, ttl=1)
+    t.set("b", 1, ttl=2)
+    t.set("c", 1, ttl=30)
+    # the engine still holds the first deadline of "a"
+    assert t.get("a") == 1
+    t._deadlines["a"] += 5
+    t["d"] = 1
+    assert evicted == ["b"]
+    # slid past "d", which expires first now
+    t._deadlines["a"] += 15
+    t["e"] = 1
+    assert evicted == ["b", "d"]
+    assert sorted(t) == ["a", "c", "e"]
+
+
+def test_snapshot_iteration():
+    t = TTLDict(default_ttl=10, lazy=True)
+    t.set_many({i: i for i in range(10)})
+    keys = t.keys()
+    data = t._dict
+    for key in t:
+        del t[key]
+    assert len(t) == 0
+    assert list(keys) == list(range(10))
+    assert t._dict is not data
+    with pytest.raises(TypeError):
+        t[[]] = 1
+    with pytest.raises(TypeError):
+        t.set_many([([], 1)])
+    with pytest.raises(KeyError):
+        del t["missing"]
+    t["a"] = 1
+    assert dict(t.items()) == {"a": 1}
+    assert str(t) == "{'a': 1}"
+
+
+def test_writes_copy_only_while_scanned():
+    t = TTLDict(default_ttl=10)
+    t.set_many({i: i for i in range(3)})
+    data = t._dict
+    assert list(t.items()) == [(0, 0), (1, 1), (2, 2)]
+    t[3] = 3
+    assert t._dict is data
+    items = t.items()
+    t._expire([0])
+    assert t[1] == 1 and 5 not in t
+    assert t._dict is data
+    t[4] = 4
+    assert t._dict is not data
+    assert dict(items) == {0: 0, 1: 1, 2: 2, 3: 3}
+    t.close()
+
+
+def test_scan_keeps_order_of_its_generation():
+    t = TTLDict(default_ttl=10, maxsize=10)
+    t.set_many({i: i for i in range(3)})
+    keys = t.keys()
+    assert t[0] == 0
+    assert list(keys) == [0, 1, 2]
+    assert list(t.keys()) == [1, 2, 0]
+    t.close()
+
+
+def test_scan_skips_expired_keys_without_sweeping():
+    expired = []
+    t = TTLDict(default_ttl=10, lazy=True, function_on_expired=expired.append)
+    t["a"] = 1
+    t.set("short", 2, ttl=0.01)
+    time.sleep(0.02)
+    assert [key for key in t] == ["a"]
+    assert list(t.keys()) == ["a"]
+    assert dict(t.items()) == {"a": 1}
+    assert list(t.values()) == [1]
+    assert "short" not in t.keys()
+    assert "short" in t._dict and expired == []
+    assert "short" not in t
+    assert expired == ["short"]
+
+
+def test_iteration_during_expiry():
+    t = TTLDict(default_ttl=10)
+    stop = threading.Event()
+
+    def writer():
+        index = 0
+        while not stop.is_set():
+            t.set(index, index, ttl=0.001)
+            index += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 0.5
+        scans = 0
+        while time.monotonic() < deadline:
+            assert all(key == value for key, value in t.items())
+            sum(1 for _ in t)
+            scans += 1
+        assert scans
+    finally:
+        stop.set()
+        thread.join()
+        t.close()
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_sliding(compact):
+    expired = []
+    t = TTLDict(
+        default_ttl=0.3,
+        sliding=True,
+        compact=compact,
+        function_on_expired=expired.append,
+    )
+    t["session"] = 1
+    t.set("short", 2, ttl=0.2)
+    t["idle"] = 3
+    for _ in range(5):
+        time.sleep(0.1)
+        assert t["session"] == 1
+        assert t.get("short") == 2
+    assert "idle" not in t
+    assert sorted(t) == ["session", "short"]
+    assert t._ttls == {"short": 0.2}
+    # compact buckets deadlines by one second
+    time.sleep(1.4 if compact else 0.4)
+    assert sorted(expired) == ["idle", "session", "short"]
+    t.close()
+
+
+@pytest.mark.parametrize("stats", [False, True])
+def test_sliding_only_on_get(stats):
+    t = TTLDict(default_ttl=0.2, sliding=True, lazy=True, stats=stats)
+    t["a"] = 1
+    t["b"] = 2
+    deadlines = dict(t._deadlines)
+    time.sleep(0.05)
+    assert "a" in t
+    assert t.get_many(["b"]) == {"b": 2}
+    assert t.setdefault("a", 0) == 1
+    assert t._deadlines == deadlines
+    time.sleep(0.2)
+    assert "a" not in t
+    assert t.get("b") is None
+
+
+def test_sliding_lazy_with_stats():
+    t = TTLDict(default_ttl=0.2, sliding=True, lazy=True, stats=True)
+    t["a"] = 1
+    deadline = t._deadlines["a"]
+    time.sleep(0.05)
+    assert t.get("a") == 1
+    assert t._deadlines["a"] > deadline
+    assert t._engine.next_deadline() == pytest.approx(deadline)
+    time.sleep(0.17)
+    t._sweep()
+    assert "a" in t
+    assert t._engine.next_deadline() > deadline
+    time.sleep(0.25)
+    assert t.get("a") is None
+    # the membership test neither slides the deadline nor is counted
+    assert t.stats().hits == 1
+    assert t.stats().misses == 1
+
+
+@pytest.mark.parametrize(
+    "engine",
+    [
+        HeapExpiryEngine,
+        lambda: TimingWheelExpiryEngine(tick=0.005),
+        lambda: BucketExpiryEngine(resolution=0.05),
+    ],
+)
+def test_infinite_ttl(engine):
+    expired = []
+    t = TTLDict(
+        default_ttl=math.inf, engine=engine(), function_on_expired=expired.append
+    )
+    t["forever"] = 1
+    t.set_many({"also": 2, "many": 3}, ttl=0.05)
+    t.set("short", 4, ttl=0.05)
+    t.set("later", 5, ttl=60)
+    t.extend_ttl("later", ttl=math.inf)
+    t["also"] = 2
+    # keys that never expire are not scheduled
+    assert len(t._engine) == 2
+    assert t.ttl("forever") == t.ttl("later") == t.ttl("also") == math.inf
+    time.sleep(0.2)
+    assert sorted(expired) == ["many", "short"]
+    assert t._engine._reaper._thread.is_alive()
+    t.set("again", 6, ttl=0.05)
+    time.sleep(0.2)
+    assert expired[-1] == "again"
+    assert t == {"forever": 1, "also": 2, "later": 5}
+    t.close()
+
+
+def test_deadline_beyond_wait_limit():
+    expired = []
+    t = TTLDict(default_ttl=1e10, function_on_expired=expired.append)
+    t["far"] = 1
+    time.sleep(0.05)
+    t.set("short", 2, ttl=0.05)
+    time.sleep(0.2)
+    assert expired == ["short"]
+    assert t._engine._reaper._thread.is_alive()
+    t.close()
+
+
+def test_infinite_ttl_sliding_and_snapshot(tmp_path):
+    t = TTLDict(default_ttl=math.inf, lazy=True, sliding=True)
+    t["a"] = 1
+    assert t["a"] == 1
+    assert t.ttl("a") == math.inf
+    assert t.dump(tmp_path / "snapshot") == 1
+    other = TTLDict(lazy=True)
+    other.load(tmp_path / "snapshot")
+    assert other.ttl("a") == math.inf
+    assert len(other._engine) == 0
@@ -0,0 +1,115 @@
+# mypy: ignore-errors
+import pickle
+import threading
+import time
+
+import pytest
+
+from my_utilities.types.ttl_dict import TTLDict
+from my_utilities.types.ttl_snapshot import read_snapshot, write_snapshot
+
+
+def test_dump_and_load(tmp_path):
+    path = tmp_path / "snapshot.ttl"
+    source = TTLDict(default_ttl=10, lazy=True)
+    source.set_many({i: {"value": i} for i in range(1000)})
+    source.set("own", [1, 2], ttl=20)
+    source.set("gone", 1, ttl=-1)
+    assert source.dump(path) == 1001
+    assert [item.name for item in tmp_path.iterdir()] == ["snapshot.ttl"]
+
+    target = TTLDict(default_ttl=10, lazy=True)
+    target.set("own", "old", ttl=1)
+    assert target.load(path) == 1001
+    assert target == {**{i: {"value": i} for i in range(1000)}, "own": [1, 2]}
+    assert target._ttls == {"own": 20}
+    assert abs(target._deadlines[5] - source._deadlines[5]) < 0.1
+    assert abs(target._deadlines["own"] - source._deadlines["own"]) < 0.1
+    assert len(target._engine) == 1001
+
+
+def test_concurrent_dumps(tmp_path):
+    path = tmp_path / "snapshot.ttl"
+    sources = [TTLDict(default_ttl=10, lazy=True) for _ in range(4)]
+    for number, source in enumerate(sources):
+        source.set_many({(number, i): "x" * 100 for i in range(2000)})
+
+    def worker(source):
+        for _ in range(10):
+            source.dump(path)
+
+    threads = [threading.Thread(target=worker, args=(item,)) for item in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # the file holds one complete snapshot and no temporary file is left
+    target = TTLDict(default_ttl=10, lazy=True)
+    assert target.load(path) == 2000
+    assert len({key[0] for key in target.keys()}) == 1
+    assert [item.name for item in tmp_path.iterdir()] == ["snapshot.ttl"]
+
+
+def test_failed_dump_leaves_no_file(tmp_path, monkeypatch):
+    def replace(source, target):
+        raise OSError("read-only")
+
+    monkeypatch.setattr("my_utilities.types.ttl_snapshot.os.replace", replace)
+    source = TTLDict(default_ttl=10, lazy=True)
+    source.set("a", 1)
+    with pytest.raises(OSError):
+        source.dump(tmp_path / "snapshot.ttl")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_load_skips_expired_blocks(tmp_path, monkeypatch):
+    path = tmp_path / "snapshot.ttl"
+    now = time.time()
+    entries = [(now - 100 + i, i, str(i), None) for i in range(10)]
+    entries.append((now + 100, "live", "value", 5.0))
+    write_snapshot(path, entries, block_size=4)
+
+    blocks = []
+    loads = pickle.loads
+    monkeypatch.setattr(
+        "my_utilities.types.ttl_snapshot.pickle.loads",
+        lambda data: blocks.append(bytes(data)) or loads(data),
+    )
+    keys, values, deadlines, ttls = read_snapshot(path, now)
+    assert keys == ["live"]
+    assert values == ["value"]
+    assert deadlines == [now + 100]
+    assert ttls == {"live": 5.0}
+    assert len(blocks) == 1
+
+    keys, _, _, _ = read_snapshot(path, now - 95.5)
+    assert keys == [5, 6, 7, 8, 9, "live"]
+    assert len(blocks) == 3
+
+
+def test_load_into_bounded_dict(tmp_path):
+    path = tmp_path / "snapshot.ttl"
+    source = TTLDict(default_ttl=10, lazy=True)
+    for i in range(5):
+        source.set(i, i, ttl=10 + i)
+    source.dump(path)
+    evicted = []
+    target = TTLDict(default_ttl=10, maxsize=2, function_on_evicted=evicted.append)
+    assert target.load(path) == 5
+    assert list(target) == [3, 4]
+    assert evicted == [0, 1, 2]
+    target.close()
+
+
+def test_empty_and_wrong_files(tmp_path):
+    path = tmp_path / "snapshot.ttl"
+    assert TTLDict(lazy=True).dump(path) == 0
+    assert TTLDict(lazy=True).load(path) == 0
+    path.write_bytes(b"not a snapshot at all, really not")
+    with pytest.raises(ValueError):
+        TTLDict(lazy=True).load(path)
+    path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        TTLDict(lazy=True).load(path)
+    with pytest.raises(ValueError):
+        write_snapshot(path, [], block_size=0)
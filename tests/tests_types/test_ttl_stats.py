@@ -0,0 +1,110 @@
+# mypy: ignore-errors
+import asyncio
+import time
+
+import pytest
+
+from my_utilities.types import AsyncTTLDict, ShardedTTLDict, TTLDict, TTLDictStats
+from my_utilities.types.ttl_stats import LATENCY_BUCKETS, StatsCollector
+
+
+def test_disabled():
+    t = TTLDict(lazy=True)
+    assert t.stats() is None
+    assert "_lookup" not in vars(t)
+    assert "set" not in vars(t)
+    assert ShardedTTLDict(shards=2, lazy=True).stats() is None
+
+
+def test_counters():
+    t = TTLDict(default_ttl=10, lazy=True, stats=True, maxsize=3)
+    t["a"] = 1
+    t.set("b", 2, ttl=0.05)
+    t.set_many({"c": 3, "d": 4})
+    t.setdefault("e", 5)
+    t.setdefault("e", 6)
+    assert t["e"] == 5
+    assert t.get("missing") is None
+    assert "missing" not in t
+    assert t.get_many(["d", "e", "nope"]) == {"d": 4, "e": 5}
+    stats = t.stats()
+    assert isinstance(stats, TTLDictStats)
+    assert stats.sets == 5
+    # setdefault and the membership test are not lookups of the value
+    assert stats.hits == 3
+    assert stats.misses == 2
+    assert stats.evictions == 2
+    assert stats.size == 3
+    assert stats.memory > 0
+    assert stats.hit_ratio == 0.6
+
+    t.set("f", 6, ttl=0.05)
+    time.sleep(0.1)
+    assert t.get("f") is None
+    assert len(t) == 2
+    assert t.stats().expirations == 1
+    assert t.stats().misses == 3
+
+
+def test_only_reads_of_values_are_counted():
+    t = TTLDict(default_ttl=10, lazy=True, stats=True)
+    t["a"] = 1
+    assert "a" in t
+    assert "b" not in t
+    t.extend_ttl("a")
+    t.setdefault("a", 2)
+    assert t.pop("b") is None
+    assert t.pop("a") == 1
+    stats = t.stats()
+    assert stats.hits == stats.misses == 0
+    assert stats.get_latency.count == 0
+
+
+def test_latency_sampling():
+    t = TTLDict(lazy=True, stats=True, stats_sample_rate=2)
+    for i in range(10):
+        t[i] = i
+        t.get(i)
+    stats = t.stats()
+    assert stats.set_latency.count + stats.get_latency.count == 10
+    assert len(stats.get_latency.counts) == len(LATENCY_BUCKETS) + 1
+    assert stats.get_latency.mean > 0 or stats.set_latency.mean > 0
+    with pytest.raises(ValueError):
+        TTLDict(stats=True, stats_sample_rate=0)
+
+
+def test_collector_buckets():
+    collector = StatsCollector(sample_rate=1)
+    collector.observe_get(0.5e-6)
+    collector.observe_get(1e-6)
+    collector.observe_get(1.0)
+    snapshot = collector.snapshot(0, 0)
+    assert snapshot.get_latency.counts[0] == 2
+    assert snapshot.get_latency.counts[-1] == 1
+    assert snapshot.get_latency.count == 3
+    assert snapshot.set_latency.mean == 0.0
+    assert snapshot.hit_ratio == 0.0
+
+
+def test_sharded_stats():
+    t = ShardedTTLDict(shards=4, lazy=True, stats=True, stats_sample_rate=1)
+    t.set_many({i: i for i in range(20)})
+    for i in range(30):
+        t.get(i)
+    stats = t.stats()
+    assert stats.sets == 20
+    assert stats.hits == 20
+    assert stats.misses == 10
+    assert stats.size == 20
+    assert stats.get_latency.count == 30
+
+
+def test_async_stats():
+    async def main():
+        t = AsyncTTLDict(stats=True)
+        t["a"] = 1
+        assert t["a"] == 1
+        assert t.stats().hits == 1
+        t.close()
+
+    asyncio.run(main())